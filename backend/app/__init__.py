@@ -2,36 +2,221 @@ from flask import Flask, request
 from flask_cors import CORS
 from flasgger import Swagger
 from flask_caching import Cache
+from sqlalchemy import event
 from app.database.connection import db
+from app.database import sqlite_profile
+from app.logging_setup import configure_logging, parse_levels
+from app.services import metrics
+from app.services.price_stats import PriceStats
+from app.services.profiler import profiler
+from app.services.read_cache import TieredCache
+from app.services.recent_history import RecentHistory
+from app.startup import STARTUP_MODES, StartupTimer
+import json
 import logging
+import os
+import socket
+import threading
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s [%(levelname)s] %(message)s')
 logger = logging.getLogger(__name__)
 
 cors = CORS()
 cache = Cache()
+read_cache = TieredCache(cache)
+recent_history = RecentHistory()
+price_stats = PriceStats()
 
-def create_app():
+def _fallback_to_simple_cache(app):
+    """
+    Troca o RedisCache por SimpleCache quando o Redis não responde.
+    """
+    if app.config['CACHE_TYPE'] != 'RedisCache':
+        return
+    try:
+        # Apenas testa se a porta aceita conexões (o cliente redis faz retentativas demoradas)
+        socket.create_connection((app.config['CACHE_REDIS_HOST'], app.config['CACHE_REDIS_PORT']), timeout=0.5).close()
+    except OSError as e:
+        logger.warning(f"Redis unavailable ({e}), falling back to SimpleCache")
+        app.config['CACHE_TYPE'] = 'SimpleCache'
+
+def _connect_cache(app):
+    """
+    Testa o Redis e inicializa o cache. No modo lazy, roda na primeira requisição.
+    """
+    _fallback_to_simple_cache(app)
+    cache.init_app(app)
+
+def _defer_until_first_request(app, setup):
+    lock = threading.Lock()
+    done = []
+
+    @app.before_request
+    def _run_setup_once():
+        if done:
+            return
+        with lock:
+            if not done:
+                setup(app)
+                done.append(True)
+
+def _load_apispec(app, swagger):
+    """
+    Usa a especificação gerada por `flask build-apispec` (APISPEC_FILE) em vez de
+    montá-la a partir das docstrings. Sem o arquivo, o Flasgger monta na primeira leitura e guarda em memória.
+    """
+    path = app.config.get('APISPEC_FILE')
+    if path and os.path.exists(path):
+        with open(path) as f:
+            swagger.apispecs['apispec'] = json.load(f)
+
+def _init_storage(app, lazy=False):
+    """
+    Formato de armazenamento de preços e instantes: o do banco existente, ou PRICE_STORAGE em um banco novo.
+    No modo lazy (SQLite), a detecção fica para a primeira conexão de qualquer uma das engines,
+    antes do primeiro comando SQL; create_app não abre o banco.
+    """
+    from app.models.storage import detect_sqlite_storage_format, detect_storage_format, set_storage_format
+    with app.app_context():
+        engine = db.engine
+    engines = [engine]
+    if sqlite_profile.READ_ENGINE in app.extensions:
+        engines.append(app.extensions[sqlite_profile.READ_ENGINE])
+
+    def apply(detected):
+        fmt = detected or app.config['PRICE_STORAGE']
+        if detected and detected != app.config['PRICE_STORAGE']:
+            logger.warning(f"Database uses the '{detected}' storage format (PRICE_STORAGE={app.config['PRICE_STORAGE']}); "
+                           f"run `flask migrate-storage --to {app.config['PRICE_STORAGE']}` to convert it")
+        for target in engines:
+            set_storage_format(target, fmt)
+        app.extensions['price_storage'] = fmt
+
+    if not lazy or engine.url.get_backend_name() != 'sqlite':
+        apply(detect_storage_format(engine))
+        return
+    lock = threading.Lock()
+
+    def _detect_on_first_connect(dbapi_connection, connection_record):
+        with lock:
+            if 'price_storage' not in app.extensions:
+                apply(detect_sqlite_storage_format(dbapi_connection))
+
+    for target in engines:
+        event.listen(target, 'first_connect', _detect_on_first_connect)
+
+def _optional_float(value):
+    return float(value) if value not in (None, '') else None
+
+def create_app(config=None):
     """
     Cria e configura a aplicação Flask, incluindo banco de dados,
     CORS, documentação Swagger, blueprints e comandos CLI.
+
+    Args:
+        config (dict, opcional): Valores que substituem a configuração padrão e as variáveis de ambiente.
     
     Returns:
         app (Flask): Instância configurada da aplicação Flask.
     """
+    timer = StartupTimer()
     app = Flask(__name__)
-    
+
+    # 'eager' (padrão): cria as tabelas e testa o Redis ao iniciar.
+    # 'lazy': tabelas via `flask create-schema` e conexão com o cache na primeira requisição
+    app.config['STARTUP_MODE'] = os.environ.get('STARTUP_MODE', 'eager')
+    # Especificação OpenAPI pré-gerada (`flask build-apispec`); vazio = montada a partir das docstrings
+    app.config['APISPEC_FILE'] = os.environ.get('APISPEC_FILE', '')
+
     # Configuração do banco de dados
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///ecommerce.db'
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///ecommerce.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Perfil do SQLite: 'default' (comportamento padrão) ou, por opção, 'concurrent'
+    # (WAL + engine somente leitura para as rotas de consulta)
+    app.config['SQLITE_PROFILE'] = os.environ.get('SQLITE_PROFILE', 'default')
+    app.config['SQLITE_READ_POOL_SIZE'] = int(os.environ.get('SQLITE_READ_POOL_SIZE', 8))
+    # Formato de preços e instantes em um banco novo: 'float' (REAL e texto ISO) ou 'compact'
+    # (centavos e epoch ms inteiros); um banco existente mantém o seu até `flask migrate-storage`
+    app.config['PRICE_STORAGE'] = os.environ.get('PRICE_STORAGE', 'float')
     
-    # Configuração do Cache usando Redis
-    app.config['CACHE_TYPE'] = 'RedisCache'
-    app.config['CACHE_REDIS_HOST'] = 'redis'
-    app.config['CACHE_REDIS_PORT'] = 6379
-    app.config['CACHE_REDIS_DB'] = 0
+    # Configuração do Cache usando Redis (SimpleCache em memória se o Redis não estiver acessível)
+    app.config['CACHE_TYPE'] = os.environ.get('CACHE_TYPE', 'RedisCache')
+    app.config['CACHE_REDIS_HOST'] = os.environ.get('CACHE_REDIS_HOST', 'redis')
+    app.config['CACHE_REDIS_PORT'] = int(os.environ.get('CACHE_REDIS_PORT', 6379))
+    app.config['CACHE_REDIS_DB'] = int(os.environ.get('CACHE_REDIS_DB', 0))
     app.config['CACHE_DEFAULT_TIMEOUT'] = 300
 
+    # Cache local (LRU) na frente do cache compartilhado para /products e /products/<id>
+    app.config['READ_CACHE_MAX_ENTRIES'] = int(os.environ.get('READ_CACHE_MAX_ENTRIES', 256))
+    app.config['READ_CACHE_MAX_BYTES'] = int(os.environ.get('READ_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    # Validade (s) das entradas do LRU local; limitada a CACHE_DEFAULT_TIMEOUT
+    app.config['READ_CACHE_LOCAL_TTL'] = float(os.environ.get('READ_CACHE_LOCAL_TTL', 30))
+    # Intervalo (s) em que cada processo relê a geração do cache compartilhado (commits de outros processos)
+    app.config['READ_CACHE_GENERATION_TTL'] = float(os.environ.get('READ_CACHE_GENERATION_TTL', 1.0))
+    # Acima disso, GET /products é transmitido do cursor em vez de montado e cacheado
+    app.config['PRODUCTS_STREAM_MIN_ROWS'] = int(os.environ.get('PRODUCTS_STREAM_MIN_ROWS', 10000))
+    # Últimos pontos de preço por produto em memória (0 = desativado)
+    app.config['RECENT_HISTORY_CAPACITY'] = int(os.environ.get('RECENT_HISTORY_CAPACITY', 64))
+    app.config['RECENT_HISTORY_MAX_BYTES'] = int(os.environ.get('RECENT_HISTORY_MAX_BYTES', 16 * 1024 * 1024))
+    # Estatísticas de preço por produto: intervalo de gravação das somas e memória das janelas 24h/7d
+    app.config['PRICE_STATS_FLUSH_INTERVAL'] = float(os.environ.get('PRICE_STATS_FLUSH_INTERVAL', 60))
+    app.config['PRICE_STATS_MAX_BYTES'] = int(os.environ.get('PRICE_STATS_MAX_BYTES', 16 * 1024 * 1024))
+
+    # Configuração da automação de preços (0 = ciclo inteiro em uma única transação)
+    app.config['PRICE_AUTOMATION_CHUNK_SIZE'] = int(os.environ.get('PRICE_AUTOMATION_CHUNK_SIZE', 0))
+    # Processos para o cálculo dos preços (0/1 = no próprio processo) e semente opcional para reprodutibilidade
+    app.config['PRICE_AUTOMATION_WORKERS'] = int(os.environ.get('PRICE_AUTOMATION_WORKERS', 0))
+    app.config['PRICE_AUTOMATION_SEED'] = os.environ.get('PRICE_AUTOMATION_SEED')
+    # Período por categoria ("Electronics=5,Books=3600"); as demais seguem o intervalo padrão
+    app.config['PRICE_AUTOMATION_SCHEDULE'] = os.environ.get('PRICE_AUTOMATION_SCHEDULE', '')
+    app.config['PRICE_AUTOMATION_TICK'] = float(os.environ.get('PRICE_AUTOMATION_TICK', 1.0))
+    # Duração (s) acima da qual um tick conta como estouro no status e nas métricas (vazio = o próprio tick)
+    app.config['PRICE_AUTOMATION_TICK_BUDGET'] = os.environ.get('PRICE_AUTOMATION_TICK_BUDGET', '')
+    # Regras de precificação iniciais em JSON (ver PUT /automation/rules)
+    app.config['PRICE_AUTOMATION_RULES'] = os.environ.get('PRICE_AUTOMATION_RULES', '')
+    # Lease compartilhado no banco (segundos; 0 = desativado): com vários workers, só o detentor roda os ciclos
+    app.config['PRICE_AUTOMATION_LEASE_TTL'] = float(os.environ.get('PRICE_AUTOMATION_LEASE_TTL', 0))
+    # Com o lease, intervalo (s) em que os workers de reserva leem do banco os commits do líder para o SSE
+    app.config['PRICE_STREAM_POLL_INTERVAL'] = float(os.environ.get('PRICE_STREAM_POLL_INTERVAL', 1.0))
+
+    # Histórico gravado em segundo plano (1 = ativado): fila limitada em memória, inserts em lote por
+    # tamanho/idade e diário em disco (HISTORY_SPILL_DIR) recuperado após uma queda
+    app.config['HISTORY_WRITE_BEHIND'] = int(os.environ.get('HISTORY_WRITE_BEHIND', 0))
+    app.config['HISTORY_SINK_MAX_ROWS'] = int(os.environ.get('HISTORY_SINK_MAX_ROWS', 500_000))
+    app.config['HISTORY_SINK_BATCH_ROWS'] = int(os.environ.get('HISTORY_SINK_BATCH_ROWS', 50_000))
+    app.config['HISTORY_SINK_MAX_AGE'] = float(os.environ.get('HISTORY_SINK_MAX_AGE', 1.0))
+    app.config['HISTORY_SPILL_DIR'] = os.environ.get('HISTORY_SPILL_DIR', os.path.join(app.instance_path, 'history_spill'))
+    app.config['HISTORY_SPILL_FSYNC'] = int(os.environ.get('HISTORY_SPILL_FSYNC', 1))
+
+    # Compactação do histórico de preços (retenção em dias; vazio = manter para sempre)
+    app.config['HISTORY_COMPACTION_INTERVAL'] = float(os.environ.get('HISTORY_COMPACTION_INTERVAL', 60))
+    app.config['HISTORY_RAW_RETENTION_DAYS'] = os.environ.get('HISTORY_RAW_RETENTION_DAYS', '')
+    app.config['HISTORY_MINUTE_RETENTION_DAYS'] = os.environ.get('HISTORY_MINUTE_RETENTION_DAYS', '90')
+    app.config['HISTORY_HOUR_RETENTION_DAYS'] = os.environ.get('HISTORY_HOUR_RETENTION_DAYS', '730')
+    # Arquivo colunar do histórico bruto antigo (vazio = desativado)
+    app.config['HISTORY_ARCHIVE_DIR'] = os.environ.get('HISTORY_ARCHIVE_DIR', os.path.join(app.instance_path, 'archive'))
+    app.config['HISTORY_ARCHIVE_AFTER_DAYS'] = os.environ.get('HISTORY_ARCHIVE_AFTER_DAYS', '')
+
+    # Saída do profiler sob demanda (POST /automation/profile, flask profile)
+    app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+
+    # Logging: nível global, níveis por módulo ("app.services.price_automation=DEBUG,werkzeug=WARNING")
+    # e amostragem (mensagens por segundo por modelo de mensagem, 0 = sem amostragem)
+    app.config['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'INFO')
+    app.config['LOG_LEVELS'] = os.environ.get('LOG_LEVELS', '')
+    app.config['LOG_SAMPLE_RATE'] = float(os.environ.get('LOG_SAMPLE_RATE', 0))
+
+    if config:
+        app.config.update(config)
+    lazy = app.config['STARTUP_MODE'] == 'lazy'
+    if app.config['STARTUP_MODE'] not in STARTUP_MODES:
+        raise ValueError(f"Unknown STARTUP_MODE '{app.config['STARTUP_MODE']}' (expected one of {', '.join(STARTUP_MODES)})")
+    if app.config['HISTORY_WRITE_BEHIND'] and not app.config['PRICE_AUTOMATION_LEASE_TTL'] > 0:
+        # Sem o lease, cada worker teria sua fila e a compactação de um fecharia baldes com pontos na fila de outro
+        raise ValueError("HISTORY_WRITE_BEHIND requires PRICE_AUTOMATION_LEASE_TTL > 0")
+    with timer.phase('logging'):
+        # Configurado uma vez por processo: os registros vão para uma fila e são escritos por uma thread própria
+        configure_logging(app.config['LOG_LEVEL'], parse_levels(app.config['LOG_LEVELS']), app.config['LOG_SAMPLE_RATE'])
+
     # Configuração do Swagger
     swagger_config = {
         "headers": [],
@@ -47,41 +232,128 @@ def create_app():
         "swagger_ui": True,
         "specs_route": "/swagger/"
     }
-    Swagger(app, config=swagger_config)
+    with timer.phase('swagger'):
+        swagger = Swagger(app, config=swagger_config)
+        _load_apispec(app, swagger)
 
     # Inicialização das extensões
-    db.init_app(app)
-    cors.init_app(app)
-    cache.init_app(app)
+    with timer.phase('extensions'):
+        db.init_app(app)
+        sqlite_profile.install(app)
+        _init_storage(app, lazy)
+        cors.init_app(app)
+        if lazy:
+            _defer_until_first_request(app, _connect_cache)
+        else:
+            _connect_cache(app)
+        read_cache.init_app(app)
+        recent_history.init_app(app)
+        price_stats.init_app(app)
+        metrics.init_app(app)
+        profiler.init_app(app)
 
-    # Criação do banco de dados
-    with app.app_context():
-        db.create_all()
+    # Criação do banco de dados (os modelos precisam estar importados para create_all)
+    from app import models  # noqa: F401
+    if not lazy:
+        with timer.phase('schema'), app.app_context():
+            db.create_all()
 
     # Registro dos blueprints
-    from app.routes.products import products_bp
-    from app.routes.automation_routes import automation_bp
-    app.register_blueprint(products_bp)
-    app.register_blueprint(automation_bp)
+    with timer.phase('blueprints'):
+        from app.routes.products import products_bp
+        from app.routes.automation_routes import automation_bp
+        from app.routes.metrics_routes import metrics_bp
+        app.register_blueprint(products_bp)
+        app.register_blueprint(automation_bp)
+        app.register_blueprint(metrics_bp)
     
     # Inicialização da automação de preços (sem iniciar automaticamente)
     from app.services.price_automation import init_price_automation
-    with app.app_context():
-        app.price_automation = init_price_automation(app, interval=10, min_price_factor=0.8, max_price_factor=1.2)
+    from app.services.history_sink import HistorySink
+    from app.services.leader_lease import LeaderLease
+    from app.services.reprice_scheduler import parse_schedule
+    with timer.phase('automation'), app.app_context():
+        lease_ttl = app.config['PRICE_AUTOMATION_LEASE_TTL']
+        history_sink = HistorySink(
+            app,
+            max_rows=app.config['HISTORY_SINK_MAX_ROWS'],
+            batch_rows=app.config['HISTORY_SINK_BATCH_ROWS'],
+            max_age=app.config['HISTORY_SINK_MAX_AGE'],
+            spill_dir=app.config['HISTORY_SPILL_DIR'],
+            fsync=bool(app.config['HISTORY_SPILL_FSYNC'])
+        ) if app.config['HISTORY_WRITE_BEHIND'] else None
+        app.price_automation = init_price_automation(
+            app, interval=10, min_price_factor=0.8, max_price_factor=1.2,
+            chunk_size=app.config['PRICE_AUTOMATION_CHUNK_SIZE'] or None,
+            workers=app.config['PRICE_AUTOMATION_WORKERS'] or None,
+            seed=int(app.config['PRICE_AUTOMATION_SEED']) if app.config['PRICE_AUTOMATION_SEED'] else None,
+            schedule=parse_schedule(app.config['PRICE_AUTOMATION_SCHEDULE']),
+            tick=app.config['PRICE_AUTOMATION_TICK'],
+            tick_budget=_optional_float(app.config['PRICE_AUTOMATION_TICK_BUDGET']),
+            lease=LeaderLease('price_automation', lease_ttl) if lease_ttl > 0 else None,
+            history_sink=history_sink,
+            stream_poll_interval=app.config['PRICE_STREAM_POLL_INTERVAL']
+        )
+        if app.config['PRICE_AUTOMATION_RULES']:
+            app.price_automation.set_rules(json.loads(app.config['PRICE_AUTOMATION_RULES']))
+        app.price_automation.add_commit_listener(read_cache.on_commit)
+        app.price_automation.add_commit_listener(recent_history.on_commit)
+        # Com o histórico em segundo plano, o buffer e as estatísticas também leem os lotes ainda na fila
+        recent_history.history_sink = history_sink
+        price_stats.history_sink = history_sink
+        app.price_automation.add_commit_listener(price_stats.on_commit)
         logger.info("Price automation initialized but not started")
 
+    from app.services.history_archive import HistoryArchive
+    from app.services.history_compaction import init_history_compactor
+    with timer.phase('history'):
+        archive = HistoryArchive(
+            app.config['HISTORY_ARCHIVE_DIR'],
+            after_days=_optional_float(app.config['HISTORY_ARCHIVE_AFTER_DAYS'])
+        )
+        app.history_compactor = init_history_compactor(
+            app,
+            interval=app.config['HISTORY_COMPACTION_INTERVAL'],
+            raw_retention_days=_optional_float(app.config['HISTORY_RAW_RETENTION_DAYS']),
+            minute_retention_days=_optional_float(app.config['HISTORY_MINUTE_RETENTION_DAYS']),
+            hour_retention_days=_optional_float(app.config['HISTORY_HOUR_RETENTION_DAYS']),
+            archive=archive,
+            history_sink=app.price_automation.history_sink,
+            catalog_version=app.price_automation.catalog_version
+        )
+        app.history_archive = app.history_compactor.archive
+        price_stats.archive = app.history_archive
+
+    if app.price_automation.lease is not None:
+        # Cada worker entra na eleição ao atender a primeira requisição (comandos CLI não participam);
+        # a compactação do histórico acompanha o lease
+        _defer_until_first_request(app, lambda app: app.price_automation.join_election())
+        # Só o líder vê os commits: nos demais workers, estatísticas, últimos pontos e cache local
+        # são lidos do banco (e os assinantes SSE recebem os commits pelo relay da automação)
+        for consumer in (price_stats, recent_history, read_cache):
+            consumer.set_live(False)
+            app.price_automation.add_leadership_listener(consumer.set_live)
+        if app.config['HISTORY_COMPACTION_INTERVAL'] > 0:
+            app.price_automation.add_leadership_listener(app.history_compactor.set_leading)
+
     # Registro dos comandos CLI personalizados
-    from app.commands import register_commands
-    register_commands(app, db)
+    with timer.phase('commands'):
+        from app.commands import register_commands
+        register_commands(app, db)
     
     # Adicionar headers para evitar cache em respostas dinâmicas
     @app.after_request
     def add_no_cache_headers(response):
+        if 'ETag' in response.headers:
+            # Respostas com ETag (catálogo) são revalidadas pelo cliente em vez de nunca armazenadas
+            return response
         if 'products' in str(request.url_rule).lower() or 'automation' in str(request.url_rule).lower():
             response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
             response.headers['Pragma'] = 'no-cache'
             response.headers['Expires'] = '0'
         return response
 
-    logger.info("Flask app initialized")
+    timer.finish()
+    app.extensions['startup'] = timer
+    logger.info(f"Flask app initialized in {timer.summary()} [{app.config['STARTUP_MODE']}]")
     return app
\ No newline at end of file
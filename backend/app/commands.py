@@ -1,7 +1,16 @@
 import click
+import json
+import os
 from datetime import datetime, timedelta, timezone
 import random
+import time
 from app.models.product import Product, PriceHistory
+from app.models.storage import STORAGE_FORMATS
+from app.models.price_rollup import PriceHistoryMinute, PriceHistoryHour, PriceHistoryDay, RollupWatermark
+from app.models.price_stats import ProductPriceStats
+from app.services.bulk_seed import BulkSeeder, history_points
+from app.services.history_compaction import get_watermark
+from app.services.storage_migration import migrate_storage
 
 # Dados fixos de produtos
 PRODUCTS_DATA = [
@@ -49,6 +58,17 @@ PRODUCTS_DATA = [
     }
 ]
 
+def bulk_seed(db, products, history_days, interval, workers, seed):
+    total = products * (1 + history_points(history_days, interval))
+    started = time.perf_counter()
+    with click.progressbar(length=total, label='Seeding', show_pos=True) as bar:
+        seeder = BulkSeeder(db.session, workers=workers, seed=seed, progress=bar.update)
+        inserted = seeder.run(products, history_days, interval)
+    elapsed = time.perf_counter() - started
+    rows = inserted['products'] + inserted['price_history']
+    click.echo(f"✅ {inserted['products']} products and {inserted['price_history']} price history rows "
+               f"seeded in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):.0f} rows/s)")
+
 def register_commands(app, db):
     """
     Register custom CLI commands with the Flask app.
@@ -67,8 +87,60 @@ def register_commands(app, db):
         except Exception as e:
             click.echo(f'❌ Error initializing database: {e}', err=True)
 
+    @app.cli.command('create-schema')
+    def create_schema_command():
+        """
+        Create missing tables without dropping data (needed with STARTUP_MODE=lazy).
+        """
+        try:
+            with app.app_context():
+                db.create_all()
+            click.echo('✅ Database schema created!')
+        except Exception as e:
+            click.echo(f'❌ Error creating database schema: {e}', err=True)
+
+
+    @app.cli.command('build-apispec')
+    @click.option('--output', default=None, help='Spec file to write (default: APISPEC_FILE).')
+    def build_apispec_command(output):
+        """
+        Write the OpenAPI spec built from the route docstrings to a JSON file.
+        """
+        output = output or app.config.get('APISPEC_FILE')
+        if not output:
+            click.echo('❌ Pass --output or set APISPEC_FILE', err=True)
+            return
+        try:
+            # Ignora um arquivo anterior já carregado: a especificação é montada das docstrings
+            app.swag.apispecs.pop('apispec', None)
+            with app.test_request_context():
+                spec = app.swag.get_apispecs('apispec')
+            os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+            with open(output, 'w') as f:
+                json.dump(spec, f, sort_keys=True)
+            click.echo(f"✅ OpenAPI spec with {len(spec.get('paths', {}))} paths written to {output}")
+        except Exception as e:
+            click.echo(f'❌ Error building OpenAPI spec: {e}', err=True)
+
+
+    @app.cli.command('startup-report')
+    def startup_report_command():
+        """
+        Show the time create_app spent in each startup phase.
+        """
+        report = app.extensions['startup'].report()
+        click.echo(f"create_app [{app.config['STARTUP_MODE']}]: {report['total_ms']:.1f} ms")
+        for name, ms in sorted(report['phases_ms'].items(), key=lambda item: item[1], reverse=True):
+            click.echo(f'  {name:<12} {ms:>8.1f} ms')
+
+
     @app.cli.command('seed-db')
-    def seed_db_command():
+    @click.option('--products', type=int, default=None, help='Generate this many synthetic products instead of the sample data.')
+    @click.option('--history-days', type=float, default=7, show_default=True, help='Days of generated price history.')
+    @click.option('--interval', type=float, default=3600, show_default=True, help='Seconds between history points.')
+    @click.option('--workers', type=int, default=None, help='Generator processes (default: CPU count, 0 = in-process).')
+    @click.option('--seed', type=int, default=0, show_default=True, help='Random seed of the generated catalog.')
+    def seed_db_command(products, history_days, interval, workers, seed):
         """
         Seed the database with sample products and price history.
         """
@@ -76,6 +148,10 @@ def register_commands(app, db):
             with app.app_context():
                 db.create_all()
                 clear_data(db)
+                app.history_archive.clear()
+                if products is not None:
+                    bulk_seed(db, products, history_days, interval, workers, seed)
+                    return
                 add_sample_products(db)
                 generate_price_history(db)
             click.echo('✅ Database seeded with sample data!')
@@ -83,12 +159,131 @@ def register_commands(app, db):
             click.echo(f'❌ Error seeding database: {e}', err=True)
 
 
+    @app.cli.command('compact-history')
+    @click.option('--raw-retention-days', type=float, default=None, help='Override raw history retention (days).')
+    def compact_history_command(raw_retention_days):
+        """
+        Roll price history into minute/hour/day tiers and apply retention.
+        """
+        try:
+            with app.app_context():
+                compactor = app.history_compactor
+                if raw_retention_days is not None:
+                    compactor.retention[None] = raw_retention_days
+                result = compactor.run_once()
+            for table, rows in result['rolled'].items():
+                click.echo(f'  {table}: {rows} rows aggregated')
+            for table, rows in result['deleted'].items():
+                click.echo(f'  {table}: {rows} rows removed by retention')
+            click.echo('✅ Price history compacted!')
+        except Exception as e:
+            click.echo(f'❌ Error compacting price history: {e}', err=True)
+
+
+    @app.cli.command('archive-history')
+    @click.option('--after-days', type=float, default=None, help='Archive raw history older than this (days).')
+    def archive_history_command(after_days):
+        """
+        Move cold raw price history into the columnar archive.
+        """
+        try:
+            with app.app_context():
+                archive = app.history_archive
+                if after_days is not None:
+                    archive.after_days = after_days
+                if not archive.enabled:
+                    click.echo('❌ Archive disabled: set HISTORY_ARCHIVE_AFTER_DAYS or --after-days', err=True)
+                    return
+                # Só arquiva o que a camada de minutos já agregou
+                rows = archive.archive(db.session, not_after=get_watermark(db.session, PriceHistoryMinute))
+            click.echo(f'✅ {rows} price history rows archived to {archive.root}')
+        except Exception as e:
+            click.echo(f'❌ Error archiving price history: {e}', err=True)
+
+
+    @app.cli.command('rebuild-price-stats')
+    def rebuild_price_stats_command():
+        """
+        Recompute the per-product price statistics from the price history.
+        """
+        from app import price_stats
+        try:
+            started = time.perf_counter()
+            with app.app_context():
+                products = price_stats.rebuild(db.session)
+            click.echo(f'✅ Price statistics rebuilt for {products} products in {time.perf_counter() - started:.1f}s')
+        except Exception as e:
+            click.echo(f'❌ Error rebuilding price statistics: {e}', err=True)
+
+
+    @app.cli.command('migrate-storage')
+    @click.option('--to', 'target', type=click.Choice(STORAGE_FORMATS), required=True, help='Target storage format.')
+    def migrate_storage_command(target):
+        """
+        Convert prices and timestamps of an existing database to another storage format.
+        """
+        try:
+            with app.app_context():
+                db.session.remove()
+                result = migrate_storage(db.engine, target)
+            if 'size_before' not in result:
+                click.echo(f'Database already uses the {target} format.')
+                return
+            for table, rows in result['rows'].items():
+                click.echo(f'  {table}: {rows} rows converted')
+            click.echo(f"  size: {result['size_before'] / 1e6:.1f} MB -> {result['size_after'] / 1e6:.1f} MB")
+            click.echo(f"✅ Storage migrated from {result['from']} to {target} in {result['seconds']:.1f}s "
+                       f"(set PRICE_STORAGE={target})")
+        except Exception as e:
+            click.echo(f'❌ Error migrating storage: {e}', err=True)
+
+
+    @app.cli.command('profile')
+    @click.option('--cycles', type=int, default=0, help='Run and profile this many automation cycles.')
+    @click.option('--route', default=None, help='Request path to profile (e.g. /products).')
+    @click.option('--requests', 'request_count', type=int, default=1, show_default=True, help='Requests to --route.')
+    @click.option('--output-dir', default=None, help='Where captures are written (default: PROFILE_DIR).')
+    def profile_command(cycles, route, request_count, output_dir):
+        """
+        Profile automation cycles or requests and write pstats/flamegraph/SQL captures.
+        """
+        from app.services.profiler import profiler
+        try:
+            if output_dir:
+                profiler.output_dir = output_dir
+            seen = len(profiler.captures())
+            if cycles:
+                profiler.arm('cycle', cycles)
+                with app.app_context():
+                    for _ in range(cycles):
+                        app.price_automation.run_cycle()
+            if route:
+                profiler.arm('request', request_count, route)
+                client = app.test_client()
+                for _ in range(request_count):
+                    client.get(route)
+            profiler.disarm()
+            captures = profiler.captures()[seen:]
+            for capture in captures:
+                click.echo(f"{capture['id']}: {capture['duration_ms']:.1f} ms, "
+                           f"{capture['sql']['statements']} SQL statements ({capture['sql']['total_ms']:.1f} ms)")
+                for entry in capture['top_functions'][:5]:
+                    click.echo(f"  {entry['cumulative_ms']:>10.1f} ms  {entry['function']}")
+                for path in capture['files'].values():
+                    click.echo(f"  -> {path}")
+            if not captures:
+                click.echo('Nothing profiled: pass --cycles and/or --route.', err=True)
+        except Exception as e:
+            click.echo(f'❌ Error profiling: {e}', err=True)
+
 def clear_data(db):
     """
-    Delete existing products and price history from the database.
+    Delete existing products, price history, its rollups and statistics from the database.
     """
     try:
-        PriceHistory.query.delete()
+        for model in (PriceHistoryDay, PriceHistoryHour, PriceHistoryMinute, RollupWatermark, ProductPriceStats,
+                      PriceHistory):
+            model.query.delete()
         Product.query.delete()
         db.session.commit()
     except Exception as e:
@@ -0,0 +1,86 @@
+from typing import Dict
+import logging
+from flask import Flask, current_app, g
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from app.database.connection import db
+
+logger = logging.getLogger(__name__)
+
+READ_ENGINE = 'sqlite_read_engine'
+
+# PRAGMAs aplicados a cada nova conexão, por perfil
+PROFILES: Dict[str, Dict[str, object]] = {
+    # Comportamento padrão do SQLite (journal de rollback, leitores bloqueiam o escritor)
+    'default': {},
+    # WAL: leitores não esperam o escritor e vice-versa
+    'concurrent': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # em KiB
+        'temp_store': 'MEMORY',
+    },
+}
+
+
+def supports_read_engine(uri: str) -> bool:
+    url = make_url(uri)
+    # Banco em memória é por conexão: uma engine separada veria outro banco
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def install(app: Flask) -> None:
+    """
+    Registra os PRAGMAs de conexão, a engine somente leitura e o teardown da sessão de leitura.
+    Deve rodar depois de `db.init_app`.
+    """
+    profile = app.config.get('SQLITE_PROFILE', 'default')
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown SQLITE_PROFILE '{profile}' (expected one of {', '.join(PROFILES)})")
+    pragmas = PROFILES[profile]
+    with app.app_context():
+        engine = db.engine
+    if pragmas and engine.url.get_backend_name() == 'sqlite':
+        _listen(engine, pragmas)
+        if supports_read_engine(str(engine.url)):
+            # Mesmo arquivo (caminho já resolvido para a pasta instance), conexões próprias
+            read_engine = create_engine(engine.url, pool_size=app.config.get('SQLITE_READ_POOL_SIZE', 8),
+                                        max_overflow=0)
+            # journal_mode é persistente no arquivo; a engine de leitura não precisa (nem pode) alterá-lo
+            read_pragmas = {k: v for k, v in pragmas.items() if k != 'journal_mode'}
+            _listen(read_engine, {**read_pragmas, 'query_only': 'ON'})
+            app.extensions[READ_ENGINE] = read_engine
+    logger.info(f"SQLite profile '{profile}' (read engine: {READ_ENGINE in app.extensions})")
+
+    @app.teardown_appcontext
+    def _close_read_session(exception=None):
+        session = g.pop('_read_session', None)
+        if session is not None:
+            session.close()
+
+
+def _listen(engine, pragmas: Dict[str, object]) -> None:
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+
+def read_session() -> Session:
+    """
+    Sessão das rotas de leitura: a da engine somente leitura, quando o perfil tem uma, ou `db.session`.
+    """
+    read_engine = current_app.extensions.get(READ_ENGINE)
+    if read_engine is None:
+        return db.session
+    session = g.get('_read_session')
+    if session is None:
+        session = g._read_session = Session(bind=read_engine, autoflush=False)
+    return session
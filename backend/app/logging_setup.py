@@ -0,0 +1,125 @@
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from threading import Lock
+from time import monotonic
+from typing import Dict, Optional
+import atexit
+import logging
+
+LOG_FORMAT = '%(asctime)s [%(levelname)s] %(name)s: %(message)s'
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+_setup_lock = Lock()
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler que deixa a formatação para a thread de escrita.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class RateSampler(logging.Filter):
+    """
+    Deixa passar no máximo `rate` registros por segundo por modelo de mensagem.
+    Registros de WARNING para cima nunca são descartados.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+        self._windows: Dict[tuple, list] = {}
+        self._lock = Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate <= 0 or record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.msg)
+        now = monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= 1.0:
+                dropped = window[2] if window else 0
+                self._windows[key] = window = [now, 0, 0]
+                if dropped:
+                    record.msg = f'{record.msg} [{dropped} similar messages sampled out]'
+            if window[1] >= self.rate:
+                window[2] += 1
+                return False
+            window[1] += 1
+        return True
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """
+    Converte `"app.services.price_automation=DEBUG,werkzeug=WARNING"` em um dict.
+
+    Raises:
+        ValueError: Se uma entrada estiver malformada ou citar um nível desconhecido.
+    """
+    levels = {}
+    for entry in filter(None, (part.strip() for part in (spec or '').split(','))):
+        name, sep, level = entry.partition('=')
+        if not sep or not name.strip():
+            raise ValueError(f"Invalid log level entry '{entry}' (expected logger=LEVEL)")
+        levels[name.strip()] = _check_level(level)
+    return levels
+
+
+def _check_level(level: str) -> str:
+    level = str(level).strip().upper()
+    if not isinstance(logging.getLevelName(level), int):
+        raise ValueError(f"Unknown log level '{level}'")
+    return level
+
+
+def configure_logging(level: str = 'INFO', levels: Optional[Dict[str, str]] = None, sample_rate: float = 0) -> None:
+    """
+    Envia todo o logging para uma fila esvaziada por uma thread de escrita.
+    Chamadas seguintes só atualizam os níveis e a amostragem.
+    """
+    global _listener, _queue_handler
+    with _setup_lock:
+        root = logging.getLogger()
+        if _queue_handler is None:
+            stream = logging.StreamHandler()
+            stream.setFormatter(logging.Formatter(LOG_FORMAT))
+            queue = SimpleQueue()
+            _queue_handler = _DeferredQueueHandler(queue)
+            _listener = QueueListener(queue, stream, respect_handler_level=True)
+            _listener.start()
+            atexit.register(_listener.stop)
+            root.addHandler(_queue_handler)
+        for sampler in [f for f in _queue_handler.filters if isinstance(f, RateSampler)]:
+            _queue_handler.removeFilter(sampler)
+        if sample_rate:
+            _queue_handler.addFilter(RateSampler(sample_rate))
+        root.setLevel(_check_level(level))
+        for name, name_level in (levels or {}).items():
+            set_level(name, name_level)
+
+
+def set_level(name: str, level: str) -> str:
+    """
+    Altera o nível de um logger em tempo de execução ('root' ou '' para o logger raiz).
+
+    Raises:
+        ValueError: Se o nível for desconhecido.
+    """
+    level = _check_level(level)
+    logging.getLogger(None if name in ('', 'root') else name).setLevel(level)
+    return level
+
+
+def get_levels() -> Dict[str, str]:
+    """
+    Níveis efetivos do logger raiz e de cada logger com nível próprio.
+    """
+    levels = {'root': logging.getLevelName(logging.getLogger().level)}
+    for name, logger in sorted(logging.Logger.manager.loggerDict.items()):
+        if isinstance(logger, logging.Logger) and logger.level != logging.NOTSET:
+            levels[name] = logging.getLevelName(logger.level)
+    return levels
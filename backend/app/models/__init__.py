@@ -0,0 +1,4 @@
+from app.models.product import Product, PriceHistory
+from app.models.price_rollup import PriceHistoryMinute, PriceHistoryHour, PriceHistoryDay, RollupWatermark
+from app.models.automation_lease import AutomationLease
+from app.models.price_stats import ProductPriceStats
@@ -0,0 +1,17 @@
+from app.database.connection import db
+
+class AutomationLease(db.Model):
+    """
+    Lease de um laço em segundo plano compartilhado pelos workers: quem o detém
+    (holder) roda os ciclos e publica o status; os demais apenas leem esta linha.
+    """
+    __tablename__ = 'automation_leases'
+
+    name = db.Column(db.String(64), primary_key=True)
+    holder = db.Column(db.String(128), nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    # Estado desejado (ligado/desligado), válido para todos os workers
+    enabled = db.Column(db.Boolean, nullable=False, default=False)
+    # Último status publicado pelo holder (JSON)
+    status = db.Column(db.Text, nullable=True)
@@ -0,0 +1,51 @@
+from sqlalchemy.orm import declared_attr
+from app.database.connection import db
+
+class PriceRollupMixin:
+    """
+    Colunas comuns das tabelas de agregação (OHLC) do histórico de preços.
+    """
+    BUCKET_SECONDS = None
+
+    @declared_attr
+    def product_id(cls):
+        return db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+
+    bucket = db.Column(db.DateTime, primary_key=True, index=True)
+    open = db.Column(db.Float, nullable=False)
+    high = db.Column(db.Float, nullable=False)
+    low = db.Column(db.Float, nullable=False)
+    close = db.Column(db.Float, nullable=False)
+    count = db.Column(db.Integer, nullable=False)
+
+    def to_dict(self):
+        return {
+            'product_id': self.product_id,
+            'bucket': self.bucket.isoformat(),
+            'open': self.open,
+            'high': self.high,
+            'low': self.low,
+            'close': self.close,
+            'count': self.count
+        }
+
+class PriceHistoryMinute(PriceRollupMixin, db.Model):
+    __tablename__ = 'price_history_minute'
+    BUCKET_SECONDS = 60
+
+class PriceHistoryHour(PriceRollupMixin, db.Model):
+    __tablename__ = 'price_history_hour'
+    BUCKET_SECONDS = 3600
+
+class PriceHistoryDay(PriceRollupMixin, db.Model):
+    __tablename__ = 'price_history_day'
+    BUCKET_SECONDS = 86400
+
+class RollupWatermark(db.Model):
+    """
+    Limite superior (exclusivo) do intervalo já agregado em cada camada.
+    """
+    __tablename__ = 'price_rollup_watermarks'
+
+    tier = db.Column(db.String(32), primary_key=True)
+    watermark = db.Column(db.DateTime, nullable=False)
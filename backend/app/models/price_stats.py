@@ -0,0 +1,17 @@
+from app.database.connection import db
+
+class ProductPriceStats(db.Model):
+    """
+    Somas acumuladas de todo o histórico de preços de um produto. O instante até
+    o qual a tabela está completa fica em `price_rollup_watermarks`.
+    """
+    __tablename__ = 'product_price_stats'
+
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    count = db.Column(db.Integer, nullable=False)
+    total = db.Column(db.Float, nullable=False)
+    total_sq = db.Column(db.Float, nullable=False)
+    min_price = db.Column(db.Float, nullable=False)
+    max_price = db.Column(db.Float, nullable=False)
+    first_at = db.Column(db.DateTime, nullable=False)
+    last_at = db.Column(db.DateTime, nullable=False)
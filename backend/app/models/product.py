@@ -2,6 +2,7 @@ from datetime import datetime, timezone
 from sqlalchemy import CheckConstraint, Index
 from sqlalchemy.orm import validates
 from app.database.connection import db
+from app.models.storage import Price, Timestamp
 
 class Product(db.Model):
     __tablename__ = 'products'
@@ -9,12 +10,12 @@ class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, index=True)
     description = db.Column(db.Text)
-    original_price = db.Column(db.Float, nullable=False)
-    current_price = db.Column(db.Float, nullable=False)
+    original_price = db.Column(Price, nullable=False)
+    current_price = db.Column(Price, nullable=False)
     category = db.Column(db.String(50), index=True)
     image = db.Column(db.String(255), default='https://picsum.photos/300/200')
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
-    updated_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    created_at = db.Column(Timestamp, default=datetime.now(timezone.utc))
+    updated_at = db.Column(Timestamp, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc), index=True)
     
     price_history = db.relationship('PriceHistory', backref='product', lazy='dynamic', cascade='all, delete-orphan')
 
@@ -55,8 +56,8 @@ class PriceHistory(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False, index=True)
-    price = db.Column(db.Float, nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.now(timezone.utc), index=True)
+    price = db.Column(Price, nullable=False)
+    timestamp = db.Column(Timestamp, default=datetime.now(timezone.utc), index=True)
 
     __table_args__ = (
         CheckConstraint('price >= 0', name='check_price_non_negative'),
@@ -79,4 +80,19 @@ class PriceHistory(db.Model):
 
     @classmethod
     def get_recent_history(cls, product_id: int, limit: int = 10):
-        return cls.query.filter_by(product_id=product_id).order_by(cls.timestamp.desc()).limit(limit).all()
\ No newline at end of file
+        return cls.query.filter_by(product_id=product_id).order_by(cls.timestamp.desc()).limit(limit).all()
+
+    @classmethod
+    def get_recent_points(cls, product_id: int, limit: int = 10):
+        """
+        Últimos `limit` pontos do produto (`HistoryPoint`: preço e instante), do mais recente para o mais antigo.
+        Vêm do buffer em memória quando ele cobre o pedido; senão, do banco.
+        """
+        # Importados aqui: app e o leitor de histórico dependem deste módulo
+        from app import recent_history
+        from app.services.price_history_reader import fetch_page
+        if limit <= recent_history.capacity:
+            points = recent_history.last(db.session, product_id, limit)
+            if points is not None:
+                return points
+        return fetch_page(db.session, product_id, limit=limit)
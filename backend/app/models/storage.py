@@ -0,0 +1,156 @@
+from abc import ABCMeta, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import numpy as np
+from sqlalchemy import BigInteger, DateTime, Float, Integer, inspect, type_coerce
+from sqlalchemy.types import TypeDecorator
+
+# Formatos de armazenamento de preços e instantes:
+# 'float' (padrão): preços REAL e instantes como texto ISO; 'compact': centavos e epoch ms inteiros
+FLOAT = 'float'
+COMPACT = 'compact'
+STORAGE_FORMATS = (FLOAT, COMPACT)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NAIVE_EPOCH = _EPOCH.replace(tzinfo=None)
+
+
+def storage_format(dialect) -> str:
+    return getattr(dialect, 'price_storage', FLOAT)
+
+
+def set_storage_format(engine, fmt: str) -> None:
+    """
+    Define o formato das colunas `Price`/`Timestamp` de uma engine; deve rodar antes do primeiro comando dela.
+    """
+    if fmt not in STORAGE_FORMATS:
+        raise ValueError(f"Unknown storage format '{fmt}' (expected one of {', '.join(STORAGE_FORMATS)})")
+    engine.dialect.price_storage = fmt
+
+
+def detect_storage_format(engine) -> Optional[str]:
+    """
+    Formato de um banco existente, lido do tipo de `products.current_price` (`None` se a tabela não existe).
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table('products'):
+        return None
+    column = next((c for c in inspector.get_columns('products') if c['name'] == 'current_price'), None)
+    if column is None:
+        return None
+    return COMPACT if isinstance(column['type'], Integer) else FLOAT
+
+
+def detect_sqlite_storage_format(dbapi_connection) -> Optional[str]:
+    """
+    `detect_storage_format` numa conexão SQLite crua, para listeners `first_connect`.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        columns = cursor.execute('PRAGMA table_info(products)').fetchall()
+    finally:
+        cursor.close()
+    declared = next((column[2] for column in columns if column[1] == 'current_price'), None)
+    if declared is None:
+        return None
+    # Afinidade de tipo do SQLite: qualquer tipo declarado com "INT" é inteiro
+    return COMPACT if 'INT' in declared.upper() else FLOAT
+
+
+def is_compact(session) -> bool:
+    return storage_format(session.get_bind().dialect) == COMPACT
+
+
+def stored(column):
+    """
+    `column` lida como o inteiro armazenado, sem conversão (só no formato compacto).
+    """
+    return type_coerce(column, BigInteger)
+
+
+def to_millis(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    delta = value - _EPOCH
+    return (delta.days * 86_400 + delta.seconds) * 1000 + delta.microseconds // 1000
+
+
+def from_millis(value: int) -> datetime:
+    # Mesmo resultado do DateTime no SQLite: UTC sem fuso
+    return _NAIVE_EPOCH + timedelta(milliseconds=value)
+
+
+def to_cents(prices: np.ndarray) -> np.ndarray:
+    return np.rint(np.asarray(prices, dtype=np.float64) * 100).astype(np.int64)
+
+
+class _StorageType(TypeDecorator, metaclass=ABCMeta):
+    """
+    Coluna convertida por `to_stored`/`from_stored` no formato compacto; no padrão, sem custo extra.
+    """
+    compact_type = BigInteger
+
+    @staticmethod
+    @abstractmethod
+    def to_stored(value):
+        """
+        Valor do modelo para o inteiro armazenado.
+        """
+
+    @staticmethod
+    @abstractmethod
+    def from_stored(value):
+        """
+        Inteiro armazenado para o valor do modelo.
+        """
+
+    def load_dialect_impl(self, dialect):
+        if storage_format(dialect) == COMPACT:
+            return dialect.type_descriptor(self.compact_type())
+        return dialect.type_descriptor(self.impl_instance)
+
+    def bind_processor(self, dialect):
+        if storage_format(dialect) != COMPACT:
+            return self.load_dialect_impl(dialect).bind_processor(dialect)
+        to_stored = self.to_stored
+
+        def process(value):
+            return None if value is None else to_stored(value)
+        return process
+
+    def result_processor(self, dialect, coltype):
+        if storage_format(dialect) != COMPACT:
+            return self.load_dialect_impl(dialect).result_processor(dialect, coltype)
+        from_stored = self.from_stored
+
+        def process(value):
+            return None if value is None else from_stored(value)
+        return process
+
+
+class Price(_StorageType):
+    """
+    Preço: REAL, ou centavos inteiros no formato compacto.
+    """
+    impl = Float
+    compact_type = Integer
+    cache_ok = True
+
+    @staticmethod
+    def to_stored(value):
+        return int(round(value * 100))
+
+    @staticmethod
+    def from_stored(value):
+        return value / 100
+
+
+class Timestamp(_StorageType):
+    """
+    Instante UTC: texto ISO, ou milissegundos desde a época no formato compacto. Lido como datetime UTC sem fuso.
+    """
+    impl = DateTime
+    compact_type = BigInteger
+    cache_ok = True
+    to_stored = staticmethod(to_millis)
+    from_stored = staticmethod(from_millis)
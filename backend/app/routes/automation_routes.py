@@ -1,9 +1,10 @@
-from flask import Blueprint, jsonify, make_response, current_app
+from flask import Blueprint, jsonify, make_response, current_app, request, send_file
 from flask_caching import Cache
+from app.logging_setup import get_levels, parse_levels, set_level
+from app.services.profiler import profiler
 import logging
+import os
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s [%(levelname)s] %(message)s')
 logger = logging.getLogger(__name__)
 
 automation_bp = Blueprint('automation', __name__, url_prefix='/automation')
@@ -51,6 +52,9 @@ def start():
     try:
         logger.debug("Attempting to start price automation")
         if current_app.price_automation.start():
+            # A compactação do histórico roda ao lado da automação (com lease, segue o líder)
+            if current_app.price_automation.lease is None and current_app.config.get('HISTORY_COMPACTION_INTERVAL', 0) > 0:
+                current_app.history_compactor.start()
             response = make_response(jsonify({'message': 'Automation started.'}), 200)
             response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
             response.headers['Pragma'] = 'no-cache'
@@ -111,6 +115,7 @@ def stop():
     try:
         logger.debug("Attempting to stop price automation")
         if current_app.price_automation.stop():
+            current_app.history_compactor.stop()
             response = make_response(jsonify({'message': 'Automation stopped.'}), 200)
             response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
             response.headers['Pragma'] = 'no-cache'
@@ -155,6 +160,22 @@ def status():
                 error_count:
                   type: integer
                   example: 0
+                leader:
+                  type: object
+                  nullable: true
+                  description: Lease entre workers (null quando PRICE_AUTOMATION_LEASE_TTL = 0); os contadores acima são os publicados pelo líder.
+                  properties:
+                    holder:
+                      type: string
+                      example: "web-1:4242:9f1c2a3b"
+                    expires_at:
+                      type: string
+                    heartbeat_at:
+                      type: string
+                    worker:
+                      type: string
+                    is_leader:
+                      type: boolean
                 interval:
                   type: number
                   example: 10
@@ -182,12 +203,232 @@ def status():
     try:
         logger.debug("Fetching price automation status")
         status = current_app.price_automation.get_status()
+        status['compaction'] = current_app.history_compactor.get_status()
         response = make_response(jsonify(status), 200)
         response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
         response.headers['Pragma'] = 'no-cache'
         response.headers['Expires'] = '0'
-        logger.info(f"Automation status: {status}")
+        logger.debug("Automation status: %s", status)
         return response
     except Exception as e:
         logger.error(f"Failed to get automation status: {str(e)}")
-        return jsonify({'error': 'Failed to get automation status', 'details': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': 'Failed to get automation status', 'details': str(e)}), 500
+
+@automation_bp.route('/rules', methods=['GET'])
+def get_rules():
+    """
+    Retorna as regras de precificação em uso.
+    ---
+    tags:
+      - Automação
+    responses:
+      200:
+        description: Lista de regras (vazia = apenas a faixa global de preços).
+    """
+    return jsonify(current_app.price_automation.rules), 200
+
+@automation_bp.route('/rules', methods=['PUT'])
+def set_rules():
+    """
+    Substitui as regras de precificação.
+    As regras são compiladas uma vez em uma tabela de parâmetros por categoria e avaliadas em lote a cada ciclo,
+    com a categoria atual de cada produto.
+    Regras de uma categoria sobrepõem as regras gerais (`"*"` ou sem categoria), campo a campo;
+    se a combinação resultar em `min_factor` maior que `max_factor`, as regras são recusadas (400).
+    ---
+    tags:
+      - Automação
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: array
+          items:
+            type: object
+            properties:
+              category:
+                type: string
+                example: Electronics
+              min_factor:
+                type: number
+                example: 0.9
+              max_factor:
+                type: number
+                example: 1.1
+              floor:
+                type: number
+                description: Preço mínimo
+                example: 49.9
+              max_step:
+                type: number
+                description: Maior variação relativa por ciclo
+                example: 0.05
+              ending:
+                type: number
+                description: Centavos finais do preço (0.90 ou 0.99)
+                example: 0.99
+    responses:
+      200:
+        description: Regras aplicadas.
+      400:
+        description: Regras inválidas.
+    """
+    try:
+        current_app.price_automation.set_rules(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': 'Regras inválidas', 'details': str(e)}), 400
+    logger.info(f"Pricing rules updated: {current_app.price_automation.rules}")
+    return jsonify(current_app.price_automation.rules), 200
+
+@automation_bp.route('/profile', methods=['POST'])
+def arm_profiler():
+    """
+    Arma o profiler para os próximos N ciclos da automação ou as próximas N requisições a uma rota.
+    Cada captura roda cProfile, amostragem de pilhas e tempos das consultas SQL, e é gravada em
+    `PROFILE_DIR` como `.pstats`, `.collapsed` (entrada de flamegraph) e `.sql.json`.
+    Desarmado (padrão), o profiler não tem custo.
+    ---
+    tags:
+      - Automação
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            target:
+              type: string
+              enum: [cycle, request]
+              example: cycle
+            count:
+              type: integer
+              example: 3
+            route:
+              type: string
+              description: Regra (/products/<int:id>) ou caminho (/products/1); obrigatório para request
+              example: /products
+    responses:
+      200:
+        description: Profiler armado.
+      400:
+        description: Parâmetros inválidos.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        status = profiler.arm(data.get('target', 'cycle'), data.get('count', 1), data.get('route'))
+    except ValueError as e:
+        return jsonify({'error': 'Parâmetros inválidos', 'details': str(e)}), 400
+    return jsonify(status), 200
+
+@automation_bp.route('/profile', methods=['DELETE'])
+def disarm_profiler():
+    """
+    Desarma o profiler.
+    ---
+    tags:
+      - Automação
+    responses:
+      200:
+        description: Profiler desarmado.
+    """
+    profiler.disarm()
+    return jsonify(profiler.get_status()), 200
+
+@automation_bp.route('/profile', methods=['GET'])
+def profiler_status():
+    """
+    Retorna o estado do profiler e os resumos das capturas recentes.
+    ---
+    tags:
+      - Automação
+    responses:
+      200:
+        description: Estado do profiler e capturas.
+    """
+    return jsonify({**profiler.get_status(), 'captures': profiler.captures()}), 200
+
+@automation_bp.route('/profile/<capture_id>', methods=['GET'])
+def get_profile(capture_id):
+    """
+    Retorna uma captura do profiler.
+    Sem `format`, retorna o resumo (duração, funções mais caras e consultas SQL mais lentas).
+    ---
+    tags:
+      - Automação
+    parameters:
+      - name: capture_id
+        in: path
+        type: string
+        required: true
+      - name: format
+        in: query
+        type: string
+        enum: [pstats, collapsed, sql.json]
+        required: false
+        description: Arquivo da captura a baixar
+    responses:
+      200:
+        description: Resumo ou arquivo da captura.
+      404:
+        description: Captura ou arquivo não encontrado.
+    """
+    capture = profiler.get_capture(capture_id)
+    if capture is None:
+        return jsonify({'error': 'Captura não encontrada'}), 404
+    fmt = request.args.get('format')
+    if not fmt:
+        return jsonify(capture), 200
+    path = capture['files'].get(fmt)
+    if path is None or not os.path.exists(path):
+        return jsonify({'error': 'Arquivo não encontrado'}), 404
+    return send_file(path, as_attachment=True, download_name=os.path.basename(path))
+
+@automation_bp.route('/logging', methods=['GET'])
+def get_log_levels():
+    """
+    Retorna os níveis de log em uso (raiz e módulos com nível próprio).
+    ---
+    tags:
+      - Automação
+    responses:
+      200:
+        description: Mapa módulo -> nível.
+    """
+    return jsonify(get_levels()), 200
+
+@automation_bp.route('/logging', methods=['PUT'])
+def set_log_levels():
+    """
+    Altera níveis de log em tempo de execução, por módulo.
+    ---
+    tags:
+      - Automação
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          additionalProperties:
+            type: string
+          example: {"app.services.price_automation": "DEBUG", "root": "INFO"}
+    responses:
+      200:
+        description: Níveis aplicados.
+      400:
+        description: Nível ou corpo inválido.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Corpo inválido', 'details': 'esperado um objeto {módulo: nível}'}), 400
+    try:
+        # Valida tudo antes de aplicar qualquer nível
+        levels = parse_levels(','.join(f'{name or "root"}={level}' for name, level in data.items()))
+    except ValueError as e:
+        return jsonify({'error': 'Nível inválido', 'details': str(e)}), 400
+    for name, level in levels.items():
+        set_level(name, level)
+    logger.info("Log levels updated: %s", levels)
+    return jsonify(get_levels()), 200
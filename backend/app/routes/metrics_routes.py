@@ -0,0 +1,23 @@
+from flask import Blueprint, Response
+from app.services import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Retorna as métricas da aplicação no formato texto do Prometheus.
+    Inclui a duração dos ciclos da automação (total e por fase: load, compute, flush, commit),
+    produtos por segundo, linhas de histórico gravadas, espera pelo lock da automação
+    e histogramas de latência por rota dos blueprints de produtos e de automação.
+    ---
+    tags:
+      - Métricas
+    produces:
+      - text/plain
+    responses:
+      200:
+        description: Métricas no formato de exposição do Prometheus.
+    """
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE,
+                    headers={'Cache-Control': 'no-store'})
@@ -1,16 +1,29 @@
-from flask import Blueprint, jsonify, abort, make_response
-from app.models.product import Product, PriceHistory
+from flask import Blueprint, Response, current_app, jsonify, abort, make_response, request
+from app.models.product import Product
+from sqlalchemy import func, select
 from sqlalchemy.exc import SQLAlchemyError
-from app.database.connection import db
-from app import cache
+from app.database.sqlite_profile import read_session
+from app import price_stats, read_cache, recent_history
+from app.services.catalog_version import current_version, parse_since
+from app.services.downsampling import lttb, ohlc_buckets, parse_resolution
+from app.services.price_history_reader import fetch_ohlc_series, fetch_page, format_timestamp, ms_to_iso, oldest_point
+from app.services import wire_format
+from datetime import datetime, timezone
 import logging
+import sys
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s [%(levelname)s] %(message)s')
 logger = logging.getLogger(__name__)
 
 products_bp = Blueprint('products', __name__)
 
+DEFAULT_HISTORY_LIMIT = 1000
+MAX_HISTORY_LIMIT = 10000
+DEFAULT_LTTB_POINTS = 500
+DEFAULT_STATS_LIMIT = 100
+MAX_STATS_LIMIT = 1000
+# Linhas buscadas por vez do cursor ao transmitir o catálogo
+STREAM_YIELD_PER = 2000
+
 def serialize_product(product):
     return {
         'id': product.id,
@@ -23,38 +36,143 @@ def serialize_product(product):
         'lastUpdate': product.updated_at.isoformat() if product.updated_at else None
     }
 
-def serialize_price_history(history):
+def _product_row(row):
+    # Mesmo formato de serialize_product; o codificador escreve a data em ISO 8601
     return {
-        'price': history.price,
-        'timestamp': history.timestamp.isoformat()
+        'id': row.id,
+        'name': row.name,
+        'description': row.description,
+        'originalPrice': row.original_price,
+        'currentPrice': row.current_price,
+        'category': row.category,
+        'image': row.image,
+        'lastUpdate': row.updated_at
     }
 
+_product_columns = select(
+    Product.id, Product.name, Product.description, Product.original_price, Product.current_price,
+    Product.category, Product.image, Product.updated_at
+)
+
 @products_bp.route('/products', methods=['GET'])
-@cache.cached(timeout=0)  # Disable caching for this endpoint
 def get_products():
     """
     Retorna a lista de produtos cadastrados.
+    A resposta traz um ETag com a versão do catálogo; `If-None-Match` com a versão atual retorna 304.
+    Com `since`, apenas os produtos alterados depois da versão (ou data) informada são retornados.
+    O formato segue o header `Accept` (JSON, `application/x-ndjson` ou `application/x-msgpack` se disponível)
+    e a compressão segue `Accept-Encoding` (gzip, ou br se disponível).
+    Catálogos maiores que `PRODUCTS_STREAM_MIN_ROWS` são transmitidos direto do cursor, sem montar a resposta em memória.
     ---
     tags:
       - Produtos
+    parameters:
+      - name: since
+        in: query
+        type: string
+        required: false
+        description: Versão do catálogo (header X-Catalog-Version) ou data ISO 8601
+      - name: If-None-Match
+        in: header
+        type: string
+        required: false
+        description: ETag recebido na última resposta
     responses:
       200:
-        description: Lista de produtos.
+        description: Lista de produtos (ou apenas os alterados, com `since`).
+      304:
+        description: O catálogo não mudou desde o ETag informado.
+      400:
+        description: Parâmetro `since` inválido.
     """
     try:
-        logger.debug("Fetching products from database")
-        products = Product.query.all()
-        serialized = [serialize_product(p) for p in products]
-        logger.info(f"Returning {len(serialized)} products")
-        response = make_response(jsonify(serialized), 200)
-        response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
-        return response
+        # A versão é lida antes dos dados: no pior caso o cliente recebe dados mais novos que o ETag
+        version = current_version(read_session())
+        mimetype, encoding = wire_format.negotiate(request)
+        representation = wire_format.variant(mimetype, encoding)
+        # Cada representação (formato/compressão) tem seu próprio ETag
+        etag = f'catalog-{version}' + (f'-{representation}' if representation else '')
+        since = request.args.get('since')
+        if since is None and request.if_none_match.contains(etag):
+            return _catalog_response(make_response('', 304), etag, version)
+
+        if since is not None:
+            try:
+                since_ts = parse_since(since)
+            except ValueError:
+                return jsonify({'error': 'Parâmetro since inválido', 'details': since}), 400
+            logger.debug("Streaming products changed since %s", since)
+            response = _stream_products(_product_columns.where(Product.updated_at > since_ts), mimetype, encoding)
+        else:
+            body = None
+            if mimetype == wire_format.JSON:
+                body = read_cache.get_or_set(f'products:v{version}', _build_products_body)
+            if body is None:
+                response = _stream_products(_product_columns, mimetype, encoding)
+            else:
+                if encoding:
+                    body = read_cache.get_or_set(f'products:v{version}:{encoding}',
+                                                 lambda: wire_format.compress_body(body, encoding))
+                response = wire_format.body_response(body, mimetype, encoding)
+        return _catalog_response(response, etag, version)
     except SQLAlchemyError as e:
         logger.error(f"Database error fetching products: {str(e)}")
         return jsonify({'error': 'Erro ao buscar produtos', 'details': str(e)}), 500
 
+def _build_products_body():
+    # Catálogos grandes não são montados em memória nem cacheados: a resposta é transmitida
+    total = _count(_product_columns)
+    if total > current_app.config.get('PRODUCTS_STREAM_MIN_ROWS', 10000):
+        logger.debug("Catalog has %d products, streaming instead of caching", total)
+        return None
+    logger.debug("Serializing %d products", total)
+    return b''.join(wire_format.encode_rows(_product_rows(_product_columns)))
+
+def _product_rows(statement):
+    rows = read_session().execute(statement.order_by(Product.id).execution_options(yield_per=STREAM_YIELD_PER))
+    return (_product_row(row) for row in rows)
+
+def _count(statement):
+    return read_session().execute(select(func.count()).select_from(statement.subquery())).scalar()
+
+def _stream_products(statement, mimetype, encoding):
+    # O MessagePack precisa do total no cabeçalho do array
+    count = _count(statement) if mimetype == wire_format.MSGPACK else None
+    return wire_format.stream_response(_product_rows(statement), mimetype, encoding, count=count)
+
+def _json_body(data):
+    return wire_format.dumps(data)
+
+def _json_response(body, status=200):
+    return make_response(body, status, {'Content-Type': 'application/json'})
+
+def _catalog_response(response, etag, version):
+    response.set_etag(etag)
+    response.headers['X-Catalog-Version'] = str(version)
+    # Sempre revalidar, mas permitir que o cliente reutilize o corpo com 304
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@products_bp.route('/products/stream', methods=['GET'])
+def stream_products():
+    """
+    Transmite as mudanças de preço via Server-Sent Events.
+    Cada evento `prices` traz apenas os produtos alterados em um ciclo da automação.
+    Um evento `dropped` indica que o cliente ficou para trás e deve recarregar `/products`.
+    ---
+    tags:
+      - Produtos
+    produces:
+      - text/event-stream
+    responses:
+      200:
+        description: "Fluxo de eventos `prices` com itens `{id, currentPrice, lastUpdate}`."
+    """
+    subscription = current_app.price_automation.price_stream.subscribe()
+    response = Response(subscription.events(), mimetype='text/event-stream')
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @products_bp.route('/products/<int:id>', methods=['GET'])
 def get_product(id):
     """
@@ -75,17 +193,47 @@ def get_product(id):
         description: Produto não encontrado.
     """
     try:
-        product = db.session.get(Product, id)
-        if not product:
+        body = read_cache.get_or_set(f'product:{id}', lambda: _build_product_body(id))
+        if body is None:
             abort(404, description="Produto não encontrado")
-        return jsonify(serialize_product(product)), 200
+        return _json_response(body)
     except SQLAlchemyError as e:
         return jsonify({'error': 'Erro ao buscar produto', 'details': str(e)}), 500
 
+def _build_product_body(id):
+    product = read_session().get(Product, id)
+    return _json_body(serialize_product(product)) if product else None
+
+@products_bp.route('/products/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """
+    Retorna os contadores de acerto/falha do cache de leitura dos produtos.
+    ---
+    tags:
+      - Produtos
+    responses:
+      200:
+        description: Contadores do cache local (LRU), do cache compartilhado, do buffer de histórico recente e das estatísticas de preço.
+    """
+    return jsonify({
+        **read_cache.get_status(),
+        'recent_history': recent_history.get_status(),
+        'price_stats': price_stats.get_status(),
+    }), 200
+
 @products_bp.route('/products/<int:id>/history', methods=['GET'])
 def get_product_history(id):
     """
     Retorna o histórico de preços de um produto.
+    Sem `resolution`, retorna os pontos brutos do mais recente para o mais antigo, paginados por `before`/`limit`.
+    O cursor da próxima página vem no header `X-Next-Before`. A primeira página pode ter menos de `limit`
+    pontos (os mais recentes, em memória); as demais seguem pelo cursor.
+    Com `resolution=<n>s|m|h|d`, retorna velas OHLC por intervalo de tempo.
+    Com `resolution=lttb`, retorna até `points` pontos escolhidos pelo algoritmo LTTB (para gráficos).
+    Os modos agregados usam as tabelas de minuto/hora/dia já compactadas sempre que cobrem o intervalo.
+    O histórico bruto antigo pode estar no arquivo colunar (HISTORY_ARCHIVE_AFTER_DAYS); a leitura é transparente.
+    Formato e compressão seguem `Accept` e `Accept-Encoding`, como em `/products`.
+    Em todos os modos, os instantes vêm em ISO 8601 (UTC, sem fuso) com microssegundos.
     ---
     tags:
       - Produtos
@@ -95,19 +243,227 @@ def get_product_history(id):
         type: integer
         required: true
         description: ID do produto
+      - name: from
+        in: query
+        type: string
+        required: false
+        description: Início do intervalo (ISO 8601 ou epoch em ms)
+      - name: to
+        in: query
+        type: string
+        required: false
+        description: Fim do intervalo (ISO 8601 ou epoch em ms)
+      - name: before
+        in: query
+        type: string
+        required: false
+        description: Cursor de paginação (valor de X-Next-Before)
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Pontos por página (padrão 1000, máximo 10000)
+      - name: resolution
+        in: query
+        type: string
+        required: false
+        description: "raw (padrão), um intervalo como 1m, 1h, 1d (OHLC) ou lttb"
+      - name: points
+        in: query
+        type: integer
+        required: false
+        description: Número de pontos para resolution=lttb (padrão 500)
     responses:
       200:
         description: Histórico de preços.
+      400:
+        description: Parâmetros inválidos.
       404:
         description: Produto não encontrado.
     """
     try:
-        product = db.session.get(Product, id)
-        if not product:
+        try:
+            start = _parse_time_arg('from')
+            end = _parse_time_arg('to')
+            before = _parse_time_arg('before')
+            limit = _parse_int_arg('limit', DEFAULT_HISTORY_LIMIT, MAX_HISTORY_LIMIT)
+            points = _parse_int_arg('points', DEFAULT_LTTB_POINTS, MAX_HISTORY_LIMIT)
+            resolution = request.args.get('resolution', 'raw')
+            bucket_seconds = parse_resolution(resolution) if resolution not in ('raw', 'lttb') else None
+        except ValueError as e:
+            return jsonify({'error': 'Parâmetros inválidos', 'details': str(e)}), 400
+        mimetype, encoding = wire_format.negotiate(request)
+
+        archive = current_app.history_archive
+        # Intervalos inteiramente arquivados são lidos só dos arquivos, sem consultar o banco
+        if not archive.covers(end) and not read_session().get(Product, id):
             abort(404, description="Produto não encontrado")
 
-        history = PriceHistory.query.filter_by(product_id=id).order_by(PriceHistory.timestamp.desc()).all()
-        serialized = [serialize_price_history(h) for h in history]
-        return jsonify(serialized), 200
+        history = None
+        next_before = False
+        if resolution == 'raw' and start is None and end is None and before is None:
+            # Últimos pontos direto do buffer em memória. Com limit acima da capacidade do buffer,
+            # a primeira página traz só os mais recentes e o cursor segue pelo banco
+            history = recent_history.last(read_session(), id, limit)
+            if history is not None and len(history) == recent_history.capacity < limit:
+                next_before = True
+            elif history is not None and len(history) < limit:
+                # Buffer incompleto (ex.: histórico arquivado): o banco responde
+                history = None
+
+        if resolution == 'raw':
+            if history is None:
+                history = fetch_page(read_session(), id, start, end, before, limit, archive=archive)
+            response = wire_format.stream_response(
+                ({'price': h.price, 'timestamp': format_timestamp(h.timestamp)} for h in history), mimetype, encoding,
+                count=len(history)
+            )
+            if len(history) == limit or next_before:
+                response.headers['X-Next-Before'] = format_timestamp(history[-1].timestamp)
+            return response
+
+        if bucket_seconds:
+            # Lê da camada de agregação mais barata cujo balde divide a resolução pedida
+            series = fetch_ohlc_series(read_session(), id, start, end, aligned_to=bucket_seconds, archive=archive)
+            candles = ohlc_buckets(series['timestamp'], series['open'], series['high'], series['low'],
+                                   series['close'], series['count'], bucket_seconds)
+            rows = _serialize_candles(candles)
+            return wire_format.stream_response(rows, mimetype, encoding, count=len(rows))
+
+        # LTTB: a camada é escolhida pelo tamanho de balde que ainda gera mais pontos do que o pedido
+        range_start = start or oldest_point(read_session(), id, archive)
+        range_end = end or datetime.now(timezone.utc)
+        span = (range_end - range_start).total_seconds() if range_start else 0
+        series = fetch_ohlc_series(read_session(), id, start, end, max_tier_seconds=span / points, archive=archive)
+        ts_ms, prices = series['timestamp'], series['close']
+        keep = lttb(ts_ms, prices, points)
+        rows = [
+            {'price': price, 'timestamp': timestamp}
+            for price, timestamp in zip(prices[keep].tolist(), ms_to_iso(ts_ms[keep]))
+        ]
+        return wire_format.stream_response(rows, mimetype, encoding, count=len(rows))
     except SQLAlchemyError as e:
-        return jsonify({'error': 'Erro ao buscar histórico de preços', 'details': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': 'Erro ao buscar histórico de preços', 'details': str(e)}), 500
+
+@products_bp.route('/products/<int:id>/stats', methods=['GET'])
+def get_product_stats(id):
+    """
+    Retorna as estatísticas de preço de um produto: contagem, mínimo, máximo, média,
+    desvio padrão e volatilidade (desvio padrão / média) de todo o histórico e das janelas móveis de 24h e 7d.
+    As estatísticas são mantidas a cada ciclo da automação, sem reler o histórico.
+    Cada janela cobre baldes inteiros (1h para 24h, 6h para 7d); `since` indica o início efetivo.
+    ---
+    tags:
+      - Produtos
+    parameters:
+      - name: id
+        in: path
+        type: integer
+        required: true
+        description: ID do produto
+    responses:
+      200:
+        description: "Estatísticas `{productId, allTime, windows: {24h, 7d}}`."
+      404:
+        description: Produto não encontrado.
+    """
+    try:
+        if not read_session().get(Product, id):
+            abort(404, description="Produto não encontrado")
+        return jsonify(price_stats.get(read_session(), [id])[id]), 200
+    except SQLAlchemyError as e:
+        return jsonify({'error': 'Erro ao buscar estatísticas de preço', 'details': str(e)}), 500
+
+@products_bp.route('/products/stats', methods=['GET'])
+def get_products_stats():
+    """
+    Retorna as estatísticas de preço de vários produtos, no mesmo formato de `/products/<id>/stats`.
+    Com `ids`, retorna os produtos informados que existem; sem `ids`, percorre o catálogo por id,
+    em páginas de `limit` produtos. O cursor da próxima página vem no header `X-Next-After`.
+    ---
+    tags:
+      - Produtos
+    parameters:
+      - name: ids
+        in: query
+        type: string
+        required: false
+        description: IDs separados por vírgula (máximo 1000)
+      - name: after
+        in: query
+        type: integer
+        required: false
+        description: Cursor de paginação (valor de X-Next-After)
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Produtos por página (padrão 100, máximo 1000)
+    responses:
+      200:
+        description: Lista de estatísticas por produto.
+      400:
+        description: Parâmetros inválidos.
+    """
+    try:
+        try:
+            ids = _parse_ids_arg('ids', MAX_STATS_LIMIT)
+            after = _parse_int_arg('after', 0, sys.maxsize, minimum=0)
+            limit = _parse_int_arg('limit', DEFAULT_STATS_LIMIT, MAX_STATS_LIMIT)
+        except ValueError as e:
+            return jsonify({'error': 'Parâmetros inválidos', 'details': str(e)}), 400
+        statement = select(Product.id).order_by(Product.id)
+        if ids is not None:
+            statement = statement.where(Product.id.in_(ids))
+        else:
+            statement = statement.where(Product.id > after).limit(limit)
+        existing = read_session().execute(statement).scalars().all()
+        stats = price_stats.get(read_session(), existing)
+        response = jsonify([stats[product_id] for product_id in existing])
+        if ids is None and len(existing) == limit:
+            response.headers['X-Next-After'] = str(existing[-1])
+        return response
+    except SQLAlchemyError as e:
+        return jsonify({'error': 'Erro ao buscar estatísticas de preço', 'details': str(e)}), 500
+
+def _parse_ids_arg(name, maximum):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        ids = sorted({int(part) for part in value.split(',') if part.strip()})
+    except ValueError:
+        raise ValueError(f"{name}: lista de IDs inválida '{value}'")
+    if not 0 < len(ids) <= maximum:
+        raise ValueError(f"{name} deve ter entre 1 e {maximum} IDs")
+    return ids
+
+def _parse_time_arg(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return parse_since(value)
+    except ValueError:
+        raise ValueError(f"{name}: data inválida '{value}'")
+
+def _parse_int_arg(name, default, maximum, minimum=1):
+    raw = request.args.get(name)
+    if raw is None:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValueError(f"{name}: número inteiro inválido '{raw}'")
+    if not minimum <= value <= maximum:
+        raise ValueError(f"{name} deve estar entre {minimum} e {maximum}")
+    return value
+
+def _serialize_candles(candles):
+    return [
+        {'timestamp': timestamp, 'open': o, 'high': h, 'low': l, 'close': c, 'count': n}
+        for timestamp, o, h, l, c, n in zip(
+            ms_to_iso(candles['timestamp']), candles['open'].tolist(), candles['high'].tolist(),
+            candles['low'].tolist(), candles['close'].tolist(), candles['count'].tolist()
+        )
+    ]
@@ -0,0 +1,142 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterator, Optional, Tuple
+import logging
+import os
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.models.product import Product, PriceHistory
+from app.models.storage import is_compact, to_cents, to_millis
+from app.services.synthetic_catalog import product_attributes, product_rows, random_walk
+
+logger = logging.getLogger(__name__)
+
+products_table = Product.__table__
+history_table = PriceHistory.__table__
+
+# Produtos por lote (também define a sequência aleatória dos preços originais)
+PRODUCT_BATCH = 50_000
+# Linhas de histórico geradas por tarefa em um processo
+HISTORY_TASK_ROWS = 200_000
+# Linhas gravadas por transação
+COMMIT_ROWS = 2_000_000
+
+# Vai direto ao executemany do driver, sem o processamento de parâmetros do SQLAlchemy por linha
+_HISTORY_SQL = f'INSERT INTO {history_table.name} (product_id, price, timestamp) VALUES (?, ?, ?)'
+# Formato de texto que o tipo DateTime grava no SQLite (UTC sem fuso)
+_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+def history_points(history_days: float, interval: float) -> int:
+    return int(history_days * 86400 // interval) if interval > 0 else 0
+
+
+def _history_tasks(products: int, points: int) -> Iterator[Tuple[int, int, int]]:
+    per_task = max(1, HISTORY_TASK_ROWS // max(points, 1))
+    for batch_start in range(1, products + 1, PRODUCT_BATCH):
+        batch_end = min(batch_start + PRODUCT_BATCH, products + 1)
+        for first in range(batch_start, batch_end, per_task):
+            yield batch_start, first, min(per_task, batch_end - first)
+
+
+def _walk(batch_start: int, first: int, count: int, points: int, seed: int) -> Tuple[int, np.ndarray]:
+    # Roda nos processos: recalcula os preços originais do lote e devolve só a matriz de preços
+    base, _ = product_attributes(batch_start, first - batch_start + count, seed)
+    rng = np.random.default_rng([seed, first, 1])
+    return first, random_walk(rng, base[first - batch_start:], points)
+
+
+class BulkSeeder:
+    """
+    Carrega em massa um catálogo sintético e o seu histórico de preços.
+    """
+
+    def __init__(self, session: Session, workers: Optional[int] = None, seed: int = 0,
+                 progress: Optional[Callable[[int], None]] = None):
+        self.session = session
+        self.workers = workers
+        self.seed = seed
+        self.progress = progress or (lambda rows: None)
+
+    def run(self, products: int, history_days: float = 7, interval: float = 3600) -> dict:
+        """
+        Insere `products` produtos e `history_days` dias de histórico, um ponto a cada `interval` segundos.
+
+        Returns:
+            dict: Linhas inseridas por tabela.
+        """
+        points = history_points(history_days, interval)
+        now = datetime.now(timezone.utc)
+        indexes = self._drop_indexes()
+        try:
+            self._load_products(products, now)
+            history = self._load_history(products, points, interval, now) if points else 0
+        finally:
+            self._create_indexes(indexes)
+        return {'products': products, 'price_history': history}
+
+    def _drop_indexes(self) -> list:
+        connection = self.session.connection()
+        indexes = [index for table in (products_table, history_table) for index in table.indexes]
+        for index in indexes:
+            index.drop(connection, checkfirst=True)
+        self.session.commit()
+        return indexes
+
+    def _create_indexes(self, indexes: list) -> None:
+        self.session.rollback()
+        connection = self.session.connection()
+        for index in indexes:
+            index.create(connection, checkfirst=True)
+        self.session.commit()
+        logger.info(f"Rebuilt {len(indexes)} indexes after the bulk load")
+
+    def _load_products(self, products: int, now: datetime) -> None:
+        for first in range(1, products + 1, PRODUCT_BATCH):
+            count = min(PRODUCT_BATCH, products + 1 - first)
+            self.session.execute(insert(products_table), product_rows(first, count, self.seed, now))
+            self.progress(count)
+        self.session.commit()
+
+    def _load_history(self, products: int, points: int, interval: float, now: datetime) -> int:
+        end = now.replace(tzinfo=None)
+        compact = is_compact(self.session)
+        timestamps = [end - timedelta(seconds=interval * k) for k in range(points - 1, -1, -1)]
+        timestamps = [to_millis(ts) if compact else ts.strftime(_TIMESTAMP_FORMAT) for ts in timestamps]
+        written = pending = 0
+        for first, prices in self._generate(products, points):
+            if compact:
+                prices = to_cents(prices)
+            rows = [
+                (pid, price, ts)
+                for pid, row in zip(range(first, first + len(prices)), prices.tolist())
+                for price, ts in zip(row, timestamps)
+            ]
+            self.session.connection().exec_driver_sql(_HISTORY_SQL, rows)
+            written += len(rows)
+            pending += len(rows)
+            if pending >= COMMIT_ROWS:
+                self.session.commit()
+                pending = 0
+            self.progress(len(rows))
+        self.session.commit()
+        return written
+
+    def _generate(self, products: int, points: int) -> Iterator[Tuple[int, np.ndarray]]:
+        tasks = ((*task, points, self.seed) for task in _history_tasks(products, points))
+        if self.workers == 0:
+            for task in tasks:
+                yield _walk(*task)
+            return
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            # Poucas tarefas em andamento: memória constante e ordem de inserção preservada
+            window = 2 * (self.workers or os.cpu_count() or 1)
+            pending = deque(executor.submit(_walk, *task) for _, task in zip(range(window), tasks))
+            while pending:
+                result = pending.popleft().result()
+                task = next(tasks, None)
+                if task is not None:
+                    pending.append(executor.submit(_walk, *task))
+                yield result
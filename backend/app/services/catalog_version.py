@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Optional
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.models.product import Product
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def to_version(timestamp: Optional[datetime]) -> int:
+    """
+    Converte um instante em versão do catálogo (milissegundos desde a época); sem fuso, é UTC.
+    """
+    if timestamp is None:
+        return 0
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    delta = timestamp - EPOCH
+    return (delta.days * 86_400 + delta.seconds) * 1000 + delta.microseconds // 1000
+
+
+def from_version(version: int) -> datetime:
+    return EPOCH + timedelta(milliseconds=version)
+
+
+def parse_since(value: str) -> datetime:
+    """
+    Lê o parâmetro `since`: versão do catálogo (inteiro) ou instante ISO 8601.
+
+    Raises:
+        ValueError: Se não for nenhum dos dois.
+    """
+    if value.isdigit():
+        return from_version(int(value))
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def current_version(session: Session) -> int:
+    """
+    Versão atual do catálogo: o maior `products.updated_at`.
+    """
+    return to_version(session.execute(select(func.max(Product.updated_at))).scalar())
+
+
+class CatalogVersion:
+    """
+    Fornece o `updated_at` de cada commit da automação, em milissegundos e estritamente crescente.
+    """
+
+    def __init__(self):
+        self._last: Optional[int] = None
+        self._in_flight: set = set()
+        self._lock = Lock()
+
+    def next_timestamp(self, session: Session) -> datetime:
+        with self._lock:
+            if self._last is None:
+                self._last = current_version(session)
+            version = max(to_version(datetime.now(timezone.utc)), self._last + 1)
+            self._last = version
+            self._in_flight.add(version)
+        return from_version(version)
+
+    def release(self, timestamp: datetime) -> None:
+        """
+        Marca o lote do carimbo como gravado (ou abandonado).
+        """
+        with self._lock:
+            self._in_flight.discard(to_version(timestamp))
+
+    def oldest_in_flight(self) -> Optional[datetime]:
+        with self._lock:
+            return from_version(min(self._in_flight)) if self._in_flight else None
@@ -0,0 +1,71 @@
+from typing import Dict
+import re
+import numpy as np
+
+_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+_RESOLUTION_RE = re.compile(r'^(\d+)([smhd])$')
+
+
+def parse_resolution(value: str) -> int:
+    """
+    Converte um tamanho de balde como `30s`, `5m`, `1h` ou `1d` em segundos.
+
+    Raises:
+        ValueError: Se não for um tamanho positivo.
+    """
+    match = _RESOLUTION_RE.match(value)
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"invalid resolution: {value}")
+    return int(match.group(1)) * _UNITS[match.group(2)]
+
+
+def ohlc_buckets(ts_ms: np.ndarray, open_: np.ndarray, high: np.ndarray, low: np.ndarray,
+                 close: np.ndarray, count: np.ndarray, bucket_seconds: int) -> Dict[str, np.ndarray]:
+    """
+    Agrega uma série OHLC ordenada (`ts_ms` crescente) em baldes de tempo maiores.
+    """
+    if len(ts_ms) == 0:
+        empty = np.empty(0)
+        return {'timestamp': np.empty(0, dtype=np.int64), 'open': empty, 'high': empty,
+                'low': empty, 'close': empty, 'count': np.empty(0, dtype=np.int64)}
+    bucket_ms = bucket_seconds * 1000
+    buckets = ts_ms // bucket_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(ts_ms)] - 1
+    return {
+        'timestamp': buckets[starts] * bucket_ms,
+        'open': open_[starts],
+        'high': np.maximum.reduceat(high, starts),
+        'low': np.minimum.reduceat(low, starts),
+        'close': close[ends],
+        'count': np.add.reduceat(count, starts),
+    }
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Downsampling Largest-Triangle-Three-Buckets: índices dos pontos mantidos (o primeiro e o último sempre).
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    # Os pontos internos são divididos em (threshold - 2) baldes de tamanho igual
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+            avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        px, py = x[previous], y[previous]
+        areas = np.abs((px - avg_x) * (y[start:end] - py) - (px - x[start:end]) * (avg_y - py))
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
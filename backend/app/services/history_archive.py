@@ -0,0 +1,225 @@
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Iterator, Optional, Tuple
+import json
+import logging
+import os
+import shutil
+import numpy as np
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from app.models.product import PriceHistory
+from app.services.catalog_version import from_version, to_version
+
+logger = logging.getLogger(__name__)
+
+history_table = PriceHistory.__table__
+
+MANIFEST = 'manifest.json'
+# Linhas lidas do banco por lote ao arquivar
+FETCH_SIZE = 50_000
+_DTYPE = np.dtype('<i8')
+
+
+class HistoryArchive:
+    """
+    Arquivo colunar do histórico frio: arquivos int64 por mês e produto, lidos com mmap.
+    """
+
+    def __init__(self, root: str, after_days: Optional[float] = None):
+        self.root = root
+        self.after_days = after_days
+        self._lock = Lock()
+        self._watermark_ms = 0
+        self._manifest_mtime: Optional[int] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.after_days is not None
+
+    @property
+    def watermark_ms(self) -> int:
+        # Relê o manifesto quando outro processo (ex.: `flask archive-history`) o atualiza
+        path = os.path.join(self.root, MANIFEST)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return 0
+        if mtime != self._manifest_mtime:
+            try:
+                with open(path) as f:
+                    self._watermark_ms = int(json.load(f)['watermark_ms'])
+            except (OSError, ValueError, KeyError):
+                self._watermark_ms = 0
+            self._manifest_mtime = mtime
+        return self._watermark_ms
+
+    @property
+    def watermark(self) -> Optional[datetime]:
+        return from_version(self.watermark_ms) if self.watermark_ms else None
+
+    def covers(self, end: Optional[datetime]) -> bool:
+        """
+        Indica se todos os pontos até `end` estão no arquivo.
+        """
+        return end is not None and self.watermark_ms > to_version(end)
+
+    # Escrita
+
+    def archive(self, session: Session, now: Optional[datetime] = None, not_after: Optional[datetime] = None) -> int:
+        """
+        Move para o arquivo o histórico com mais de `after_days` dias (no máximo até `not_after`).
+
+        Returns:
+            int: Linhas arquivadas.
+        """
+        if not self.enabled:
+            return 0
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            low = self.watermark_ms
+            cutoff = to_version(now - timedelta(days=self.after_days))
+            if not_after is not None:
+                cutoff = min(cutoff, to_version(not_after))
+            if cutoff <= low:
+                return 0
+            low_ts, cutoff_ts = from_version(low), from_version(cutoff)
+
+            stmt = (
+                select(history_table.c.product_id, history_table.c.timestamp, history_table.c.price)
+                .where(history_table.c.timestamp >= low_ts, history_table.c.timestamp < cutoff_ts)
+                .order_by(history_table.c.product_id, history_table.c.timestamp)
+                .execution_options(yield_per=FETCH_SIZE)
+            )
+            archived = 0
+            pending_id, pending_ts, pending_px = None, [], []
+            for partition in session.execute(stmt).partitions():
+                for product_id, timestamp, price in partition:
+                    if product_id != pending_id and pending_ts:
+                        archived += self._append_product(pending_id, pending_ts, pending_px)
+                        pending_ts, pending_px = [], []
+                    pending_id = product_id
+                    pending_ts.append(timestamp)
+                    pending_px.append(price)
+            if pending_ts:
+                archived += self._append_product(pending_id, pending_ts, pending_px)
+
+            self._write_manifest(cutoff)
+            session.execute(delete(history_table).where(
+                history_table.c.timestamp >= low_ts, history_table.c.timestamp < cutoff_ts
+            ))
+            session.commit()
+        logger.info(f"Archived {archived} price history rows older than {cutoff_ts.isoformat()}")
+        return archived
+
+    def _append_product(self, product_id: int, timestamps: list, prices: list) -> int:
+        ts = np.array(timestamps, dtype='datetime64[ms]').astype(np.int64)
+        cents = np.rint(np.array(prices, dtype=np.float64) * 100).astype(np.int64)
+        months = ts.astype('datetime64[ms]').astype('datetime64[M]')
+        starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+        ends = np.r_[starts[1:], len(ts)]
+        written = 0
+        for start, end in zip(starts, ends):
+            written += self._append_month(str(months[start]), product_id, ts[start:end], cents[start:end])
+        return written
+
+    def _append_month(self, month: str, product_id: int, ts: np.ndarray, cents: np.ndarray) -> int:
+        directory = os.path.join(self.root, month)
+        os.makedirs(directory, exist_ok=True)
+        ts_path, px_path = self._paths(month, product_id)
+        existing = self._length(ts_path, px_path)
+        if existing:
+            # Alinha os dois arquivos (escrita interrompida) e ignora pontos já arquivados
+            for path in (ts_path, px_path):
+                with open(path, 'r+b') as f:
+                    f.truncate(existing * _DTYPE.itemsize)
+            last = np.memmap(ts_path, dtype=_DTYPE, mode='r')[existing - 1]
+            keep = ts > last
+            ts, cents = ts[keep], cents[keep]
+        if len(ts) == 0:
+            return 0
+        for path, values in ((ts_path, ts), (px_path, cents)):
+            with open(path, 'ab') as f:
+                f.write(values.astype(_DTYPE).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        return len(ts)
+
+    def _write_manifest(self, watermark_ms: int) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        tmp = os.path.join(self.root, MANIFEST + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({'watermark_ms': watermark_ms, 'format': 'int64-ms/int64-cents'}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.root, MANIFEST))
+
+    def clear(self) -> None:
+        """
+        Remove todos os arquivos e o manifesto.
+        """
+        with self._lock:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    # Leitura
+
+    def _paths(self, month: str, product_id: int) -> Tuple[str, str]:
+        base = os.path.join(self.root, month, str(product_id))
+        return base + '.ts', base + '.px'
+
+    @staticmethod
+    def _length(ts_path: str, px_path: str) -> int:
+        try:
+            return min(os.path.getsize(ts_path), os.path.getsize(px_path)) // _DTYPE.itemsize
+        except OSError:
+            return 0
+
+    def _months(self, start_ms: Optional[int], end_ms: Optional[int]) -> Iterator[str]:
+        try:
+            months = sorted(d for d in os.listdir(self.root) if len(d) == 7 and d[4] == '-')
+        except OSError:
+            return
+        first = str(np.datetime64(start_ms, 'ms').astype('datetime64[M]')) if start_ms is not None else None
+        last = str(np.datetime64(end_ms, 'ms').astype('datetime64[M]')) if end_ms is not None else None
+        for month in months:
+            if (first is None or month >= first) and (last is None or month <= last):
+                yield month
+
+    def read_range(self, product_id: int, start: Optional[datetime] = None,
+                   end: Optional[datetime] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Pontos arquivados de um produto em `[start, end]`, do mais antigo ao mais recente.
+
+        Returns:
+            (ts_ms, cents): Arrays int64.
+        """
+        start_ms = to_version(start) if start is not None else None
+        end_ms = to_version(end) if end is not None else None
+        ts_parts, px_parts = [], []
+        for month in self._months(start_ms, end_ms):
+            ts_path, px_path = self._paths(month, product_id)
+            length = self._length(ts_path, px_path)
+            if not length:
+                continue
+            ts = np.memmap(ts_path, dtype=_DTYPE, mode='r', shape=(length,))
+            px = np.memmap(px_path, dtype=_DTYPE, mode='r', shape=(length,))
+            lo = np.searchsorted(ts, start_ms, 'left') if start_ms is not None else 0
+            hi = np.searchsorted(ts, end_ms, 'right') if end_ms is not None else length
+            if hi > lo:
+                ts_parts.append(ts[lo:hi])
+                px_parts.append(px[lo:hi])
+        if not ts_parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        if len(ts_parts) == 1:
+            return ts_parts[0], px_parts[0]
+        return np.concatenate(ts_parts), np.concatenate(px_parts)
+
+    def oldest(self, product_id: int) -> Optional[datetime]:
+        """
+        Instante mais antigo arquivado de um produto.
+        """
+        for month in self._months(None, None):
+            ts_path, px_path = self._paths(month, product_id)
+            if self._length(ts_path, px_path):
+                return from_version(int(np.memmap(ts_path, dtype=_DTYPE, mode='r', shape=(1,))[0]))
+        return None
@@ -0,0 +1,282 @@
+from threading import Thread, Event, Lock
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import logging
+from flask import Flask
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from app.database.connection import db
+from app.models.product import PriceHistory
+from app.models.price_rollup import PriceHistoryMinute, PriceHistoryHour, PriceHistoryDay, RollupWatermark
+from app.models.storage import is_compact, to_millis
+from app.services.catalog_version import EPOCH
+from app.services.history_archive import HistoryArchive
+
+logger = logging.getLogger(__name__)
+
+# Camadas da mais fina para a mais grossa: (modelo, formato strftime do balde, origem)
+TIERS = [
+    (PriceHistoryMinute, '%Y-%m-%d %H:%M:00.000000', None),
+    (PriceHistoryHour, '%Y-%m-%d %H:00:00.000000', PriceHistoryMinute),
+    (PriceHistoryDay, '%Y-%m-%d 00:00:00.000000', PriceHistoryHour),
+]
+
+# Maior janela de origem agregada por transação
+MAX_WINDOW = timedelta(days=1)
+
+# Agregação OHLC de uma janela [lo, hi) da origem para a camada de destino (SQLite).
+# Os pontos são ordenados por tempo dentro de cada balde para obter abertura e fechamento.
+_ROLLUP_SQL = """
+INSERT INTO {target} (product_id, bucket, open, high, low, close, count)
+SELECT product_id, bucket,
+       MAX(CASE WHEN rn_first = 1 THEN open END), MAX(high), MIN(low),
+       MAX(CASE WHEN rn_last = 1 THEN close END), SUM(count)
+FROM (
+    SELECT product_id, strftime('{fmt}', {bucket_ts}) AS bucket,
+           {open} AS open, {high} AS high, {low} AS low, {close} AS close, {count} AS count,
+           ROW_NUMBER() OVER (PARTITION BY product_id, strftime('{fmt}', {bucket_ts}) ORDER BY {ts}) AS rn_first,
+           ROW_NUMBER() OVER (PARTITION BY product_id, strftime('{fmt}', {bucket_ts}) ORDER BY {ts} DESC) AS rn_last
+    FROM {source}
+    WHERE {ts} >= :lo AND {ts} < :hi
+)
+GROUP BY product_id, bucket
+"""
+
+
+def floor_time(timestamp: datetime, seconds: int) -> datetime:
+    """
+    Arredonda um instante UTC para baixo, a um múltiplo de `seconds` desde a época.
+    """
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    epoch = int(timestamp.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % seconds, tz=timezone.utc)
+
+
+def ceil_time(timestamp: datetime, seconds: int) -> datetime:
+    floored = floor_time(timestamp, seconds)
+    return floored if floored == _as_utc(timestamp) else floored + timedelta(seconds=seconds)
+
+
+def _as_utc(timestamp: Optional[datetime]) -> Optional[datetime]:
+    if timestamp is not None and timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp
+
+
+def get_watermark(session, tier) -> Optional[datetime]:
+    row = session.get(RollupWatermark, tier.__tablename__)
+    return _as_utc(row.watermark) if row else None
+
+
+def _rollup_sql(tier, source, compact: bool = False) -> str:
+    if source is None and compact:
+        # Histórico bruto no formato compacto: epoch ms e centavos; as camadas seguem em texto e REAL
+        table = PriceHistory.__tablename__
+        columns = dict(ts='timestamp', bucket_ts="timestamp / 1000, 'unixepoch'", open='price / 100.0',
+                       high='price / 100.0', low='price / 100.0', close='price / 100.0', count='1')
+    elif source is None:
+        table = PriceHistory.__tablename__
+        columns = dict(ts='timestamp', bucket_ts='timestamp', open='price', high='price', low='price',
+                       close='price', count='1')
+    else:
+        table = source.__tablename__
+        columns = dict(ts='bucket', bucket_ts='bucket', open='open', high='high', low='low', close='close',
+                       count='count')
+    fmt = next(fmt for model, fmt, _ in TIERS if model is tier)
+    return _ROLLUP_SQL.format(target=tier.__tablename__, source=table, fmt=fmt, **columns)
+
+
+class HistoryCompactor:
+    """
+    Agrega o histórico bruto em camadas OHLC de minuto, hora e dia e aplica a retenção.
+    """
+
+    def __init__(self, app: Flask, interval: float = 60, raw_retention_days: Optional[float] = None,
+                 minute_retention_days: Optional[float] = 90, hour_retention_days: Optional[float] = 730,
+                 archive: Optional[HistoryArchive] = None, history_sink=None, catalog_version=None):
+        self.app = app
+        self.interval = interval
+        self.archive = archive
+        # Sink write-behind: baldes com pontos ainda na fila não são fechados
+        self.history_sink = history_sink
+        # Carimbos da automação ainda sem commit: o balde deles também fica aberto
+        self.catalog_version = catalog_version
+        self.retention = {
+            None: raw_retention_days,
+            PriceHistoryMinute: minute_retention_days,
+            PriceHistoryHour: hour_retention_days,
+        }
+        self._stop_event = Event()
+        self._thread: Optional[Thread] = None
+        self._lock = Lock()
+        self._last_run: Optional[datetime] = None
+        self._run_count = 0
+        self._error_count = 0
+        self._last_result: dict = {}
+
+    def run_once(self, now: Optional[datetime] = None) -> dict:
+        """
+        Agrega os baldes fechados, arquiva o histórico frio e aplica a retenção.
+
+        Returns:
+            dict: Linhas escritas por camada, arquivadas e removidas por tabela.
+        """
+        now = _as_utc(now) or datetime.now(timezone.utc)
+        result = {'rolled': {}, 'archived': 0, 'deleted': {}}
+        with self._lock:
+            for tier, _, source in TIERS:
+                result['rolled'][tier.__tablename__] = self._roll_tier(tier, source, now)
+            if self.archive is not None and self.archive.enabled:
+                # Só arquiva o que a camada de minutos já agregou
+                result['archived'] = self.archive.archive(
+                    db.session, now, not_after=get_watermark(db.session, PriceHistoryMinute)
+                )
+            for tier, _, source in TIERS:
+                table = (source or PriceHistory).__tablename__
+                result['deleted'][table] = self._apply_retention(source, tier, now)
+            self._last_run = now
+            self._run_count += 1
+            self._last_result = result
+        logger.info(f"History compaction finished: {result}")
+        return result
+
+    def _roll_tier(self, tier, source, now: datetime) -> int:
+        seconds = tier.BUCKET_SECONDS
+        session = db.session
+        if source is None:
+            limit = self._settled_until(now)
+            oldest = session.execute(select(func.min(PriceHistory.timestamp))).scalar()
+        else:
+            # Só agrega o que a camada de origem já fechou
+            limit = get_watermark(session, source)
+            oldest = session.execute(select(func.min(source.bucket))).scalar()
+        hi = floor_time(limit, seconds) if limit else None
+        lo = get_watermark(session, tier) or (floor_time(oldest, seconds) if oldest else None)
+        if hi is None or lo is None or lo >= hi:
+            return 0
+
+        compact = source is None and is_compact(session)
+        statement = text(_rollup_sql(tier, source, compact))
+        bound = to_millis if compact else _db_time
+        written = 0
+        while lo < hi:
+            window_hi = min(hi, lo + MAX_WINDOW)
+            written += session.execute(statement, {'lo': bound(lo), 'hi': bound(window_hi)}).rowcount
+            session.merge(RollupWatermark(tier=tier.__tablename__, watermark=window_hi))
+            session.commit()
+            lo = window_hi
+        return written
+
+    def _settled_until(self, now: datetime) -> datetime:
+        """
+        Instante mais recente cujas linhas brutas já estão todas na tabela.
+        """
+        limit = now
+        # Nesta ordem: um lote sai de "em andamento" só depois de entrar na fila do sink
+        if self.catalog_version is not None:
+            limit = min(limit, _as_utc(self.catalog_version.oldest_in_flight()) or limit)
+        if self.history_sink is not None:
+            limit = min(limit, _as_utc(self.history_sink.oldest_pending()) or limit)
+            # Diários de processos mortos entram no banco antes; os de processos vivos seguram o limite
+            self.history_sink.recover()
+            limit = min(limit, _as_utc(self.history_sink.oldest_spilled()) or limit)
+        return limit
+
+    def _apply_retention(self, source, covering_tier, now: datetime) -> int:
+        days = self.retention.get(source)
+        if days is None:
+            return 0
+        covered = get_watermark(db.session, covering_tier)
+        if covered is None:
+            return 0
+        cutoff = min(now - timedelta(days=days), covered)
+        if source is None and self.archive is not None and self.archive.enabled:
+            # Com o arquivo ativo, linhas brutas saem do banco apenas depois de arquivadas
+            cutoff = min(cutoff, self.archive.watermark or EPOCH)
+        model = source or PriceHistory
+        column = PriceHistory.timestamp if source is None else source.bucket
+        deleted = db.session.query(model).filter(column < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+    def _compaction_loop(self):
+        while not self._stop_event.is_set():
+            with self.app.app_context():
+                try:
+                    self.run_once()
+                except SQLAlchemyError as e:
+                    db.session.rollback()
+                    self._error_count += 1
+                    logger.error(f"Database error compacting history: {str(e)}")
+                except Exception as e:
+                    db.session.rollback()
+                    self._error_count += 1
+                    logger.error(f"Unexpected error compacting history: {str(e)}")
+            self._stop_event.wait(self.interval)
+
+    def start(self) -> bool:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop_event.clear()
+                self._thread = Thread(target=self._compaction_loop, daemon=True)
+                self._thread.start()
+                logger.info("History compaction started.")
+                return True
+            return False
+
+    def stop(self) -> bool:
+        thread = self._thread
+        if thread and thread.is_alive():
+            self._stop_event.set()
+            thread.join()
+            self._thread = None
+            logger.info("History compaction stopped.")
+            return True
+        return False
+
+    def set_leading(self, leading: bool) -> None:
+        """
+        Listener de liderança da `PriceAutomation`: compacta só enquanto este worker detém o lease.
+        """
+        if leading:
+            self.start()
+        else:
+            self.stop()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def get_status(self) -> dict:
+        return {
+            "is_running": self.is_running(),
+            "last_run": self._last_run.isoformat() if self._last_run else None,
+            "run_count": self._run_count,
+            "error_count": self._error_count,
+            "interval": self.interval,
+            "last_result": self._last_result,
+        }
+
+
+def _db_time(timestamp: datetime) -> str:
+    # Mesmo formato usado pelo tipo DateTime do SQLAlchemy no SQLite (UTC sem fuso)
+    return timestamp.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+# Instância singleton
+history_compactor: Optional[HistoryCompactor] = None
+
+def init_history_compactor(app: Flask, interval: float = 60, raw_retention_days: Optional[float] = None,
+                           minute_retention_days: Optional[float] = 90,
+                           hour_retention_days: Optional[float] = 730,
+                           archive: Optional[HistoryArchive] = None, history_sink=None,
+                           catalog_version=None) -> HistoryCompactor:
+    global history_compactor
+    if history_compactor is not None and history_compactor.app is not app:
+        # Um novo create_app: o compactador do app anterior para e é substituído
+        history_compactor.stop()
+        history_compactor = None
+    if history_compactor is None:
+        history_compactor = HistoryCompactor(app, interval, raw_retention_days, minute_retention_days,
+                                             hour_retention_days, archive, history_sink, catalog_version)
+    return history_compactor
@@ -0,0 +1,408 @@
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from threading import Condition, Event, Lock, Thread
+from time import monotonic, perf_counter
+from typing import Deque, List, Optional, Tuple
+from uuid import uuid4
+import logging
+import os
+import struct
+import numpy as np
+from flask import Flask
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from app.database.connection import db
+from app.models.product import Product, PriceHistory
+from app.models.storage import COMPACT, storage_format, to_cents, to_millis
+from app.services import metrics
+from app.services.catalog_version import from_version, to_version
+
+# Trava exclusiva do diário de cada processo (POSIX); sem ela, só o próprio diário é usado
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - depende da plataforma
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+history_table = PriceHistory.__table__
+products_table = Product.__table__
+
+# Registro do diário: tipo, sequência, carimbo do commit (epoch ms) e número de linhas,
+# seguido dos ids (int64) e dos preços (float64) do lote
+_HEADER = struct.Struct('<cQqI')
+BATCH, ABORT, FLUSHED = b'B', b'A', b'F'
+SPILL_SUFFIX = '.spill'
+_INSERT_SQL = f'INSERT INTO {history_table.name} (product_id, price, timestamp) VALUES (?, ?, ?)'
+_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+def read_spill(data: bytes) -> Tuple[List[Tuple[int, int, np.ndarray, np.ndarray]], int]:
+    """
+    Lê um arquivo de spill.
+
+    Returns:
+        (batches, last_seq): Lotes `(seq, version, ids, prices)` ainda não gravados nem abortados, e o seq do último lote escrito.
+    """
+    batches, aborted, flushed, last_seq, offset = {}, set(), 0, 0, 0
+    while offset + _HEADER.size <= len(data):
+        kind, seq, version, count = _HEADER.unpack_from(data, offset)
+        start = offset + _HEADER.size
+        end = start + 16 * count
+        if end > len(data):
+            break
+        if kind == BATCH:
+            ids = np.frombuffer(data, dtype='<i8', count=count, offset=start)
+            prices = np.frombuffer(data, dtype='<f8', count=count, offset=start + 8 * count)
+            batches[seq] = (version, ids, prices)
+            last_seq = seq
+        elif kind == ABORT:
+            aborted.add(seq)
+        elif kind == FLUSHED:
+            flushed = max(flushed, seq)
+        offset = end
+    return [(seq, *batches[seq]) for seq in sorted(batches) if seq not in aborted and seq > flushed], last_seq
+
+
+def replay_spill(session: Session, data: bytes) -> int:
+    """
+    Grava o histórico do arquivo de spill de um processo morto.
+
+    Returns:
+        int: Linhas inseridas.
+    """
+    batches, last_seq = read_spill(data)
+    written = 0
+    for seq, version, ids, prices in batches:
+        timestamp = from_version(version)
+        if session.execute(select(history_table.c.id).where(history_table.c.timestamp == timestamp).limit(1)).first():
+            continue
+        if seq == last_seq and not session.execute(
+                select(products_table.c.id).where(products_table.c.updated_at == timestamp).limit(1)).first():
+            continue
+        insert_history(session, ids, prices, timestamp)
+        written += len(ids)
+    session.commit()
+    return written
+
+
+def insert_history(session: Session, ids: np.ndarray, prices: np.ndarray, timestamp: datetime) -> None:
+    """
+    Insere uma linha de histórico por produto, todas no instante `timestamp`.
+    """
+    connection = session.connection()
+    if connection.dialect.paramstyle == 'qmark':
+        # SQLite: executemany direto no driver, com o carimbo convertido uma única vez
+        if storage_format(connection.dialect) == COMPACT:
+            stamp, prices = to_millis(timestamp), to_cents(prices)
+        else:
+            stamp = timestamp.strftime(_TIMESTAMP_FORMAT)
+        connection.exec_driver_sql(_INSERT_SQL, [(pid, price, stamp) for pid, price in zip(ids.tolist(), prices.tolist())])
+    else:
+        session.execute(insert(history_table), [{'product_id': pid, 'price': price, 'timestamp': timestamp}
+                                                for pid, price in zip(ids.tolist(), prices.tolist())])
+
+
+class HistorySink:
+    """
+    Fila write-behind do histórico de preços, com um journal (spill) por processo.
+    """
+
+    def __init__(self, app: Flask, max_rows: int = 500_000, batch_rows: int = 50_000, max_age: float = 1.0,
+                 spill_dir: Optional[str] = None, fsync: bool = True):
+        if max_rows <= 0 or batch_rows <= 0 or max_age <= 0:
+            raise ValueError('max_rows, batch_rows and max_age must be positive')
+        self.app = app
+        self.max_rows = max_rows
+        self.batch_rows = batch_rows
+        self.max_age = max_age
+        self.spill_dir = spill_dir or None
+        self.fsync = fsync
+        self.spill_path: Optional[str] = None
+        self._queue: Deque[tuple] = deque()
+        self._queued_rows = 0
+        self._flushing: List[tuple] = []
+        self._blocked = 0
+        self._cond = Condition()
+        self._stop_event = Event()
+        self._thread: Optional[Thread] = None
+        self._flush_lock = Lock()
+        self._journal = None
+        self._journal_lock = Lock()
+        self._seq = 0
+        self._pending: set = set()
+        self._opened = False
+        self._flushed_rows = 0
+        self._flush_count = 0
+        self._recovered_rows = 0
+        self._error_count = 0
+        self._last_lag: Optional[float] = None
+
+    def open(self) -> None:
+        """
+        Abre o spill deste processo e reaplica os de processos mortos. Só a primeira chamada tem efeito.
+        """
+        if self._opened:
+            return
+        with self._journal_lock:
+            if self._opened:
+                return
+            if self.spill_dir:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                self.spill_path = os.path.join(self.spill_dir, f'{os.getpid()}-{uuid4().hex[:8]}{SPILL_SUFFIX}')
+                self._journal = open(self.spill_path, 'ab')
+                if fcntl is not None:
+                    fcntl.flock(self._journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self._opened = True
+        self.recover()
+
+    def recover(self) -> int:
+        """
+        Reaplica os arquivos de spill sem trava em `spill_dir`, exceto o deste processo.
+
+        Returns:
+            int: Linhas inseridas.
+        """
+        if not self.spill_dir or fcntl is None or not os.path.isdir(self.spill_dir):
+            return 0
+        written = 0
+        for name in sorted(os.listdir(self.spill_dir)):
+            path = os.path.join(self.spill_dir, name)
+            if not name.endswith(SPILL_SUFFIX) or path == self.spill_path:
+                continue
+            try:
+                f = open(path, 'rb')
+            except FileNotFoundError:
+                continue  # recuperado por outra thread
+            with f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # processo vivo
+                if not os.path.exists(path):
+                    continue
+                with self.app.app_context():
+                    rows = replay_spill(db.session, f.read())
+                os.remove(path)
+            written += rows
+            logger.info(f"Recovered {rows} price history rows from {name}")
+        self._recovered_rows += written
+        metrics.HISTORY_SINK_RECOVERED_ROWS.inc(written)
+        return written
+
+    def _write(self, kind: bytes, seq: int, version: int = 0, ids: Optional[np.ndarray] = None,
+               prices: Optional[np.ndarray] = None) -> None:
+        if self._journal is None:
+            return
+        count = 0 if ids is None else len(ids)
+        parts = [_HEADER.pack(kind, seq, version, count)]
+        if count:
+            parts += [ids.astype('<i8', copy=False).tobytes(), prices.astype('<f8', copy=False).tobytes()]
+        self._journal.write(b''.join(parts))
+        self._journal.flush()
+        if self.fsync and kind == BATCH:
+            os.fsync(self._journal.fileno())
+
+    @contextmanager
+    def batch(self, ids: np.ndarray, prices: np.ndarray, timestamp: datetime):
+        """
+        Envolve o commit de um lote: registra no journal antes e enfileira depois; se o bloco falhar, o lote é abortado.
+        """
+        self.open()
+        version = to_version(timestamp)
+        with self._journal_lock:
+            self._seq += 1
+            seq = self._seq
+            self._write(BATCH, seq, version, ids, prices)
+            self._pending.add(seq)
+        try:
+            yield
+        except BaseException:
+            with self._journal_lock:
+                self._write(ABORT, seq)
+                self._pending.discard(seq)
+            raise
+        self._enqueue(seq, version, ids, prices)
+
+    def _enqueue(self, seq: int, version: int, ids: np.ndarray, prices: np.ndarray) -> None:
+        self._ensure_flusher()
+        count = len(ids)
+        waited = None
+        with self._cond:
+            # Contrapressão: a fila cheia segura a automação (já fora da transação) até o próximo flush
+            while self._queue and self._queued_rows + count > self.max_rows:
+                if waited is None:
+                    waited = perf_counter()
+                    self._blocked += 1
+                self._cond.notify_all()
+                self._cond.wait(self.max_age)
+            if waited is not None:
+                self._blocked -= 1
+            self._queue.append((seq, version, ids, prices, monotonic()))
+            self._queued_rows += count
+            metrics.HISTORY_SINK_QUEUED_ROWS.set(self._queued_rows)
+            if self._queued_rows >= self.batch_rows:
+                self._cond.notify_all()
+        if waited is not None:
+            metrics.HISTORY_SINK_BACKPRESSURE_SECONDS.observe(perf_counter() - waited)
+
+    def _ensure_flusher(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            with self._cond:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stop_event.clear()
+                    self._thread = Thread(target=self._flush_loop, daemon=True)
+                    self._thread.start()
+
+    def _due(self) -> bool:
+        return bool(self._queue) and (self._queued_rows >= self.batch_rows or self._blocked > 0
+                                      or monotonic() - self._queue[0][4] >= self.max_age)
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._stop_event.is_set() and not self._due():
+                    self._cond.wait(max(0.0, self.max_age - (monotonic() - self._queue[0][4]))
+                                    if self._queue else None)
+                if self._stop_event.is_set() and not self._queue:
+                    return
+            with self.app.app_context():
+                try:
+                    self.flush_once()
+                except Exception as e:
+                    db.session.rollback()
+                    self._error_count += 1
+                    logger.error(f"Failed to flush price history: {str(e)}")
+                    if self._stop_event.is_set():
+                        # Os lotes continuam no diário e são recuperados no próximo open()
+                        return
+                    self._stop_event.wait(self.max_age)
+
+    def flush_once(self) -> int:
+        """
+        Grava até `batch_rows` linhas da fila (pelo menos um lote) numa transação.
+
+        Returns:
+            int: Linhas gravadas.
+        """
+        with self._flush_lock:
+            with self._cond:
+                batches, rows = [], 0
+                while self._queue and (not batches or rows + len(self._queue[0][2]) <= self.batch_rows):
+                    batch = self._queue.popleft()
+                    batches.append(batch)
+                    rows += len(batch[2])
+                self._flushing = batches
+            if not batches:
+                return 0
+            started = perf_counter()
+            try:
+                for _, version, ids, prices, _ in batches:
+                    insert_history(db.session, ids, prices, from_version(version))
+                db.session.commit()
+            except BaseException:
+                with self._cond:
+                    self._queue.extendleft(reversed(batches))
+                    self._flushing = []
+                raise
+            lag = monotonic() - batches[0][4]
+            with self._cond:
+                self._flushing = []
+                self._queued_rows -= rows
+                metrics.HISTORY_SINK_QUEUED_ROWS.set(self._queued_rows)
+                self._cond.notify_all()
+            with self._journal_lock:
+                self._write(FLUSHED, batches[-1][0])
+                self._pending.difference_update(batch[0] for batch in batches)
+                if not self._pending and self._journal is not None:
+                    # Tudo que foi registrado já está no banco: o diário recomeça vazio
+                    self._journal.truncate(0)
+            self._flushed_rows += rows
+            self._flush_count += 1
+            self._last_lag = lag
+            metrics.HISTORY_ROWS.inc(rows)
+            metrics.HISTORY_SINK_FLUSH_SECONDS.observe(perf_counter() - started)
+            metrics.HISTORY_SINK_LAG_SECONDS.observe(lag)
+            logger.debug("Flushed %d price history rows (%d batches, lag %.3fs)", rows, len(batches), lag)
+            return rows
+
+    def drain(self) -> int:
+        """
+        Grava tudo o que está na fila antes de retornar.
+        """
+        written = 0
+        with self.app.app_context():
+            while self._queue:
+                written += self.flush_once()
+        return written
+
+    def close(self) -> None:
+        """
+        Para o flusher depois de esvaziar a fila e fecha o spill (removido se tudo chegou ao banco).
+        """
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._stop_event.set()
+            with self._cond:
+                self._cond.notify_all()
+            thread.join()
+        self._thread = None
+        with self._journal_lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+                if not self._pending and not self._queue:
+                    os.remove(self.spill_path)
+            self._opened = False
+
+    def get_status(self) -> dict:
+        return {
+            "queued_rows": self._queued_rows,
+            "queued_batches": len(self._queue),
+            "max_rows": self.max_rows,
+            "batch_rows": self.batch_rows,
+            "max_age": self.max_age,
+            "flushed_rows": self._flushed_rows,
+            "flush_count": self._flush_count,
+            "last_lag": self._last_lag,
+            "recovered_rows": self._recovered_rows,
+            "error_count": self._error_count,
+            "spill_file": self.spill_path,
+        }
+
+    def pending_batches(self) -> List[Tuple[datetime, np.ndarray, np.ndarray]]:
+        """
+        `(timestamp, ids, prices)` dos lotes com commit ainda fora do banco, do mais antigo ao mais recente.
+        """
+        with self._cond:
+            batches = self._flushing + list(self._queue)
+        return [(from_version(version), ids, prices) for _, version, ids, prices, _ in batches]
+
+    def oldest_pending(self) -> Optional[datetime]:
+        """
+        Carimbo do lote mais antigo ainda fora do banco (`None` se não há).
+        """
+        with self._cond:
+            oldest = (self._flushing or self._queue or [None])[0]
+            return from_version(oldest[1]) if oldest else None
+
+    def oldest_spilled(self) -> Optional[datetime]:
+        """
+        Carimbo do lote mais antigo no journal de outro processo vivo e ainda fora do banco (`None` se não há).
+        """
+        if not self.spill_dir or not os.path.isdir(self.spill_dir):
+            return None
+        oldest = None
+        for name in os.listdir(self.spill_dir):
+            path = os.path.join(self.spill_dir, name)
+            if not name.endswith(SPILL_SUFFIX) or path == self.spill_path:
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    batches, _ = read_spill(f.read())
+            except FileNotFoundError:
+                continue
+            for _, version, _, _ in batches:
+                oldest = version if oldest is None else min(oldest, version)
+        return from_version(oldest) if oldest is not None else None
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import uuid4
+import json
+import os
+import socket
+from sqlalchemy import or_, select, update
+from sqlalchemy.exc import IntegrityError
+from app.database.connection import db
+from app.models.automation_lease import AutomationLease
+
+DEFAULT_TTL = 15.0
+
+
+def _now() -> datetime:
+    # Mesmo formato das demais colunas DateTime: UTC sem fuso
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def default_holder() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}'
+
+
+class LeaderLease:
+    """
+    Lease guardado numa linha da tabela que elege, entre os workers, o processo que roda um laço em segundo plano.
+    """
+
+    def __init__(self, name: str = 'price_automation', ttl: float = DEFAULT_TTL, holder: Optional[str] = None):
+        if ttl <= 0:
+            raise ValueError('ttl must be positive')
+        self.name = name
+        self.ttl = ttl
+        self.holder = holder or default_holder()
+
+    def _ensure_row(self) -> None:
+        session = db.session
+        if session.execute(select(AutomationLease.name).filter_by(name=self.name)).first() is None:
+            session.add(AutomationLease(name=self.name, enabled=False))
+            try:
+                session.commit()
+            except IntegrityError:
+                # Outro worker criou a linha ao mesmo tempo
+                session.rollback()
+
+    def try_acquire(self, status: Optional[dict] = None) -> bool:
+        """
+        Obtém ou renova o lease, publicando `status` quando informado.
+
+        Returns:
+            bool: Se este processo detém o lease pelos próximos `ttl` segundos.
+        """
+        self._ensure_row()
+        now = _now()
+        values = {'holder': self.holder, 'expires_at': now + timedelta(seconds=self.ttl), 'heartbeat_at': now}
+        if status is not None:
+            values['status'] = json.dumps(status, default=str)
+        table = AutomationLease.__table__
+        result = db.session.execute(
+            update(table)
+            .where(table.c.name == self.name,
+                   or_(table.c.holder == self.holder, table.c.holder.is_(None), table.c.expires_at < now))
+            .values(**values)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def release(self) -> None:
+        table = AutomationLease.__table__
+        db.session.execute(
+            update(table).where(table.c.name == self.name, table.c.holder == self.holder)
+            .values(holder=None, expires_at=None)
+        )
+        db.session.commit()
+
+    def set_enabled(self, enabled: bool) -> bool:
+        """
+        Define o estado ligado/desligado compartilhado.
+
+        Returns:
+            bool: Se o estado mudou.
+        """
+        self._ensure_row()
+        table = AutomationLease.__table__
+        result = db.session.execute(
+            update(table).where(table.c.name == self.name, table.c.enabled != enabled).values(enabled=enabled)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def read(self) -> dict:
+        """
+        Linha atual: `holder`, `expires_at`, `heartbeat_at`, `enabled`, `status` (dict) e `active` (há um detentor vivo).
+        """
+        self._ensure_row()
+        row = db.session.execute(
+            select(AutomationLease.__table__).where(AutomationLease.__table__.c.name == self.name)
+        ).mappings().one()
+        state = dict(row)
+        state['status'] = json.loads(state['status']) if state['status'] else {}
+        state['active'] = bool(state['holder'] and state['expires_at'] and state['expires_at'] > _now())
+        return state
@@ -0,0 +1,283 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from threading import Lock
+from time import perf_counter
+from typing import Dict, List, Optional, Sequence, Tuple
+from flask import Flask, g, request
+
+# Limites (em segundos) padrão dos histogramas de latência
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class _Metric(ABC):
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = Lock()
+        if not self.labelnames:
+            # Métrica sem labels é exportada (zerada) desde o início
+            self.labels()
+
+    def labels(self, *values: str):
+        """
+        Métrica filha de uma combinação de rótulos (criada no primeiro uso).
+        """
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        return self.labels()
+
+    @abstractmethod
+    def _new_child(self):
+        """
+        Valor de uma combinação de rótulos.
+        """
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """
+        Linhas de exposição de cada filha.
+        """
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class _Value:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1) -> None:
+        self._default().inc(amount)
+
+    def samples(self) -> List[str]:
+        return [f'{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(child.value)}'
+                for key, child in list(self._children.items())]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value: float) -> None:
+        self._default().set(value)
+
+    def samples(self) -> List[str]:
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}'
+                for key, child in list(self._children.items())]
+
+
+class _HistogramValue:
+    __slots__ = ('buckets', 'counts', 'sum', '_lock')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # Contagem por faixa (não acumulada); a soma acumulada só é feita na exportação
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self) -> '_Timer':
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ('_target', '_started')
+
+    def __init__(self, target):
+        self._target = target
+
+    def __enter__(self):
+        self._started = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._target.observe(perf_counter() - self._started)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default().observe(value)
+
+    def time(self) -> _Timer:
+        """
+        Context manager que observa os segundos gastos no bloco.
+        """
+        return _Timer(self._default())
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, child in list(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound!r}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Métricas do processo, exportadas no formato texto do Prometheus.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+
+registry = MetricsRegistry()
+
+# Automação de preços
+CYCLE_SECONDS = registry.histogram('price_automation_cycle_seconds', 'Duration of a repricing cycle.')
+PHASE_SECONDS = registry.histogram(
+    'price_automation_phase_seconds',
+    'Duration of each phase of a repricing batch (load, compute, flush, commit).', ['phase'])
+COMMIT_SECONDS = PHASE_SECONDS.labels('commit')
+LOCK_WAIT_SECONDS = registry.histogram(
+    'price_automation_lock_wait_seconds', 'Time spent waiting for the price automation lock.',
+    buckets=(0.00001, 0.0001, 0.001) + DEFAULT_BUCKETS[3:])
+PRODUCTS_PER_SECOND = registry.gauge(
+    'price_automation_products_per_second', 'Products processed per second in the last cycle.')
+PRODUCTS_UPDATED = registry.counter('price_automation_products_updated', 'Products whose price was updated.')
+HISTORY_ROWS = registry.counter('price_automation_history_rows', 'Price history rows written.')
+CYCLE_ERRORS = registry.counter('price_automation_errors', 'Repricing cycles that failed.')
+TICK_OVERRUNS = registry.counter(
+    'price_automation_tick_overruns', 'Scheduler ticks whose due groups took longer than the tick budget.')
+
+# Gravação do histórico em segundo plano (write-behind)
+HISTORY_SINK_QUEUED_ROWS = registry.gauge(
+    'price_history_sink_queued_rows', 'Price history rows waiting in the write-behind queue.')
+HISTORY_SINK_LAG_SECONDS = registry.histogram(
+    'price_history_sink_flush_lag_seconds', 'Time from a price commit to its history rows being written.')
+HISTORY_SINK_FLUSH_SECONDS = registry.histogram(
+    'price_history_sink_flush_seconds', 'Duration of a write-behind history flush.')
+HISTORY_SINK_BACKPRESSURE_SECONDS = registry.histogram(
+    'price_history_sink_backpressure_seconds', 'Time the automation waited for room in the history queue.')
+HISTORY_SINK_RECOVERED_ROWS = registry.counter(
+    'price_history_sink_recovered_rows', 'Price history rows replayed from spill files of dead processes.')
+
+# Rotas HTTP
+REQUEST_SECONDS = registry.histogram(
+    'http_request_duration_seconds', 'Request latency per route.', ['blueprint', 'route', 'method', 'status'])
+
+# Blueprints com latência medida por rota
+TIMED_BLUEPRINTS = ('products', 'automation')
+
+
+def init_app(app: Flask) -> None:
+    """
+    Mede as requisições de `TIMED_BLUEPRINTS` em `REQUEST_SECONDS`, inclusive as que falham (status 500).
+    """
+
+    @app.before_request
+    def _start_timer():
+        if request.blueprint in TIMED_BLUEPRINTS:
+            g._metrics_started = perf_counter()
+
+    @app.after_request
+    def _keep_status(response):
+        if '_metrics_started' in g:
+            g._metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _observe_request(exception=None):
+        started = g.pop('_metrics_started', None)
+        status = g.pop('_metrics_status', 500)
+        if started is not None:
+            # Exceção não tratada: after_request pode nem ter rodado, e a resposta enviada é 500
+            if exception is not None:
+                status = 500
+            # Rota com os parâmetros (/products/<int:product_id>), não a URL: cardinalidade fixa
+            REQUEST_SECONDS.labels(request.blueprint, request.url_rule.rule, request.method,
+                                   status).observe(perf_counter() - started)
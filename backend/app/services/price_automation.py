@@ -1,24 +1,41 @@
 from threading import Thread, Event, Lock
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
 import logging
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from flask import Flask
 from sqlalchemy.exc import SQLAlchemyError
 from app.database.connection import db
-import random
-
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    handlers=[logging.StreamHandler()]
-)
+from app.services import metrics
+from app.services.history_sink import HistorySink
+from app.services.leader_lease import LeaderLease
+from app.services.catalog_version import CatalogVersion
+from app.services.price_stream import DEFAULT_POLL_INTERVAL, DatabaseRelay, PriceChangeHub
+from app.services.profiler import profiler
+from app.services.pricing_kernel import compute_new_prices, make_rng, price_shard, shard_seed
+from app.services.pricing_rules import RuleTable, compile_rules, validate_rules
+from app.services.reprice_scheduler import DEFAULT_GROUP, RepriceScheduler
+import numpy as np
+
+# Laço de precificação: mensagens com formatação preguiçosa (%s) e um resumo por ciclo
 logger = logging.getLogger(__name__)
 
+# Lotes menores que isso são calculados no próprio processo (o custo de IPC não compensa)
+PARALLEL_MIN_BATCH = 20_000
+
 class PriceAutomation:
-    def __init__(self, app: Flask, interval: float = 10, min_price_factor: float = 0.8, max_price_factor: float = 1.2):
+    def __init__(self, app: Flask, interval: float = 10, min_price_factor: float = 0.8, max_price_factor: float = 1.2,
+                 seed: Optional[int] = None, chunk_size: Optional[int] = None, workers: Optional[int] = None,
+                 schedule: Optional[Dict[str, float]] = None, tick: float = 1.0,
+                 tick_budget: Optional[float] = None, lease: Optional[LeaderLease] = None, history_sink: Optional[HistorySink] = None,
+                 stream_poll_interval: float = DEFAULT_POLL_INTERVAL):
         self.app = app
         self.interval = interval
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.seed = seed
         self.min_price_factor = min_price_factor
         self.max_price_factor = max_price_factor
         self._stop_event = Event()
@@ -27,96 +44,321 @@ class PriceAutomation:
         self._last_update: Optional[datetime] = None
         self._update_count = 0
         self._error_count = 0
+        self._rng = make_rng(seed)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cycle_seq = 0
+        self.price_stream = PriceChangeHub()
+        self.catalog_version = CatalogVersion()
+        self._commit_listeners: List[Callable] = []
+        # Categorias sem período próprio são reprecificadas a cada `interval` segundos
+        self.scheduler = RepriceScheduler({DEFAULT_GROUP: interval, **(schedule or {})}, tick=tick,
+                                          budget=tick_budget)
+        self.rules: List[dict] = []
+        self._rule_table: Optional[RuleTable] = None
+        # Com lease, só o worker que o detém roda os ciclos; os demais ficam de reserva
+        self.lease = lease
+        self._leading = False
+        self._lease_lock = Lock()
+        self._heartbeat_thread: Optional[Thread] = None
+        self._leadership_listeners: List[Callable[[bool], None]] = []
+        # Nos workers de reserva, os assinantes SSE recebem os commits do líder lidos do banco
+        self.stream_relay = DatabaseRelay(app, self.price_stream, stream_poll_interval) if lease is not None else None
+        # Com o sink, o histórico sai da transação dos preços e é gravado em segundo plano
+        self.history_sink = history_sink
 
-    def _update_prices_loop(self):
+    def run_cycle(self, group: Optional[str] = None) -> int:
+        """
+        Roda um ciclo de reprecificação no catálogo todo ou num `group` do agendador.
+
+        Returns:
+            int: Número de produtos com preço atualizado.
+        """
+        with profiler.capture('cycle', group or 'all'):
+            return self._run_cycle(group)
+
+    def _run_cycle(self, group: Optional[str]) -> int:
         # Defer imports to avoid circular dependency
-        from app.models.product import Product, PriceHistory
+        from app.services.price_writer import load_price_arrays
+        logger.debug("Starting price update cycle")
+        if self.history_sink is not None:
+            # Recupera o diário de processos mortos antes de gravar preços novos
+            self.history_sink.open()
+        started = perf_counter()
+        self._cycle_seq += 1
+        filters = self.scheduler.group_filter(group) if group is not None else {}
+        if self.chunk_size:
+            updated_products, total_products = self._run_chunked_cycle(filters)
+        else:
+            with self._locked():
+                with metrics.PHASE_SECONDS.labels('load').time():
+                    ids, original, current = load_price_arrays(db.session, **filters)
+                total_products = len(ids)
+                updated_products = self._reprice(ids, original, current)
+        elapsed = perf_counter() - started
+        metrics.CYCLE_SECONDS.observe(elapsed)
+        metrics.PRODUCTS_PER_SECOND.set(total_products / elapsed if elapsed > 0 else 0)
+
+        if updated_products > 0:
+            self._last_update = datetime.now(timezone.utc)
+            self._update_count += 1
+        logger.info("Cycle %s: %d/%d products updated in %.3fs", group or 'all', updated_products,
+                    total_products, elapsed)
+        return updated_products
+
+    def _run_chunked_cycle(self, filters: Optional[dict] = None) -> Tuple[int, int]:
+        """
+        Percorre o catálogo em fatias de `chunk_size` (paginação por chave), com um commit por fatia.
+        """
+        from app.services.price_writer import load_price_arrays
+        last_id = 0
+        updated_products = 0
+        total_products = 0
+        while not self._stop_event.is_set() and (self.lease is None or self._leading):
+            with self._locked():
+                with metrics.PHASE_SECONDS.labels('load').time():
+                    ids, original, current = load_price_arrays(
+                        db.session, after_id=last_id, limit=self.chunk_size, **(filters or {})
+                    )
+                if len(ids) == 0:
+                    break
+                last_id = int(ids[-1])
+                total_products += len(ids)
+                chunk_updated = self._reprice(ids, original, current)
+                updated_products += chunk_updated
+                logger.debug("Chunk up to product %d done: %d updated", last_id, chunk_updated)
+        return updated_products, total_products
+
+    def _reprice(self, ids: np.ndarray, original: np.ndarray, current: np.ndarray) -> int:
+        """
+        Precifica um lote, grava e faz o commit; o carimbo fica em andamento até o commit terminar.
+        """
+        now = self.catalog_version.next_timestamp(db.session)
+        try:
+            return self._reprice_at(ids, original, current, now)
+        finally:
+            # Depois do commit, o histórico do lote já está no banco ou na fila do sink
+            self.catalog_version.release(now)
+
+    def _reprice_at(self, ids: np.ndarray, original: np.ndarray, current: np.ndarray, now: datetime) -> int:
+        from app.services.price_writer import apply_price_updates
+        with metrics.PHASE_SECONDS.labels('compute').time():
+            params = self._rule_params(ids)
+            if self.workers and self.workers > 1:
+                mask, new_prices = self._compute_sharded(ids, original, current, params)
+            else:
+                mask, new_prices = compute_new_prices(original, current, rng=self._rng, **params)
+        changed_ids = ids[mask]
+        with metrics.PHASE_SECONDS.labels('flush').time():
+            written = apply_price_updates(db.session, changed_ids, new_prices, now,
+                                          history=self.history_sink is None)
+        if written > 0:
+            with self._history_batch(changed_ids, new_prices, now):
+                with metrics.COMMIT_SECONDS.time():
+                    db.session.commit()
+            metrics.PRODUCTS_UPDATED.inc(written)
+            if self.history_sink is None:
+                # Uma linha de histórico por produto alterado (com o sink, contadas no flush)
+                metrics.HISTORY_ROWS.inc(written)
+            self._after_commit(changed_ids, new_prices, now)
+        return written
+
+    def _history_batch(self, ids: np.ndarray, prices: np.ndarray, now: datetime):
+        if self.history_sink is None:
+            return nullcontext()
+        return self.history_sink.batch(ids, prices, now)
+
+    @contextmanager
+    def _locked(self):
+        """
+        Segura `_lock`, medindo o tempo de espera.
+        """
+        started = perf_counter()
+        with self._lock:
+            metrics.LOCK_WAIT_SECONDS.observe(perf_counter() - started)
+            yield
+
+    def _after_commit(self, ids: np.ndarray, prices: np.ndarray, now: datetime) -> None:
+        """
+        Entrega um lote gravado aos consumidores do processo (SSE e listeners de commit).
+        """
+        self.price_stream.publish_changes(ids, prices, now)
+        for listener in self._commit_listeners:
+            try:
+                listener(ids, prices, now)
+            except Exception as e:
+                logger.error(f"Commit listener {listener!r} failed: {str(e)}")
+
+    def add_commit_listener(self, listener: Callable[[np.ndarray, np.ndarray, datetime], None]) -> None:
+        """
+        Registra um callback chamado com o lote gravado depois de cada commit.
+        """
+        if listener not in self._commit_listeners:
+            self._commit_listeners.append(listener)
+
+    def _rule_params(self, ids: np.ndarray) -> dict:
+        """
+        Argumentos do kernel para um lote: a faixa global ou as regras da categoria atual de cada produto.
+        """
+        if self._rule_table is None:
+            return {'min_factor': self.min_price_factor, 'max_factor': self.max_price_factor}
+        from app.services.price_writer import load_product_categories
+        return self._rule_table.params_for(load_product_categories(db.session, ids))
+
+    def _compute_sharded(self, ids: np.ndarray, original: np.ndarray, current: np.ndarray,
+                         params: Optional[dict] = None):
+        """
+        Divide o lote em `workers` faixas de IDs e precifica no pool de processos.
+        """
+        params = params or {'min_factor': self.min_price_factor, 'max_factor': self.max_price_factor}
+
+        def part(name, b):
+            value = params.get(name)
+            return value[b] if isinstance(value, np.ndarray) else value
+
+        bounds = np.array_split(np.arange(len(ids)), self.workers)
+        shards = [
+            (original[b], current[b], part('min_factor', b), part('max_factor', b),
+             shard_seed(self.seed, self._cycle_seq, int(ids[b[0]])),
+             part('floor', b), part('max_step', b), part('ending', b))
+            for b in bounds if len(b)
+        ]
+        if len(ids) >= PARALLEL_MIN_BATCH:
+            executor = self._get_executor()
+            results = list(executor.map(price_shard, *zip(*shards)))
+        else:
+            results = [price_shard(*shard) for shard in shards]
+        mask = np.concatenate([r[0] for r in results])
+        new_prices = np.concatenate([r[1] for r in results])
+        return mask, new_prices
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            logger.info(f"Started pricing process pool with {self.workers} workers.")
+        return self._executor
+
+    def _shutdown_executor(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _update_prices_loop(self):
+        # Ticks em taxa fixa: cada grupo roda quando vence, sem acumular o tempo de execução no período
+        self.scheduler.run(self._stop_event, self._run_group)
+
+    def _run_group(self, group: str) -> None:
+        if self.lease is not None and not self._leading:
+            return
+        with self.app.app_context():
+            try:
+                self.run_cycle(group)
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                self._error_count += 1
+                metrics.CYCLE_ERRORS.inc()
+                logger.error(f"Database error updating prices: {str(e)}")
+            except Exception as e:
+                db.session.rollback()
+                self._error_count += 1
+                metrics.CYCLE_ERRORS.inc()
+                logger.error(f"Unexpected error updating prices: {str(e)}")
+
+    def _heartbeat_loop(self):
         while not self._stop_event.is_set():
             with self.app.app_context():
                 try:
-                    with self._lock:
-                        logger.debug("Starting price update cycle")
-                        products = Product.query.all()
-                        price_histories = []
-                        updated_products = 0
-
-                        for product in products:
-                            # Pular produtos com preço original inválido
-                            if product.original_price <= 0:
-                                logger.debug(f"Skipping product {product.id} with original_price <= 0")
-                                continue
-                            
-                            # Calcular limites
-                            min_price = round(product.original_price * self.min_price_factor, 2)
-                            max_price = round(product.original_price * self.max_price_factor, 2)
-                            
-                            # Garantir min <= max
-                            if min_price > max_price:
-                                min_price, max_price = max_price, min_price
-                            
-                            # Pular se não houver variação possível
-                            if min_price == max_price:
-                                logger.debug(f"Skipping product {product.id} because min_price == max_price")
-                                continue
-                            
-                            # Usar gerador criptográfico para maior aleatoriedade
-                            secure_random = random.SystemRandom()
-                            new_price = None
-                            max_attempts = 100
-                            
-                            # Tentar gerar preço diferente do atual
-                            for _ in range(max_attempts):
-                                candidate = round(secure_random.uniform(min_price, max_price), 2)
-                                if candidate != product.current_price:
-                                    new_price = candidate
-                                    break
-                            
-                            # Fallback estratégico se ainda for igual
-                            if new_price is None or new_price == product.current_price:
-                                # Escolher o limite oposto ao preço atual
-                                if product.current_price == min_price:
-                                    new_price = max_price
-                                else:
-                                    new_price = min_price
-                                logger.debug(f"Used fallback pricing for product {product.id}")
-                            
-                            # Atualizar produto
-                            logger.debug(f"Updating product {product.id}: current={product.current_price}, new={new_price}, original={product.original_price}")
-                            product.current_price = new_price
-                            product.updated_at = datetime.now(timezone.utc)
-                                                        
-                            history = PriceHistory(
-                                product_id=product.id,
-                                price=new_price,
-                                timestamp=datetime.now(timezone.utc)
-                            )
-                            price_histories.append(history)
-                            updated_products += 1
-                            
-
-                        if updated_products > 0:
-                            db.session.bulk_save_objects(price_histories)
-                            db.session.commit()
-                            self._last_update = datetime.now(timezone.utc)
-                            self._update_count += 1
-                            logger.info(f"Prices updated for {updated_products}/{len(products)} products at {self._last_update.isoformat()}")
-                        else:
-                            logger.info(f"No products found to update at {datetime.now(timezone.utc).isoformat()}")
-
-                except SQLAlchemyError as e:
-                    db.session.rollback()
-                    self._error_count += 1
-                    logger.error(f"Database error updating prices: {str(e)}")
+                    self.heartbeat()
                 except Exception as e:
                     db.session.rollback()
-                    self._error_count += 1
-                    logger.error(f"Unexpected error updating prices: {str(e)}")
+                    # Sem renovar, o lease pode expirar e outro worker assumir: para de rodar ciclos
+                    self._set_leading(False)
+                    logger.error(f"Failed to renew automation lease: {str(e)}")
+            self._stop_event.wait(self.lease.ttl / 3)
+
+    def heartbeat(self) -> bool:
+        """
+        Obtém ou renova o lease enquanto o estado compartilhado está ligado, ou o devolve se foi desligado.
 
-            # Aguarda o intervalo antes da próxima iteração
-            self._stop_event.wait(self.interval)
+        Returns:
+            bool: Se este worker roda os ciclos.
+        """
+        with self._lease_lock:
+            state = self.lease.read()
+            if not state['enabled']:
+                if self._leading:
+                    self.lease.release()
+                self._set_leading(False)
+                return False
+            leading = self.lease.try_acquire(self._counters() if self._leading else None)
+            if leading and not self._leading:
+                # Continua a contagem do líder anterior
+                self._adopt_counters(state['status'])
+            self._set_leading(leading)
+            return leading
+
+    def _set_leading(self, leading: bool) -> None:
+        if leading == self._leading:
+            return
+        self._leading = leading
+        logger.info(f"Worker {self.lease.holder} {'acquired' if leading else 'released'} the price automation lease.")
+        self.stream_relay.set_active(not leading)
+        for listener in self._leadership_listeners:
+            try:
+                listener(leading)
+            except Exception as e:
+                logger.error(f"Leadership listener {listener!r} failed: {str(e)}")
+
+    def add_leadership_listener(self, listener: Callable[[bool], None]) -> None:
+        """
+        Registra um callback chamado com `True`/`False` quando este worker ganha ou perde o lease.
+        """
+        if listener not in self._leadership_listeners:
+            self._leadership_listeners.append(listener)
+
+    def _counters(self) -> dict:
+        return {
+            "last_update": self._last_update.isoformat() if self._last_update else None,
+            "update_count": self._update_count,
+            "error_count": self._error_count,
+        }
+
+    def _adopt_counters(self, status: dict) -> None:
+        if status.get('last_update'):
+            self._last_update = datetime.fromisoformat(status['last_update'])
+        self._update_count = max(self._update_count, status.get('update_count', 0))
+        self._error_count = max(self._error_count, status.get('error_count', 0))
+
+    def join_election(self) -> None:
+        """
+        Inicia o laço e o heartbeat do lease deste worker (só no modo lease).
+        """
+        with self._locked():
+            self._start_thread()
+            self.stream_relay.start()
+            if self._heartbeat_thread is None or not self._heartbeat_thread.is_alive():
+                self._heartbeat_thread = Thread(target=self._heartbeat_loop, daemon=True)
+                self._heartbeat_thread.start()
+
+    def _start_thread(self) -> bool:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = Thread(target=self._update_prices_loop, daemon=True)
+            self._thread.start()
+            return True
+        return False
 
     def start(self) -> bool:
-        with self._lock:
+        if self.lease is not None:
+            changed = self.lease.set_enabled(True)
+            self.join_election()
+            # Quem recebeu o pedido tenta assumir já, sem esperar o próximo heartbeat
+            self.heartbeat()
+            if changed:
+                logger.info("Price automation started.")
+            else:
+                logger.warning("Price automation is already running.")
+            return changed
+        with self._locked():
             if self._thread is None or not self._thread.is_alive():
                 self._stop_event.clear()
                 self._thread = Thread(target=self._update_prices_loop, daemon=True)
@@ -127,26 +369,82 @@ class PriceAutomation:
             return False
 
     def stop(self) -> bool:
-        with self._lock:
-            if self._thread and self._thread.is_alive():
-                self._stop_event.set()
-                self._thread.join()
-                self._thread = None
-                logger.info("Price automation stopped.")
-                return True
-            logger.info("Price automation is not running.")
-            return False
+        if self.lease is not None:
+            # O líder vê o estado desligado no próximo heartbeat e para; este worker segue de reserva
+            changed = self.lease.set_enabled(False)
+            self.heartbeat()
+            logger.info("Price automation stopped." if changed else "Price automation is not running.")
+            return changed
+        thread = self._thread
+        if thread and thread.is_alive():
+            # Sinaliza antes de pegar o lock: o ciclo em andamento só termina o chunk atual
+            self._stop_event.set()
+            thread.join()
+            with self._locked():
+                if self._thread is thread:
+                    self._thread = None
+                self._shutdown_executor()
+            if self.history_sink is not None:
+                self.history_sink.drain()
+            logger.info("Price automation stopped.")
+            return True
+        logger.info("Price automation is not running.")
+        return False
+
+    def close(self) -> None:
+        """
+        Para as threads deste worker e devolve o lease (o estado compartilhado é mantido).
+        """
+        self._stop_event.set()
+        for thread in (self._thread, self._heartbeat_thread):
+            if thread is not None and thread.is_alive():
+                thread.join()
+        self._thread = self._heartbeat_thread = None
+        if self.stream_relay is not None:
+            self.stream_relay.stop()
+        if self.lease is not None and self._leading:
+            with self.app.app_context():
+                self.lease.release()
+            self._set_leading(False)
+        self._shutdown_executor()
+        if self.history_sink is not None:
+            self.history_sink.close()
 
     def is_running(self) -> bool:
+        if self.lease is not None:
+            state = self.lease.read()
+            return state['enabled'] and state['active']
         return self._thread is not None and self._thread.is_alive()
 
     def get_status(self) -> dict:
+        counters = self._counters()
+        leader = None
+        if self.lease is not None:
+            state = self.lease.read()
+            if not self._leading:
+                # Contadores publicados pelo líder, iguais em qualquer worker
+                counters.update({k: v for k, v in state['status'].items() if k in counters})
+            leader = {
+                "holder": state['holder'] if state['active'] else None,
+                "expires_at": state['expires_at'].isoformat() if state['active'] else None,
+                "heartbeat_at": state['heartbeat_at'].isoformat() if state['heartbeat_at'] else None,
+                "worker": self.lease.holder,
+                "is_leader": self._leading,
+            }
         return {
             "is_running": self.is_running(),
-            "last_update": self._last_update.isoformat() if self._last_update else None,
-            "update_count": self._update_count,
-            "error_count": self._error_count,
+            **counters,
+            "leader": leader,
             "interval": self.interval,
+            "chunk_size": self.chunk_size,
+            "workers": self.workers,
+            "stream": {
+                **self.price_stream.get_status(),
+                "relay": self.stream_relay.get_status() if self.stream_relay is not None else None,
+            },
+            "history_sink": self.history_sink.get_status() if self.history_sink is not None else None,
+            "schedule": self.scheduler.get_status(),
+            "rules": self.rules,
             "price_range": {
                 "min_factor": self.min_price_factor,
                 "max_factor": self.max_price_factor
@@ -154,28 +452,82 @@ class PriceAutomation:
         }
 
     def set_interval(self, interval: float) -> None:
-        with self._lock:
+        with self._locked():
             if interval > 0:
                 self.interval = interval
+                self.scheduler.set_period(DEFAULT_GROUP, interval)
                 logger.info(f"Price update interval set to {interval} seconds.")
             else:
                 logger.error("Interval must be positive.")
 
+    def set_workers(self, workers: Optional[int]) -> None:
+        with self._locked():
+            if workers is None or workers > 0:
+                self._shutdown_executor()
+                self.workers = workers
+                logger.info(f"Price computation workers set to {workers}.")
+            else:
+                logger.error("Workers must be positive.")
+
+    def set_chunk_size(self, chunk_size: Optional[int]) -> None:
+        with self._locked():
+            if chunk_size is None or chunk_size > 0:
+                self.chunk_size = chunk_size
+                logger.info(f"Price update chunk size set to {chunk_size}.")
+            else:
+                logger.error("Chunk size must be positive.")
+
     def set_price_range(self, min_factor: float, max_factor: float) -> None:
-        with self._lock:
+        with self._locked():
             if 0 <= min_factor <= max_factor:
+                try:
+                    table = compile_rules(self.rules, min_factor, max_factor) if self.rules else None
+                except ValueError as e:
+                    logger.error(f"Invalid price range for the current pricing rules: {str(e)}")
+                    return
                 self.min_price_factor = min_factor
                 self.max_price_factor = max_factor
+                self._rule_table = table
                 logger.info(f"Price range set to {min_factor*100}% - {max_factor*100}% of original price.")
             else:
                 logger.error("Invalid price range: min_factor must be non-negative and <= max_factor.")
 
+    def set_rules(self, rules) -> None:
+        """
+        Substitui as regras de preço (ver `pricing_rules.validate_rules`).
+
+        Raises:
+            ValueError: Se as regras forem inválidas.
+        """
+        rules = validate_rules(rules)
+        with self._locked():
+            table = compile_rules(rules, self.min_price_factor, self.max_price_factor) if rules else None
+            self.rules = rules
+            self._rule_table = table
+        logger.info(f"Pricing rules set: {len(rules)} rules.")
+
 # Instância singleton
 price_automation: Optional[PriceAutomation] = None
+_init_lock = Lock()
 
-def init_price_automation(app: Flask, interval: float = 10, min_price_factor: float = 0.8, max_price_factor: float = 1.2) -> PriceAutomation:
+def init_price_automation(app: Flask, interval: float = 10, min_price_factor: float = 0.8, max_price_factor: float = 1.2,
+                          chunk_size: Optional[int] = None, workers: Optional[int] = None,
+                          seed: Optional[int] = None, schedule: Optional[Dict[str, float]] = None,
+                          tick: float = 1.0, tick_budget: Optional[float] = None,
+                          lease: Optional[LeaderLease] = None,
+                          history_sink: Optional[HistorySink] = None,
+                          stream_poll_interval: float = DEFAULT_POLL_INTERVAL) -> PriceAutomation:
     global price_automation
-    with Lock():
+    with _init_lock:
+        if price_automation is not None and price_automation.app is not app:
+            # Um novo create_app (outro banco, lease ou sink): a instância do app anterior é encerrada
+            price_automation.close()
+            price_automation = None
         if price_automation is None:
-            price_automation = PriceAutomation(app, interval, min_price_factor, max_price_factor)
-        return price_automation
\ No newline at end of file
+            price_automation = PriceAutomation(app, interval, min_price_factor, max_price_factor,
+                                               seed=seed, chunk_size=chunk_size, workers=workers,
+                                               schedule=schedule, tick=tick, tick_budget=tick_budget,
+                                               lease=lease,
+                                               history_sink=history_sink,
+                                               stream_poll_interval=stream_poll_interval)
+        return price_automation
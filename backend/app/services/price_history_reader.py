@@ -0,0 +1,260 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+from sqlalchemy import func, literal, select
+from sqlalchemy.orm import Session
+from app.models.product import PriceHistory
+from app.models.storage import is_compact, stored
+from app.services.catalog_version import EPOCH, from_version, to_version
+from app.services.history_archive import HistoryArchive
+from app.services.history_compaction import TIERS, _as_utc, ceil_time, floor_time, get_watermark
+
+history_table = PriceHistory.__table__
+
+
+def _range_filter(stmt, product_id: int, start: Optional[datetime], end: Optional[datetime]):
+    # Todas as condições usam o índice ix_price_history_product_timestamp (product_id, timestamp)
+    stmt = stmt.where(history_table.c.product_id == product_id)
+    if start is not None:
+        stmt = stmt.where(history_table.c.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(history_table.c.timestamp <= end)
+    return stmt
+
+
+class HistoryPoint(NamedTuple):
+    price: float
+    timestamp: datetime
+
+
+def fetch_page(session: Session, product_id: int, start: Optional[datetime] = None, end: Optional[datetime] = None,
+               before: Optional[datetime] = None, limit: int = 1000,
+               archive: Optional[HistoryArchive] = None) -> List:
+    """
+    Uma página do histórico bruto, do mais recente ao mais antigo, paginada por `timestamp`.
+    Com `archive`, continua nos pontos arquivados.
+
+    Returns:
+        list: Linhas com `price` e `timestamp`.
+    """
+    watermark = archive.watermark if archive is not None else None
+    bounds = [_as_utc(t) for t in (end, before) if t is not None]
+    upper = min(bounds) if bounds else None
+    rows = []
+    if watermark is None or upper is None or upper >= watermark:
+        compact = is_compact(session)
+        columns = (stored(history_table.c.timestamp), stored(history_table.c.price)) if compact else (
+            history_table.c.price, history_table.c.timestamp)
+        stmt = _range_filter(select(*columns), product_id, start, end)
+        if before is not None:
+            stmt = stmt.where(history_table.c.timestamp < before)
+        stmt = stmt.order_by(history_table.c.timestamp.desc()).limit(limit)
+        if compact:
+            # Conversão da página inteira de uma vez: datetimes criados pelo numpy, não linha a linha
+            ts_ms, prices = _stored_series(session, stmt)
+            rows = [HistoryPoint(*point) for point in zip(
+                prices.tolist(), ts_ms.astype('datetime64[ms]').astype('datetime64[us]').tolist()
+            )]
+        else:
+            rows = session.execute(stmt).all()
+    if watermark is None or len(rows) == limit or (start is not None and _as_utc(start) >= watermark):
+        return rows
+
+    # Pontos arquivados: todos anteriores ao watermark
+    archive_end = watermark - timedelta(milliseconds=1)
+    if end is not None:
+        archive_end = min(archive_end, _as_utc(end))
+    if before is not None:
+        archive_end = min(archive_end, _as_utc(before) - timedelta(milliseconds=1))
+    ts_ms, cents = archive.read_range(product_id, start, archive_end)
+    take = limit - len(rows)
+    ts_ms, cents = ts_ms[-take:][::-1], cents[-take:][::-1]
+    return rows + [
+        HistoryPoint(price / 100, from_version(ts).replace(tzinfo=None))
+        for ts, price in zip(ts_ms.tolist(), cents.tolist())
+    ]
+
+
+def fetch_series(session: Session, product_id: int, start: Optional[datetime] = None,
+                 end: Optional[datetime] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Histórico bruto de um intervalo, do mais antigo ao mais recente.
+
+    Returns:
+        (ts_ms, prices): Milissegundos desde a época (int64) e preços (float64).
+    """
+    if is_compact(session):
+        return _stored_series(session, _range_filter(
+            select(stored(history_table.c.timestamp), stored(history_table.c.price)), product_id, start, end
+        ).order_by(history_table.c.timestamp))
+    stmt = _range_filter(
+        select(history_table.c.timestamp, history_table.c.price), product_id, start, end
+    ).order_by(history_table.c.timestamp)
+    rows = session.execute(stmt).all()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    timestamps, prices = zip(*rows)
+    ts_ms = np.array(timestamps, dtype='datetime64[ms]').astype(np.int64)
+    return ts_ms, np.array(prices, dtype=np.float64)
+
+
+def _stored_series(session: Session, stmt) -> Tuple[np.ndarray, np.ndarray]:
+    # Formato compacto: epoch ms e centavos chegam como inteiros, sem datetime por linha
+    rows = session.execute(stmt).all()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    data = np.array([tuple(row) for row in rows], dtype=np.int64)
+    return data[:, 0], data[:, 1] / 100
+
+
+def format_timestamp(timestamp: datetime) -> str:
+    """
+    Instante de um ponto como a API o devolve: ISO 8601 em UTC, sempre com microssegundos.
+    """
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp.isoformat(timespec='microseconds')
+
+
+def ms_to_iso(ts_ms: np.ndarray) -> List[str]:
+    # Mesmo formato de format_timestamp, para as séries em epoch ms (OHLC e LTTB)
+    return np.datetime_as_string(ts_ms.astype('datetime64[ms]'), unit='us').tolist()
+
+
+def _empty_series() -> Dict[str, np.ndarray]:
+    empty = np.empty(0)
+    return {'timestamp': np.empty(0, dtype=np.int64), 'open': empty, 'high': empty,
+            'low': empty, 'close': empty, 'count': np.empty(0, dtype=np.int64)}
+
+
+def _rows_to_series(rows: List) -> Dict[str, np.ndarray]:
+    if not rows:
+        return _empty_series()
+    timestamps, open_, high, low, close, count = zip(*rows)
+    return {
+        'timestamp': np.array(timestamps, dtype='datetime64[ms]').astype(np.int64),
+        'open': np.array(open_, dtype=np.float64),
+        'high': np.array(high, dtype=np.float64),
+        'low': np.array(low, dtype=np.float64),
+        'close': np.array(close, dtype=np.float64),
+        'count': np.array(count, dtype=np.int64),
+    }
+
+
+def _tier_segment(session: Session, tier, product_id: int, lo: datetime, hi: datetime) -> Dict[str, np.ndarray]:
+    stmt = (
+        select(tier.bucket, tier.open, tier.high, tier.low, tier.close, tier.count)
+        .where(tier.product_id == product_id, tier.bucket >= lo, tier.bucket < hi)
+        .order_by(tier.bucket)
+    )
+    return _rows_to_series(session.execute(stmt).all())
+
+
+def _archive_segment(archive: HistoryArchive, product_id: int, lo: datetime,
+                     hi: Optional[datetime]) -> Dict[str, np.ndarray]:
+    ts_ms, cents = archive.read_range(product_id, lo, hi)
+    if hi is not None and len(ts_ms) and ts_ms[-1] >= to_version(hi):
+        # read_range inclui o fim; o segmento é [lo, hi)
+        keep = np.searchsorted(ts_ms, to_version(hi), 'left')
+        ts_ms, cents = ts_ms[:keep], cents[:keep]
+    prices = cents / 100
+    return {'timestamp': ts_ms, 'open': prices, 'high': prices, 'low': prices, 'close': prices,
+            'count': np.ones(len(ts_ms), dtype=np.int64)}
+
+
+def _raw_segment(session: Session, product_id: int, lo: datetime, hi: Optional[datetime],
+                 archive: Optional[HistoryArchive] = None) -> List[Dict[str, np.ndarray]]:
+    watermark = archive.watermark if archive is not None else None
+    segments = []
+    if watermark is not None and _as_utc(lo) < watermark:
+        # Parte anterior ao watermark vem do arquivo, sem consultar o banco
+        archived_hi = min(watermark, _as_utc(hi)) if hi is not None else watermark
+        segments.append(_archive_segment(archive, product_id, lo, archived_hi))
+        if archived_hi == watermark and (hi is None or _as_utc(hi) > watermark):
+            lo = watermark
+        else:
+            return segments
+    if is_compact(session):
+        stmt = select(stored(history_table.c.timestamp), stored(history_table.c.price))
+    else:
+        stmt = select(
+            history_table.c.timestamp, history_table.c.price, history_table.c.price,
+            history_table.c.price, history_table.c.price, literal(1)
+        )
+    stmt = stmt.where(history_table.c.product_id == product_id, history_table.c.timestamp >= lo)
+    if hi is not None:
+        stmt = stmt.where(history_table.c.timestamp < hi)
+    if is_compact(session):
+        ts_ms, prices = _stored_series(session, stmt.order_by(history_table.c.timestamp))
+        segments.append({'timestamp': ts_ms, 'open': prices, 'high': prices, 'low': prices, 'close': prices,
+                         'count': np.ones(len(ts_ms), dtype=np.int64)})
+        return segments
+    segments.append(_rows_to_series(session.execute(stmt.order_by(history_table.c.timestamp)).all()))
+    return segments
+
+
+def _collect(session: Session, tiers: list, product_id: int, lo: datetime, hi: Optional[datetime],
+             archive: Optional[HistoryArchive] = None) -> List[Dict[str, np.ndarray]]:
+    """
+    Cobre [lo, hi) com a camada mais grossa nos baldes já agregados e desce às mais finas nas bordas.
+    """
+    if hi is not None and lo >= hi:
+        return []
+    if not tiers:
+        return _raw_segment(session, product_id, lo, hi, archive)
+    tier, finer = tiers[0], tiers[1:]
+    watermark = get_watermark(session, tier)
+    if watermark is None:
+        return _collect(session, finer, product_id, lo, hi, archive)
+    covered_lo = ceil_time(lo, tier.BUCKET_SECONDS)
+    covered_hi = min(watermark, floor_time(hi, tier.BUCKET_SECONDS)) if hi is not None else watermark
+    if covered_lo >= covered_hi:
+        return _collect(session, finer, product_id, lo, hi, archive)
+    return (
+        _collect(session, finer, product_id, lo, covered_lo, archive)
+        + [_tier_segment(session, tier, product_id, covered_lo, covered_hi)]
+        + _collect(session, finer, product_id, covered_hi, hi, archive)
+    )
+
+
+def fetch_ohlc_series(session: Session, product_id: int, start: Optional[datetime] = None,
+                      end: Optional[datetime] = None, max_tier_seconds: Optional[int] = None,
+                      aligned_to: Optional[int] = None,
+                      archive: Optional[HistoryArchive] = None) -> Dict[str, np.ndarray]:
+    """
+    Linhas OHLC de um intervalo, do mais antigo ao mais recente, lidas das camadas de agregação mais baratas.
+    """
+    lo = start or EPOCH
+    hi = end + timedelta(microseconds=1) if end is not None else None
+    if archive is not None and archive.covers(end):
+        return _archive_segment(archive, product_id, lo, hi)
+    tiers = [
+        tier for tier, _, _ in reversed(TIERS)
+        if (max_tier_seconds is None or tier.BUCKET_SECONDS <= max_tier_seconds)
+        and (aligned_to is None or aligned_to % tier.BUCKET_SECONDS == 0)
+    ]
+    segments = [s for s in _collect(session, tiers, product_id, lo, hi, archive) if len(s['timestamp'])]
+    if not segments:
+        return _empty_series()
+    if len(segments) == 1:
+        return segments[0]
+    return {key: np.concatenate([s[key] for s in segments]) for key in segments[0]}
+
+
+def oldest_point(session: Session, product_id: int, archive: Optional[HistoryArchive] = None) -> Optional[datetime]:
+    """
+    Instante mais antigo ainda guardado de um produto, em qualquer camada.
+    """
+    if archive is not None:
+        archived = archive.oldest(product_id)
+        if archived is not None:
+            return archived
+    candidates = [session.execute(
+        select(func.min(history_table.c.timestamp)).where(history_table.c.product_id == product_id)
+    ).scalar()]
+    for tier, _, _ in TIERS:
+        candidates.append(session.execute(
+            select(func.min(tier.bucket)).where(tier.product_id == product_id)
+        ).scalar())
+    candidates = [c for c in candidates if c is not None]
+    return min(candidates).replace(tzinfo=timezone.utc) if candidates else None
@@ -0,0 +1,496 @@
+import logging
+import math
+from collections import OrderedDict
+from datetime import datetime, timezone
+from threading import Lock
+from time import monotonic
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from sqlalchemy import Float, Integer, cast, delete, func, insert, select, type_coerce
+from sqlalchemy.orm import Session
+from app.database.connection import db
+from app.models.price_rollup import RollupWatermark
+from app.models.price_stats import ProductPriceStats
+from app.models.product import Product, PriceHistory
+from app.models.storage import is_compact, stored
+from app.services.catalog_version import from_version, to_version
+from app.services.history_archive import HistoryArchive
+from app.services.history_compaction import get_watermark
+
+logger = logging.getLogger(__name__)
+
+history_table = PriceHistory.__table__
+stats_table = ProductPriceStats.__table__
+
+HOUR_MS = 3_600_000
+# Janelas móveis: (nome, largura do balde em ms, número de baldes)
+WINDOWS = (('24h', HOUR_MS, 24), ('7d', 6 * HOUR_MS, 28))
+# Bytes das janelas de um produto: início, contagem, soma, soma dos quadrados, mínimo e máximo por balde
+WINDOW_BYTES = sum(buckets for _, _, buckets in WINDOWS) * 6 * 8
+FLUSH_ROWS = 10_000
+
+
+class _Window:
+    """
+    Anel de baldes de tempo com contagem, somas, mínimo e máximo dos preços.
+    """
+    __slots__ = ('width', 'start', 'count', 'total', 'total_sq', 'low', 'high')
+
+    def __init__(self, width: int, buckets: int):
+        self.width = width
+        self.start = np.full(buckets, -1, dtype=np.int64)
+        self.count = np.zeros(buckets, dtype=np.int64)
+        self.total = np.zeros(buckets)
+        self.total_sq = np.zeros(buckets)
+        self.low = np.full(buckets, np.inf)
+        self.high = np.full(buckets, -np.inf)
+
+    def add(self, ts_ms: int, count: int, total: float, total_sq: float, low: float, high: float) -> None:
+        bucket = ts_ms // self.width
+        slot = bucket % len(self.start)
+        if self.start[slot] != bucket:
+            if self.start[slot] > bucket:
+                return
+            # O balde mais antigo do anel dá lugar ao novo
+            self.start[slot] = bucket
+            self.count[slot] = 0
+            self.total[slot] = self.total_sq[slot] = 0.0
+            self.low[slot], self.high[slot] = np.inf, -np.inf
+        self.count[slot] += count
+        self.total[slot] += total
+        self.total_sq[slot] += total_sq
+        self.low[slot] = min(self.low[slot], low)
+        self.high[slot] = max(self.high[slot], high)
+
+    def summary(self, now_ms: int) -> dict:
+        first = now_ms // self.width - len(self.start) + 1
+        valid = self.start >= first
+        count = int(self.count[valid].sum())
+        stats = _summary(count, float(self.total[valid].sum()), float(self.total_sq[valid].sum()),
+                         float(self.low[valid].min()) if count else None,
+                         float(self.high[valid].max()) if count else None)
+        stats['since'] = _iso(first * self.width)
+        return stats
+
+
+class _ProductWindows:
+    __slots__ = ('windows', 'last_ms')
+
+    def __init__(self):
+        self.windows = [_Window(width, buckets) for _, width, buckets in WINDOWS]
+        self.last_ms = -1
+
+    def add(self, ts_ms: int, price: float) -> None:
+        # Lotes já lidos do banco na carga da janela não são somados de novo
+        if ts_ms <= self.last_ms:
+            return
+        for window in self.windows:
+            window.add(ts_ms, 1, price, price * price, price, price)
+        self.last_ms = ts_ms
+
+
+class PriceStats:
+    """
+    Estatísticas de preço por produto (contagem, mínimo, máximo, média, desvio padrão e volatilidade),
+    de todo o histórico e nas janelas `WINDOWS`.
+    """
+
+    def __init__(self, flush_interval: float = 60.0, max_bytes: int = 16 * 1024 * 1024):
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        # Com o arquivo colunar, uma reconstrução completa também lê os pontos arquivados
+        self.archive: Optional[HistoryArchive] = None
+        self.history_sink = None
+        self.live = True
+        self._lock = Lock()
+        self._stats = {'loads': 0, 'window_loads': 0, 'evictions': 0, 'flushes': 0}
+        self._reset()
+
+    def init_app(self, app) -> None:
+        """
+        Configura para `app` e descarta o estado de um app anterior.
+        """
+        self.flush_interval = app.config.get('PRICE_STATS_FLUSH_INTERVAL', self.flush_interval)
+        self.max_bytes = app.config.get('PRICE_STATS_MAX_BYTES', self.max_bytes)
+        with self._lock:
+            self.live = True
+            self.archive = None
+            self.history_sink = None
+            self._stats = dict.fromkeys(self._stats, 0)
+            self._reset()
+
+    def _reset(self) -> None:
+        self._loaded = False
+        self._through_ms = 0
+        self._last_flush = monotonic()
+        self._count = np.zeros(0, dtype=np.int64)
+        self._total = np.zeros(0)
+        self._total_sq = np.zeros(0)
+        self._low = np.zeros(0)
+        self._high = np.zeros(0)
+        self._first = np.zeros(0, dtype=np.int64)
+        self._last = np.zeros(0, dtype=np.int64)
+        self._dirty = np.zeros(0, dtype=bool)
+        self._windows: OrderedDict = OrderedDict()
+
+    @property
+    def max_products(self) -> int:
+        return self.max_bytes // WINDOW_BYTES
+
+    def set_live(self, live: bool) -> None:
+        """
+        Listener de liderança: mantém os números em memória só enquanto este processo grava preços.
+        """
+        with self._lock:
+            self.live = live
+            self._reset()
+
+    # Atualização
+
+    def on_commit(self, ids: np.ndarray, prices: np.ndarray, timestamp: datetime) -> None:
+        """
+        Listener de commit da `PriceAutomation`: soma o lote às somas acumuladas e às janelas carregadas.
+        """
+        ts = to_version(timestamp)
+        snapshot = None
+        with self._lock:
+            if not self.live or not len(ids):
+                return
+            self._ensure_loaded(db.session)
+            self._apply(ids, prices, ts)
+            if monotonic() - self._last_flush >= self.flush_interval:
+                snapshot = self._take_snapshot()
+        if snapshot is not None:
+            self._write_snapshot(db.session, *snapshot)
+
+    def _apply(self, ids: np.ndarray, prices: np.ndarray, ts: int) -> None:
+        self._grow(int(ids.max()) + 1)
+        # Pontos que a carga do banco já incluiu não são somados de novo
+        fresh = self._last[ids] < ts
+        ids, prices = ids[fresh], prices[fresh]
+        self._count[ids] += 1
+        self._total[ids] += prices
+        self._total_sq[ids] += prices * prices
+        self._low[ids] = np.minimum(self._low[ids], prices)
+        self._high[ids] = np.maximum(self._high[ids], prices)
+        self._first[ids] = np.where(self._first[ids] < 0, ts, self._first[ids])
+        self._last[ids] = ts
+        self._dirty[ids] = True
+        self._through_ms = max(self._through_ms, ts)
+        if self._windows:
+            loaded = np.fromiter(self._windows.keys(), dtype=np.int64, count=len(self._windows))
+            mask = np.isin(ids, loaded)
+            for product_id, price in zip(ids[mask].tolist(), prices[mask].tolist()):
+                self._windows[product_id].add(ts, price)
+
+    def _grow(self, size: int) -> None:
+        current = len(self._count)
+        if size <= current:
+            return
+        size = max(size, 2 * current)
+        for name, fill in (('_count', 0), ('_total', 0.0), ('_total_sq', 0.0), ('_low', np.inf),
+                           ('_high', -np.inf), ('_first', -1), ('_last', -1), ('_dirty', False)):
+            array = getattr(self, name)
+            grown = np.full(size, fill, dtype=array.dtype)
+            grown[:current] = array
+            setattr(self, name, grown)
+
+    def _pending(self) -> list:
+        """
+        `(ts_ms, ids, prices)` dos lotes com commit ainda na fila do sink, do mais antigo ao mais recente.
+        """
+        if self.history_sink is None:
+            return []
+        return [(to_version(timestamp), ids, prices) for timestamp, ids, prices in self.history_sink.pending_batches()]
+
+    def _ensure_loaded(self, session: Session) -> None:
+        if self._loaded:
+            return
+        pending = self._pending()
+        through = get_watermark(session, ProductPriceStats)
+        totals = _load_totals(session, None, through, self.archive)
+        if totals:
+            ids = np.fromiter(totals.keys(), dtype=np.int64, count=len(totals))
+            data = np.array(list(totals.values()))
+            self._grow(int(ids.max()) + 1)
+            self._count[ids] = data[:, 0]
+            self._total[ids], self._total_sq[ids] = data[:, 1], data[:, 2]
+            self._low[ids], self._high[ids] = data[:, 3], data[:, 4]
+            self._first[ids], self._last[ids] = data[:, 5], data[:, 6]
+            # A próxima gravação inclui a história reaplicada
+            self._dirty[ids] = True
+            self._through_ms = int(data[:, 6].max())
+        if through is not None:
+            self._through_ms = max(self._through_ms, to_version(through))
+        for ts, ids, prices in pending:
+            self._apply(ids, prices, ts)
+        self._loaded = True
+        self._stats['loads'] += 1
+        logger.info(f"Price statistics loaded for {len(totals)} products")
+
+    # Persistência
+
+    def _take_snapshot(self):
+        ids = np.flatnonzero(self._dirty)
+        self._dirty[ids] = False
+        self._last_flush = monotonic()
+        rows = [
+            {'product_id': product_id, 'count': count, 'total': total, 'total_sq': total_sq,
+             'min_price': low, 'max_price': high,
+             'first_at': from_version(first), 'last_at': from_version(last)}
+            for product_id, count, total, total_sq, low, high, first, last in zip(
+                ids.tolist(), self._count[ids].tolist(), self._total[ids].tolist(), self._total_sq[ids].tolist(),
+                self._low[ids].tolist(), self._high[ids].tolist(), self._first[ids].tolist(),
+                self._last[ids].tolist()
+            )
+        ]
+        return ids, rows, self._through_ms
+
+    def _write_snapshot(self, session: Session, ids: np.ndarray, rows: List[dict], through_ms: int) -> None:
+        try:
+            _write_rows(session, rows, through_ms)
+            self._stats['flushes'] += 1
+        except Exception as e:
+            session.rollback()
+            with self._lock:
+                if len(self._dirty) >= len(ids):
+                    self._dirty[ids] = True
+            logger.error(f"Failed to save price statistics: {str(e)}")
+
+    def flush(self, session: Session) -> int:
+        """
+        Grava as somas alteradas desde o último flush. Retorna as linhas gravadas.
+        """
+        with self._lock:
+            if not self.live or not self._loaded:
+                return 0
+            snapshot = self._take_snapshot()
+        self._write_snapshot(session, *snapshot)
+        return len(snapshot[1])
+
+    def rebuild(self, session: Session) -> int:
+        """
+        Recalcula `product_price_stats` a partir do histórico (e do arquivo). Retorna o número de produtos.
+        """
+        totals = _load_totals(session, None, None, self.archive)
+        rows = [
+            {'product_id': product_id, 'count': count, 'total': total, 'total_sq': total_sq,
+             'min_price': low, 'max_price': high, 'first_at': from_version(first), 'last_at': from_version(last)}
+            for product_id, (count, total, total_sq, low, high, first, last) in totals.items()
+        ]
+        through_ms = max((row[6] for row in totals.values()), default=0)
+        session.execute(delete(stats_table))
+        session.execute(delete(RollupWatermark.__table__).where(RollupWatermark.tier == stats_table.name))
+        _write_rows(session, rows, through_ms)
+        with self._lock:
+            self._reset()
+        return len(rows)
+
+    # Leitura
+
+    def get(self, session: Session, ids: Iterable[int], now: Optional[datetime] = None) -> Dict[int, dict]:
+        """
+        Estatísticas de cada produto de `ids` (que devem existir), por id.
+        """
+        ids = list(ids)
+        now_ms = to_version(now or datetime.now(timezone.utc))
+        with self._lock:
+            if self.live:
+                return self._get_live(session, ids, now_ms)
+        return self._get_from_db(session, ids, now_ms)
+
+    def _get_live(self, session: Session, ids: List[int], now_ms: int) -> Dict[int, dict]:
+        self._ensure_loaded(session)
+        missing = [product_id for product_id in ids if product_id not in self._windows]
+        if missing:
+            pending = self._pending()
+            windows = _load_windows(session, missing, now_ms)
+            for product_id, points in _pending_points(pending, missing).items():
+                for ts, price in points:
+                    windows[product_id].add(ts, price)
+            self._windows.update(windows)
+            self._stats['window_loads'] += len(missing)
+        result = {}
+        for product_id in ids:
+            windows = self._windows[product_id]
+            self._windows.move_to_end(product_id)
+            if product_id < len(self._count):
+                totals = (self._count[product_id], self._total[product_id], self._total_sq[product_id],
+                          self._low[product_id], self._high[product_id], self._first[product_id],
+                          self._last[product_id])
+            else:
+                totals = None
+            result[product_id] = _product_stats(product_id, totals, windows, now_ms)
+        while len(self._windows) > max(self.max_products, 0):
+            self._windows.popitem(last=False)
+            self._stats['evictions'] += 1
+        return result
+
+    def _get_from_db(self, session: Session, ids: List[int], now_ms: int) -> Dict[int, dict]:
+        pending = self._pending()
+        through = get_watermark(session, ProductPriceStats)
+        totals = _load_totals(session, ids, through, self.archive)
+        windows = _load_windows(session, ids, now_ms)
+        for product_id, points in _pending_points(pending, ids).items():
+            for ts, price in points:
+                windows[product_id].add(ts, price)
+                if product_id not in totals or ts > totals[product_id][6]:
+                    _merge(totals, product_id, [1, price, price * price, price, price, ts, ts])
+        return {
+            product_id: _product_stats(product_id, totals.get(product_id), windows[product_id], now_ms)
+            for product_id in ids
+        }
+
+    def get_status(self) -> dict:
+        return {
+            **self._stats,
+            'live': self.live,
+            'loaded': self._loaded,
+            'products': int(np.count_nonzero(self._count)),
+            'window_products': len(self._windows),
+            'max_window_products': self.max_products,
+            'through': _iso(self._through_ms) if self._through_ms else None,
+        }
+
+
+def _price_value(session: Session):
+    # Preço em unidades monetárias dentro do SQL (no formato compacto, centavos / 100)
+    if is_compact(session):
+        return type_coerce(stored(history_table.c.price), Float) / 100
+    return type_coerce(history_table.c.price, Float)
+
+
+def _hour_bucket(session: Session):
+    if is_compact(session):
+        return stored(history_table.c.timestamp) // HOUR_MS
+    return cast(func.strftime('%s', history_table.c.timestamp), Integer) // 3600
+
+
+def _load_totals(session: Session, ids: Optional[List[int]], through: Optional[datetime],
+                 archive: Optional[HistoryArchive]) -> Dict[int, list]:
+    """
+    Somas de todo o histórico por produto: as linhas salvas mais o histórico depois de `through`.
+
+    Returns:
+        dict: id -> [count, total, total_sq, min, max, first_ms, last_ms]
+    """
+    totals: Dict[int, list] = {}
+    if through is not None:
+        stmt = select(stats_table)
+        if ids is not None:
+            stmt = stmt.where(stats_table.c.product_id.in_(ids))
+        for row in session.execute(stmt):
+            totals[row.product_id] = [row.count, row.total, row.total_sq, row.min_price, row.max_price,
+                                      to_version(row.first_at), to_version(row.last_at)]
+    price = _price_value(session)
+    stmt = select(
+        history_table.c.product_id, func.count(), func.sum(price), func.sum(price * price),
+        func.min(price), func.max(price), func.min(history_table.c.timestamp), func.max(history_table.c.timestamp)
+    ).group_by(history_table.c.product_id)
+    if ids is not None:
+        stmt = stmt.where(history_table.c.product_id.in_(ids))
+    if through is not None:
+        # Instantes com microssegundos no mesmo milissegundo do watermark já estão somados
+        stmt = stmt.where(history_table.c.timestamp >= from_version(to_version(through) + 1))
+    for product_id, count, total, total_sq, low, high, first, last in session.execute(stmt):
+        _merge(totals, product_id, [count, total, total_sq, low, high, to_version(first), to_version(last)])
+    if through is None and archive is not None and archive.enabled:
+        if ids is None:
+            ids = session.execute(select(Product.id)).scalars().all()
+        for product_id in ids:
+            ts_ms, cents = archive.read_range(product_id)
+            if len(ts_ms):
+                prices = cents / 100
+                _merge(totals, product_id, [len(prices), float(prices.sum()), float((prices * prices).sum()),
+                                            float(prices.min()), float(prices.max()), int(ts_ms[0]), int(ts_ms[-1])])
+    return totals
+
+
+def _merge(totals: Dict[int, list], product_id: int, part: list) -> None:
+    current = totals.get(product_id)
+    if current is None:
+        totals[product_id] = part
+        return
+    current[0] += part[0]
+    current[1] += part[1]
+    current[2] += part[2]
+    current[3] = min(current[3], part[3])
+    current[4] = max(current[4], part[4])
+    current[5] = min(current[5], part[5])
+    current[6] = max(current[6], part[6])
+
+
+def _load_windows(session: Session, ids: List[int], now_ms: int) -> Dict[int, _ProductWindows]:
+    """
+    Janelas de `ids` preenchidas a partir do histórico bruto, agregado por hora no SQL.
+    """
+    windows = {product_id: _ProductWindows() for product_id in ids}
+    since_ms = min((now_ms // width - buckets + 1) * width for _, width, buckets in WINDOWS)
+    price = _price_value(session)
+    bucket = _hour_bucket(session)
+    stmt = (
+        select(history_table.c.product_id, bucket, func.count(), func.sum(price), func.sum(price * price),
+               func.min(price), func.max(price), func.max(history_table.c.timestamp))
+        .where(history_table.c.product_id.in_(ids), history_table.c.timestamp >= from_version(since_ms))
+        .group_by(history_table.c.product_id, bucket)
+        .order_by(history_table.c.product_id, bucket)
+    )
+    for product_id, hour, count, total, total_sq, low, high, last in session.execute(stmt):
+        product = windows[product_id]
+        for window in product.windows:
+            window.add(hour * HOUR_MS, count, total, total_sq, low, high)
+        product.last_ms = max(product.last_ms, to_version(last))
+    return windows
+
+
+def _pending_points(pending: list, ids: List[int]) -> Dict[int, list]:
+    """
+    `(ts_ms, price)` de cada um de `ids` nos lotes da fila do sink, do mais antigo ao mais recente.
+    """
+    wanted = np.asarray(ids, dtype=np.int64)
+    points: Dict[int, list] = {}
+    for ts, batch_ids, prices in pending:
+        mask = np.isin(batch_ids, wanted)
+        for product_id, price in zip(batch_ids[mask].tolist(), prices[mask].tolist()):
+            points.setdefault(product_id, []).append((ts, price))
+    return points
+
+
+def _write_rows(session: Session, rows: List[dict], through_ms: int) -> None:
+    for start in range(0, len(rows), FLUSH_ROWS):
+        chunk = rows[start:start + FLUSH_ROWS]
+        session.execute(delete(stats_table).where(stats_table.c.product_id.in_([row['product_id'] for row in chunk])))
+        session.execute(insert(stats_table), chunk)
+    if through_ms:
+        session.merge(RollupWatermark(tier=stats_table.name, watermark=from_version(through_ms)))
+    session.commit()
+
+
+def _summary(count: int, total: float, total_sq: float, low: Optional[float], high: Optional[float]) -> dict:
+    if not count:
+        return {'count': 0, 'min': None, 'max': None, 'avg': None, 'stddev': None, 'volatility': None}
+    avg = total / count
+    stddev = math.sqrt(max(total_sq / count - avg * avg, 0.0))
+    return {
+        'count': count, 'min': low, 'max': high, 'avg': avg, 'stddev': stddev,
+        # Desvio padrão relativo à média
+        'volatility': stddev / avg if avg else None,
+    }
+
+
+def _product_stats(product_id: int, totals, windows: _ProductWindows, now_ms: int) -> dict:
+    if totals is not None and totals[0]:
+        count, total, total_sq, low, high, first, last = totals
+        all_time = _summary(int(count), float(total), float(total_sq), float(low), float(high))
+        all_time.update(firstAt=_iso(int(first)), lastAt=_iso(int(last)))
+    else:
+        all_time = {**_summary(0, 0.0, 0.0, None, None), 'firstAt': None, 'lastAt': None}
+    return {
+        'productId': product_id,
+        'allTime': all_time,
+        'windows': {name: window.summary(now_ms) for (name, _, _), window in zip(WINDOWS, windows.windows)},
+    }
+
+
+def _iso(ts_ms: int) -> str:
+    return from_version(ts_ms).replace(tzinfo=None).isoformat()
@@ -0,0 +1,215 @@
+from datetime import datetime, timezone
+from queue import Queue, Empty, Full
+from threading import Event, Lock, Thread
+from typing import Iterator, Optional
+import itertools
+import json
+import logging
+import numpy as np
+from flask import Flask
+from sqlalchemy import select
+from app.database.connection import db
+from app.models.product import Product
+from app.services.catalog_version import current_version, from_version, to_version
+
+logger = logging.getLogger(__name__)
+
+# Mensagens pendentes por assinante antes de ele ser considerado lento e desconectado
+DEFAULT_QUEUE_SIZE = 32
+# Intervalo (s) entre comentários de keep-alive quando não há mudanças
+DEFAULT_HEARTBEAT = 15.0
+# Intervalo (s) entre consultas do relay nos workers que não rodam a automação
+DEFAULT_POLL_INTERVAL = 1.0
+
+_DROPPED = b'event: dropped\ndata: {}\n\n'
+_KEEPALIVE = b': keepalive\n\n'
+
+
+class Subscription:
+    """
+    Um cliente SSE: fila limitada de frames já codificados.
+    """
+
+    def __init__(self, hub: 'PriceChangeHub', maxsize: int):
+        self.hub = hub
+        self.queue: Queue = Queue(maxsize=maxsize)
+        self.dropped = False
+
+    def events(self, heartbeat: float = DEFAULT_HEARTBEAT) -> Iterator[bytes]:
+        """
+        Gera frames SSE até o cliente desconectar ou ser descartado por lentidão.
+        """
+        try:
+            yield b'retry: 3000\n\n'
+            while True:
+                try:
+                    frame = self.queue.get(timeout=heartbeat)
+                except Empty:
+                    yield _KEEPALIVE
+                    continue
+                if frame is None:
+                    # Cliente lento: avisa para que ele recarregue o catálogo completo
+                    yield _DROPPED
+                    return
+                yield frame
+        finally:
+            self.hub.unsubscribe(self)
+
+
+class PriceChangeHub:
+    """
+    Distribui as mudanças de preço aos assinantes SSE do processo.
+    """
+
+    def __init__(self, queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = Lock()
+        self._sequence = itertools.count(1)
+        self._published = 0
+        self._dropped = 0
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self, self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+        logger.debug(f"SSE subscriber added ({len(self._subscribers)} active)")
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish_changes(self, ids: np.ndarray, prices: np.ndarray, timestamp: datetime) -> None:
+        """
+        Publica um lote gravado como tuplas `{id, currentPrice, lastUpdate}`.
+        """
+        if not self._subscribers or len(ids) == 0:
+            return
+        last_update = timestamp.isoformat()
+        payload = [
+            {'id': pid, 'currentPrice': price, 'lastUpdate': last_update}
+            for pid, price in zip(ids.tolist(), prices.tolist())
+        ]
+        self.publish('prices', payload)
+
+    def publish(self, event: str, data) -> int:
+        """
+        Serializa um evento uma vez e o enfileira para cada assinante.
+
+        Returns:
+            int: Assinantes que receberam o evento.
+        """
+        frame = f"id: {next(self._sequence)}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+        with self._lock:
+            subscribers = list(self._subscribers)
+        delivered = 0
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(frame)
+                delivered += 1
+            except Full:
+                self._drop(subscription)
+        self._published += 1
+        return delivered
+
+    def _drop(self, subscription: Subscription) -> None:
+        self.unsubscribe(subscription)
+        subscription.dropped = True
+        self._dropped += 1
+        with subscription.queue.mutex:
+            subscription.queue.queue.clear()
+        subscription.queue.put_nowait(None)
+        logger.warning("Dropped slow SSE subscriber")
+
+    def get_status(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "published_events": self._published,
+            "dropped_subscribers": self._dropped,
+        }
+
+
+class DatabaseRelay:
+    """
+    Alimenta um hub a partir da tabela de produtos num worker que não roda a automação.
+    """
+
+    def __init__(self, app: Flask, hub: PriceChangeHub, interval: float = DEFAULT_POLL_INTERVAL):
+        self.app = app
+        self.hub = hub
+        self.interval = interval
+        self.active = True
+        self._last: Optional[int] = None
+        self._stop_event = Event()
+        self._thread: Optional[Thread] = None
+        self._polls = 0
+        self._relayed = 0
+        self._error_count = 0
+
+    def set_active(self, active: bool) -> None:
+        # Ao voltar a ficar ativo, recomeça da versão atual (o que passou foi publicado pelo próprio worker)
+        self.active = active
+        self._last = None
+
+    def poll_once(self) -> int:
+        """
+        Publica os commits desde a última consulta.
+
+        Returns:
+            int: Commits publicados.
+        """
+        if not self.active or not self.hub.get_status()['subscribers']:
+            self._last = None
+            return 0
+        session = db.session
+        if self._last is None:
+            self._last = current_version(session)
+            return 0
+        rows = session.execute(
+            select(Product.updated_at, Product.id, Product.current_price)
+            .where(Product.updated_at > from_version(self._last))
+            .order_by(Product.updated_at, Product.id)
+        ).all()
+        self._polls += 1
+        published = 0
+        for updated_at, group in itertools.groupby(rows, key=lambda row: row[0]):
+            group = list(group)
+            self.hub.publish_changes(np.array([row[1] for row in group]), np.array([row[2] for row in group]),
+                                     updated_at.replace(tzinfo=timezone.utc))
+            self._last = to_version(updated_at)
+            published += 1
+        self._relayed += published
+        return published
+
+    def _poll_loop(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    self.poll_once()
+                except Exception as e:
+                    db.session.rollback()
+                    self._error_count += 1
+                    logger.error(f"Failed to relay price changes: {str(e)}")
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = Thread(target=self._poll_loop, daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._stop_event.set()
+            thread.join()
+        self._thread = None
+
+    def get_status(self) -> dict:
+        return {
+            "active": self.active,
+            "interval": self.interval,
+            "polls": self._polls,
+            "relayed_commits": self._relayed,
+            "error_count": self._error_count,
+        }
@@ -0,0 +1,120 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+import numpy as np
+from sqlalchemy import BigInteger, Integer, bindparam, insert, or_, select, update
+from sqlalchemy.orm import Session
+from app.models.product import Product, PriceHistory
+from app.models.storage import is_compact, stored, to_cents, to_millis
+
+products_table = Product.__table__
+history_table = PriceHistory.__table__
+
+# UPDATE products SET current_price=?, updated_at=? WHERE id=? — executado como executemany
+_update_price_stmt = (
+    update(products_table)
+    .where(products_table.c.id == bindparam('b_id'))
+    .values(current_price=bindparam('b_price'), updated_at=bindparam('b_updated_at'))
+)
+# Formato compacto: centavos e epoch ms já convertidos em lote, sem conversão por linha
+_update_stored_stmt = (
+    update(products_table)
+    .where(products_table.c.id == bindparam('b_id'))
+    .values(current_price=bindparam('b_price', type_=Integer), updated_at=bindparam('b_updated_at', type_=BigInteger))
+)
+_insert_stored_history_stmt = insert(history_table).values(
+    product_id=bindparam('product_id'), price=bindparam('price', type_=Integer),
+    timestamp=bindparam('timestamp', type_=BigInteger),
+)
+
+
+def load_price_arrays(session: Session, after_id: int = 0, limit: Optional[int] = None,
+                      categories: Optional[List[str]] = None,
+                      exclude_categories: Optional[List[str]] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Carrega `id`, `original_price` e `current_price` em arrays NumPy, sem instâncias do ORM.
+
+    Returns:
+        (ids, original, current)
+    """
+    compact = is_compact(session)
+    price_columns = (products_table.c.original_price, products_table.c.current_price)
+    if compact:
+        price_columns = tuple(stored(column) for column in price_columns)
+    stmt = (
+        select(products_table.c.id, *price_columns)
+        .where(products_table.c.id > after_id)
+        .order_by(products_table.c.id)
+    )
+    if categories:
+        stmt = stmt.where(products_table.c.category.in_(categories))
+    if exclude_categories:
+        stmt = stmt.where(or_(products_table.c.category.is_(None),
+                              products_table.c.category.not_in(exclude_categories)))
+    if limit:
+        stmt = stmt.limit(limit)
+    rows = session.execute(stmt).all()
+    if not rows:
+        empty = np.empty(0, dtype=np.float64)
+        return np.empty(0, dtype=np.int64), empty, empty
+    # Tuplas simples: o NumPy converte uma lista de Row elemento a elemento, bem mais devagar
+    data = np.array([tuple(row) for row in rows], dtype=np.int64 if compact else np.float64)
+    if compact:
+        return data[:, 0], data[:, 1] / 100, data[:, 2] / 100
+    return data[:, 0].astype(np.int64), data[:, 1], data[:, 2]
+
+
+def load_product_categories(session: Session, ids: np.ndarray) -> List[Optional[str]]:
+    """
+    Categoria atual de cada produto de um lote (`None` se ele foi removido).
+    """
+    if len(ids) == 0:
+        return []
+    rows = session.execute(
+        select(products_table.c.id, products_table.c.category)
+        .where(products_table.c.id.between(int(ids.min()), int(ids.max())))
+    ).all()
+    categories = dict(rows)
+    return [categories.get(pid) for pid in ids.tolist()]
+
+
+def apply_price_updates(session: Session, ids: np.ndarray, prices: np.ndarray, timestamp: datetime,
+                        history: bool = True) -> int:
+    """
+    Grava os novos preços e o histórico de um lote com dois comandos em massa. A transação é do chamador.
+
+    Returns:
+        int: Número de produtos gravados.
+    """
+    if len(ids) == 0:
+        return 0
+    if is_compact(session):
+        return _apply_stored_updates(session, ids, prices, timestamp, history)
+    id_list = ids.tolist()
+    price_list = prices.tolist()
+    session.execute(
+        _update_price_stmt,
+        [{'b_id': pid, 'b_price': price, 'b_updated_at': timestamp} for pid, price in zip(id_list, price_list)],
+    )
+    if history:
+        session.execute(
+            insert(history_table),
+            [{'product_id': pid, 'price': price, 'timestamp': timestamp} for pid, price in zip(id_list, price_list)],
+        )
+    return len(id_list)
+
+
+def _apply_stored_updates(session: Session, ids: np.ndarray, prices: np.ndarray, timestamp: datetime,
+                          history: bool) -> int:
+    id_list = ids.tolist()
+    cents = to_cents(prices).tolist()
+    stamp = to_millis(timestamp)
+    session.execute(
+        _update_stored_stmt,
+        [{'b_id': pid, 'b_price': price, 'b_updated_at': stamp} for pid, price in zip(id_list, cents)],
+    )
+    if history:
+        session.execute(
+            _insert_stored_history_stmt,
+            [{'product_id': pid, 'price': price, 'timestamp': stamp} for pid, price in zip(id_list, cents)],
+        )
+    return len(id_list)
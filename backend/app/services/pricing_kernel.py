@@ -0,0 +1,115 @@
+from typing import Optional, Tuple
+import numpy as np
+
+# Número de novos sorteios para os produtos cujo candidato coincidiu com o preço atual
+# antes de recorrer ao limite oposto (equivalente vetorizado das 100 tentativas do loop).
+REDRAW_ATTEMPTS = 3
+
+
+def make_rng(seed: Optional[int] = None) -> np.random.Generator:
+    """
+    Cria o gerador aleatório do kernel (entropia do sistema quando não há `seed`).
+    """
+    return np.random.default_rng(seed)
+
+
+def compute_new_prices(
+    original: np.ndarray,
+    current: np.ndarray,
+    min_factor,
+    max_factor,
+    rng: np.random.Generator,
+    floor: Optional[np.ndarray] = None,
+    max_step: Optional[np.ndarray] = None,
+    ending: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calcula um novo preço para cada produto de um lote.
+
+    Returns:
+        (mask, new_prices): Máscara dos produtos atualizados e os seus novos preços.
+    """
+    original = np.asarray(original, dtype=np.float64)
+    current = np.asarray(current, dtype=np.float64)
+
+    # Calcular limites e garantir min <= max
+    bound_a = np.round(original * min_factor, 2)
+    bound_b = np.round(original * max_factor, 2)
+    min_price = np.minimum(bound_a, bound_b)
+    max_price = np.maximum(bound_a, bound_b)
+
+    movable = min_price != max_price
+    if floor is not None:
+        min_price = np.maximum(min_price, floor)
+        max_price = np.maximum(max_price, floor)
+    if max_step is not None:
+        # Fora do alcance de um passo, o preço anda o passo máximo em direção à faixa
+        limited = ~np.isnan(max_step)
+        step = np.where(limited, max_step, 0.0)
+        reach_low = np.where(limited, np.round(current * (1 - step), 2), -np.inf)
+        reach_high = np.where(limited, np.round(current * (1 + step), 2), np.inf)
+        min_price = np.clip(min_price, reach_low, reach_high)
+        max_price = np.clip(max_price, reach_low, reach_high)
+    if floor is not None or max_step is not None:
+        # Faixa de um único valor ainda move o preço se ele estiver fora dela
+        movable = (min_price != max_price) | (min_price != current)
+
+    # Pular produtos com preço original inválido ou sem variação possível
+    mask = (original > 0) & movable
+    low = min_price[mask]
+    high = max_price[mask]
+    cur = current[mask]
+
+    new_prices = np.round(rng.uniform(low, high), 2)
+
+    # Sortear novamente apenas os candidatos iguais ao preço atual
+    clash = new_prices == cur
+    for _ in range(REDRAW_ATTEMPTS):
+        if not clash.any():
+            break
+        new_prices[clash] = np.round(rng.uniform(low[clash], high[clash]), 2)
+        clash = new_prices == cur
+
+    # Fallback: escolher o limite oposto ao preço atual
+    if clash.any():
+        new_prices[clash] = np.where(cur[clash] == low[clash], high[clash], low[clash])
+
+    if ending is not None:
+        cents = np.broadcast_to(ending, mask.shape)[mask]
+        snapped = np.floor(new_prices) + cents / 100
+        snapped = np.where(snapped > high, snapped - 1, snapped)
+        fits = (cents > 0) & (snapped >= low) & (snapped <= high)
+        new_prices = np.where(fits, np.round(snapped, 2), new_prices)
+        # Arredondado de volta ao preço atual: o produto fica para o próximo ciclo
+        unchanged = new_prices == cur
+        if unchanged.any():
+            mask[np.flatnonzero(mask)[unchanged]] = False
+            new_prices = new_prices[~unchanged]
+
+    return mask, new_prices
+
+
+def shard_seed(seed: Optional[int], cycle: int, first_id: int):
+    """
+    Semente de um shard, derivada da semente base, do ciclo e do primeiro ID do shard.
+    """
+    if seed is None:
+        return None
+    return [seed, cycle, first_id]
+
+
+def price_shard(
+    original: np.ndarray,
+    current: np.ndarray,
+    min_factor,
+    max_factor,
+    seed_material=None,
+    floor: Optional[np.ndarray] = None,
+    max_step: Optional[np.ndarray] = None,
+    ending: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Ponto de entrada do pool de processos: precifica um shard com o seu próprio gerador.
+    """
+    return compute_new_prices(original, current, min_factor, max_factor, make_rng(seed_material),
+                              floor=floor, max_step=max_step, ending=ending)
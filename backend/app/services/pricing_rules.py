@@ -0,0 +1,90 @@
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+
+# Todos os produtos (a regra vale como padrão)
+ANY_CATEGORY = '*'
+RULE_FIELDS = ('min_factor', 'max_factor', 'floor', 'max_step', 'ending')
+
+
+def validate_rules(rules) -> List[dict]:
+    """
+    Normaliza uma lista de regras de preço declarativas.
+
+    Raises:
+        ValueError: Se uma regra estiver malformada.
+    """
+    if not isinstance(rules, list):
+        raise ValueError("rules must be a list")
+    normalized = []
+    for index, rule in enumerate(rules):
+        if not isinstance(rule, dict):
+            raise ValueError(f"rule {index}: must be an object")
+        unknown = set(rule) - set(RULE_FIELDS) - {'category'}
+        if unknown:
+            raise ValueError(f"rule {index}: unknown fields {sorted(unknown)}")
+        clean = {'category': rule.get('category') or ANY_CATEGORY}
+        for field in ('min_factor', 'max_factor', 'floor', 'max_step'):
+            if rule.get(field) is not None:
+                value = float(rule[field])
+                if value < 0 or (field == 'max_step' and value == 0):
+                    raise ValueError(f"rule {index}: {field} must be positive")
+                clean[field] = value
+        if clean.get('min_factor', 0) > clean.get('max_factor', np.inf):
+            raise ValueError(f"rule {index}: min_factor must be <= max_factor")
+        if 'ending' in rule:
+            value = 0.0 if rule['ending'] is None else float(rule['ending'])
+            cents = int(round(value * 100)) if value < 1 else int(value)
+            if not 0 <= cents <= 99:
+                raise ValueError(f"rule {index}: ending must be between 0.00 and 0.99")
+            clean['ending'] = cents
+        normalized.append(clean)
+    return normalized
+
+
+class RuleTable:
+    """
+    Regras de preço combinadas por categoria; o grupo 0 é o dos demais produtos.
+    """
+
+    def __init__(self, codes: Dict[str, int], params: Dict[str, np.ndarray]):
+        self.codes = codes
+        self.params = params
+
+    def params_for(self, categories: Sequence[Optional[str]]) -> Dict[str, np.ndarray]:
+        """
+        Argumentos do kernel por produto de um lote, dada a categoria de cada um.
+        """
+        groups = np.fromiter((self.codes.get(c, 0) for c in categories), dtype=np.intp, count=len(categories))
+        return {name: values[groups] for name, values in self.params.items()}
+
+
+def compile_rules(rules: List[dict], min_factor: float, max_factor: float) -> RuleTable:
+    """
+    Combina as regras de cada categoria sobre a faixa global de preços.
+
+    Raises:
+        ValueError: Se a combinação de uma categoria deixar `min_factor` maior que `max_factor`.
+    """
+    base = {'min_factor': min_factor, 'max_factor': max_factor, 'floor': 0.0, 'max_step': np.nan, 'ending': 0}
+    for rule in rules:
+        if rule['category'] == ANY_CATEGORY:
+            base.update({k: v for k, v in rule.items() if k in RULE_FIELDS})
+
+    names = sorted({rule['category'] for rule in rules} - {ANY_CATEGORY})
+    merged = [base]
+    for name in names:
+        group = dict(base)
+        for rule in rules:
+            if rule['category'] == name:
+                group.update({k: v for k, v in rule.items() if k in RULE_FIELDS})
+        merged.append(group)
+    for name, group in zip([ANY_CATEGORY] + names, merged):
+        # Cada regra é válida sozinha, mas a fusão (ou a faixa global) pode inverter os limites
+        if group['min_factor'] > group['max_factor']:
+            raise ValueError(f"category {name}: merged min_factor {group['min_factor']} "
+                             f"> max_factor {group['max_factor']}")
+    params = {
+        field: np.array([group[field] for group in merged], dtype=np.int64 if field == 'ending' else np.float64)
+        for field in RULE_FIELDS
+    }
+    return RuleTable({name: code for code, name in enumerate(names, start=1)}, params)
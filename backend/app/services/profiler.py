@@ -0,0 +1,254 @@
+from collections import Counter, deque
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from threading import Event, Lock, Thread, get_ident
+from time import perf_counter
+from typing import Dict, List, Optional
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+from flask import Flask, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+TARGETS = ('cycle', 'request')
+# Intervalo de amostragem das pilhas (segundos) e quantas capturas recentes ficam em memória
+SAMPLE_INTERVAL = 0.005
+MAX_CAPTURES = 20
+TOP_ENTRIES = 15
+
+_DISARMED = nullcontext()
+
+
+class _StackSampler(Thread):
+    """
+    Amostra a pilha de uma thread e conta as pilhas colapsadas (entrada de flamegraph).
+    """
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop_event = Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+class _SqlTimer:
+    """
+    Tempo de cada comando SQL de uma thread durante uma captura.
+    """
+
+    def __init__(self, thread_id: int):
+        self.thread_id = thread_id
+        self.statements: Dict[str, List[float]] = {}
+
+    def before(self, conn, cursor, statement, parameters, context, executemany):
+        if get_ident() == self.thread_id:
+            conn.info['_profiler_started'] = perf_counter()
+
+    def after(self, conn, cursor, statement, parameters, context, executemany):
+        if get_ident() == self.thread_id:
+            elapsed = perf_counter() - conn.info.pop('_profiler_started', perf_counter())
+            stats = self.statements.setdefault(' '.join(statement.split()), [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+
+    def __enter__(self):
+        event.listen(Engine, 'before_cursor_execute', self.before)
+        event.listen(Engine, 'after_cursor_execute', self.after)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(Engine, 'before_cursor_execute', self.before)
+        event.remove(Engine, 'after_cursor_execute', self.after)
+
+    def summary(self) -> List[dict]:
+        return sorted(
+            ({'statement': sql, 'count': count, 'total_ms': total * 1000, 'max_ms': worst * 1000}
+             for sql, (count, total, worst) in self.statements.items()),
+            key=lambda s: s['total_ms'], reverse=True,
+        )
+
+
+class _Capture:
+    def __init__(self, profiler: 'OnDemandProfiler', kind: str, label: str):
+        self.profiler = profiler
+        self.kind = kind
+        self.label = label
+
+    def __enter__(self):
+        thread_id = get_ident()
+        self.started_at = datetime.now(timezone.utc)
+        self.sql = _SqlTimer(thread_id).__enter__()
+        self.sampler = _StackSampler(thread_id, self.profiler.sample_interval)
+        self.sampler.start()
+        self.cprofile = cProfile.Profile()
+        self._started = perf_counter()
+        self.cprofile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cprofile.disable()
+        elapsed = perf_counter() - self._started
+        self.sampler.stop()
+        self.sql.__exit__()
+        try:
+            self.profiler._store(self, elapsed)
+        finally:
+            self.profiler._busy.release()
+
+
+class OnDemandProfiler:
+    """
+    Profiler armado para os próximos N ciclos da automação ou N requisições a uma rota.
+    """
+
+    def __init__(self, output_dir: Optional[str] = None, sample_interval: float = SAMPLE_INTERVAL):
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        self.armed = False
+        self._target: Optional[str] = None
+        self._route: Optional[str] = None
+        self._remaining = 0
+        self._seq = 0
+        self._lock = Lock()
+        self._busy = Lock()
+        self._captures: deque = deque(maxlen=MAX_CAPTURES)
+
+    def init_app(self, app: Flask) -> None:
+        self.output_dir = app.config.get('PROFILE_DIR', self.output_dir)
+
+        @app.before_request
+        def _start_request_capture():
+            if self.armed:
+                capture = self.capture('request', request.url_rule.rule if request.url_rule else request.path,
+                                       request.path)
+                if capture is not _DISARMED:
+                    g._profile_capture = capture.__enter__()
+
+        @app.teardown_request
+        def _stop_request_capture(exception=None):
+            capture = g.pop('_profile_capture', None)
+            if capture is not None:
+                capture.__exit__(None, None, None)
+
+    def arm(self, target: str, count: int = 1, route: Optional[str] = None) -> dict:
+        """
+        Perfila os próximos `count` ciclos (`target='cycle'`) ou requisições a `route`.
+
+        Raises:
+            ValueError: Se o alvo, a contagem ou a rota forem inválidos.
+        """
+        if target not in TARGETS:
+            raise ValueError(f"target must be one of {', '.join(TARGETS)}")
+        if not isinstance(count, int) or count <= 0:
+            raise ValueError('count must be a positive integer')
+        if target == 'request' and not route:
+            raise ValueError("route is required when target is 'request'")
+        with self._lock:
+            self._target, self._route, self._remaining = target, route if target == 'request' else None, count
+            self.armed = True
+        logger.info(f"Profiler armed for {count} {target}(s){f' on {route}' if route else ''}")
+        return self.get_status()
+
+    def disarm(self) -> None:
+        with self._lock:
+            self.armed = False
+            self._target, self._route, self._remaining = None, None, 0
+
+    def capture(self, kind: str, *names: str):
+        """
+        Context manager que perfila o bloco quando armado para `kind`; senão, não faz nada.
+        """
+        if not self.armed:
+            return _DISARMED
+        with self._lock:
+            if (not self.armed or self._target != kind
+                    or (self._route is not None and self._route not in names)):
+                return _DISARMED
+            if not self._busy.acquire(blocking=False):
+                return _DISARMED
+            self._remaining -= 1
+            if self._remaining <= 0:
+                self.armed = False
+                self._target, self._route = None, None
+        return _Capture(self, kind, names[0] if names else kind)
+
+    def _store(self, capture: _Capture, elapsed: float) -> None:
+        self._seq += 1
+        capture_id = f"{capture.started_at.strftime('%Y%m%dT%H%M%S')}-{capture.kind}-{self._seq}"
+        stats = pstats.Stats(capture.cprofile, stream=io.StringIO())
+        top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_ENTRIES]
+        sql = capture.sql.summary()
+        summary = {
+            'id': capture_id,
+            'kind': capture.kind,
+            'label': capture.label,
+            'started_at': capture.started_at.isoformat(),
+            'duration_ms': elapsed * 1000,
+            'samples': sum(capture.sampler.stacks.values()),
+            'sql': {
+                'statements': sum(s['count'] for s in sql),
+                'total_ms': sum(s['total_ms'] for s in sql),
+                'top': sql[:TOP_ENTRIES],
+            },
+            'top_functions': [
+                {'function': f'{os.path.basename(filename)}:{line}({name})', 'calls': calls,
+                 'cumulative_ms': cumulative * 1000}
+                for (filename, line, name), (_, calls, _, cumulative, _) in top
+            ],
+            'files': {},
+        }
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+            base = os.path.join(self.output_dir, capture_id)
+            stats.dump_stats(f'{base}.pstats')
+            with open(f'{base}.collapsed', 'w') as f:
+                f.writelines(f'{stack} {count}\n' for stack, count in capture.sampler.stacks.most_common())
+            with open(f'{base}.sql.json', 'w') as f:
+                json.dump(sql, f, indent=2)
+            summary['files'] = {fmt: f'{base}.{fmt}' for fmt in ('pstats', 'collapsed', 'sql.json')}
+        self._captures.append(summary)
+        logger.info(f"Profile {capture_id} captured: {summary['duration_ms']:.1f} ms, "
+                    f"{summary['sql']['statements']} SQL statements")
+
+    def captures(self) -> List[dict]:
+        return list(self._captures)
+
+    def get_capture(self, capture_id: str) -> Optional[dict]:
+        return next((c for c in self._captures if c['id'] == capture_id), None)
+
+    def get_status(self) -> dict:
+        return {
+            'armed': self.armed,
+            'target': self._target,
+            'route': self._route,
+            'remaining': self._remaining if self.armed else 0,
+            'output_dir': self.output_dir,
+            'captures': [c['id'] for c in self._captures],
+        }
+
+
+profiler = OnDemandProfiler()
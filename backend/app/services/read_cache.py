@@ -0,0 +1,179 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import Callable, Optional
+import logging
+from flask_caching import Cache
+from flask_caching.backends import NullCache, SimpleCache
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = 'read_cache:generation'
+
+
+class TieredCache:
+    """
+    Cache em dois níveis das respostas de leitura: LRU no processo e o backend do Flask-Caching.
+    """
+
+    def __init__(self, backend: Cache, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024,
+                 local_ttl: float = 30, generation_ttl: float = 1.0):
+        self.backend = backend
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.local_ttl = local_ttl
+        self.generation_ttl = generation_ttl
+        self.live = True
+        self._local: OrderedDict = OrderedDict()
+        self._local_bytes = 0
+        self._generation = 0
+        self._generation_checked: Optional[float] = None
+        self._lock = Lock()
+        self._stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'invalidations': 0, 'backend_errors': 0,
+                       'local_expired': 0, 'bypassed': 0}
+
+    def init_app(self, app) -> None:
+        """
+        Configura para `app` e descarta o que foi guardado para um app anterior.
+        """
+        self.max_entries = app.config.get('READ_CACHE_MAX_ENTRIES', self.max_entries)
+        self.max_bytes = app.config.get('READ_CACHE_MAX_BYTES', self.max_bytes)
+        self.local_ttl = app.config.get('READ_CACHE_LOCAL_TTL', self.local_ttl)
+        self.generation_ttl = app.config.get('READ_CACHE_GENERATION_TTL', self.generation_ttl)
+        timeout = app.config.get('CACHE_DEFAULT_TIMEOUT')
+        if timeout:
+            self.local_ttl = min(self.local_ttl, timeout)
+        with self._lock:
+            self.live = True
+            self._local.clear()
+            self._local_bytes = 0
+            self._generation = 0
+            self._generation_checked = None
+            self._stats = dict.fromkeys(self._stats, 0)
+
+    def generation(self) -> int:
+        checked = self._generation_checked
+        if checked is not None and monotonic() - checked < self.generation_ttl:
+            return self._generation
+        return self.refresh_generation()
+
+    def refresh_generation(self) -> int:
+        """
+        Relê a geração compartilhada (incrementada pelos commits de outros processos).
+        """
+        try:
+            value = self.backend.get(GENERATION_KEY)
+        except Exception as e:
+            self._backend_error(e)
+        else:
+            value = int(value or 0)
+            with self._lock:
+                if value != self._generation:
+                    self._generation = value
+                    self._local.clear()
+                    self._local_bytes = 0
+        self._generation_checked = monotonic()
+        return self._generation
+
+    def bump_generation(self) -> None:
+        self._stats['invalidations'] += 1
+        try:
+            value = self.backend.cache.inc(GENERATION_KEY)
+        except Exception as e:
+            self._backend_error(e)
+            value = None
+        # Entradas antigas ficariam inacessíveis de qualquer forma; liberamos a memória já
+        with self._lock:
+            self._generation = int(value) if value is not None else self._generation + 1
+            self._generation_checked = monotonic()
+            self._local.clear()
+            self._local_bytes = 0
+
+    def set_live(self, live: bool) -> None:
+        """
+        Listener de liderança da `PriceAutomation`: indica se este processo vê todos os commits.
+        """
+        with self._lock:
+            self.live = live
+            self._local.clear()
+            self._local_bytes = 0
+
+    def _shared(self) -> bool:
+        return not isinstance(self.backend.cache, (SimpleCache, NullCache))
+
+    def on_commit(self, ids, prices, timestamp) -> None:
+        """
+        Listener de commit da `PriceAutomation`.
+        """
+        self.bump_generation()
+
+    def get_or_set(self, key: str, builder: Callable[[], Optional[bytes]]) -> Optional[bytes]:
+        """
+        Corpo guardado para `key`, montado e guardado numa falta. Um `None` do `builder` não é guardado.
+        """
+        live = self.live
+        if not live and not self._shared():
+            # Seguidor com cache só deste processo: nenhum commit do líder invalidaria a entrada
+            self._stats['bypassed'] += 1
+            return builder()
+        full_key = f'read_cache:g{self.generation()}:{key}'
+        with self._lock:
+            entry = self._local.get(full_key) if live else None
+            if entry is not None:
+                body, expires = entry
+                if monotonic() < expires:
+                    self._local.move_to_end(full_key)
+                    self._stats['local_hits'] += 1
+                    return body
+                del self._local[full_key]
+                self._local_bytes -= len(body)
+                self._stats['local_expired'] += 1
+
+        try:
+            body = self.backend.get(full_key)
+        except Exception as e:
+            self._backend_error(e)
+            body = None
+        if body is not None:
+            self._stats['shared_hits'] += 1
+        else:
+            self._stats['misses'] += 1
+            body = builder()
+            if body is None:
+                return None
+            try:
+                self.backend.set(full_key, body)
+            except Exception as e:
+                self._backend_error(e)
+        if live:
+            self._store_local(full_key, body)
+        return body
+
+    def _store_local(self, key: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._local:
+                return
+            self._local[key] = (body, monotonic() + self.local_ttl)
+            self._local_bytes += len(body)
+            while len(self._local) > self.max_entries or self._local_bytes > self.max_bytes:
+                _, (evicted, _) = self._local.popitem(last=False)
+                self._local_bytes -= len(evicted)
+
+    def _backend_error(self, error: Exception) -> None:
+        self._stats['backend_errors'] += 1
+        logger.warning(f"Shared cache unavailable: {error}")
+
+    def get_status(self) -> dict:
+        lookups = self._stats['local_hits'] + self._stats['shared_hits'] + self._stats['misses']
+        hits = self._stats['local_hits'] + self._stats['shared_hits']
+        return {
+            **self._stats,
+            'live': self.live,
+            'hit_ratio': round(hits / lookups, 4) if lookups else None,
+            'local_entries': len(self._local),
+            'local_bytes': self._local_bytes,
+            'local_ttl': self.local_ttl,
+            'generation': self._generation,
+        }
@@ -0,0 +1,194 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Dict, List, Optional
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models.product import PriceHistory
+from app.services.catalog_version import EPOCH
+from app.services.price_history_reader import HistoryPoint
+
+history_table = PriceHistory.__table__
+
+# Bytes por ponto: timestamp (int64 em µs) + preço (float64)
+POINT_BYTES = 16
+
+
+class _Ring:
+    __slots__ = ('ts', 'price', 'head', 'size')
+
+    def __init__(self, capacity: int):
+        self.ts = np.empty(capacity, dtype=np.int64)
+        self.price = np.empty(capacity, dtype=np.float64)
+        self.head = 0  # próxima posição a escrever
+        self.size = 0
+
+    def append(self, ts: int, price: float) -> None:
+        # Pontos repetidos (carga do banco concorrente com o commit) são ignorados
+        if self.size and ts <= self.ts[self.head - 1]:
+            return
+        self.ts[self.head] = ts
+        self.price[self.head] = price
+        self.head = (self.head + 1) % len(self.ts)
+        self.size = min(self.size + 1, len(self.ts))
+
+    def last(self, n: int):
+        n = min(n, self.size)
+        idx = (self.head - 1 - np.arange(n)) % len(self.ts)
+        return self.ts[idx], self.price[idx]
+
+
+class RecentHistory:
+    """
+    Buffer circular com os últimos pontos de preço de cada produto, alimentado pelos commits da automação.
+    """
+
+    def __init__(self, capacity: int = 64, max_bytes: int = 16 * 1024 * 1024):
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.live = True
+        self.history_sink = None
+        self._rings: OrderedDict = OrderedDict()
+        # Cargas em andamento (fora do lock): recebem os commits que chegam enquanto o banco é lido
+        self._loading: Dict[int, List[list]] = {}
+        self._lock = Lock()
+        self._stats = {'hits': 0, 'loads': 0, 'evictions': 0}
+
+    def init_app(self, app) -> None:
+        """
+        Configura para `app` e descarta os anéis de um app anterior.
+        """
+        self.capacity = app.config.get('RECENT_HISTORY_CAPACITY', self.capacity)
+        self.max_bytes = app.config.get('RECENT_HISTORY_MAX_BYTES', self.max_bytes)
+        with self._lock:
+            self.live = True
+            self.history_sink = None
+            self._rings.clear()
+            self._stats = dict.fromkeys(self._stats, 0)
+
+    def set_live(self, live: bool) -> None:
+        """
+        Listener de liderança: mantém anéis só enquanto este processo roda a automação.
+        """
+        with self._lock:
+            self.live = live
+            self._rings.clear()
+
+    @property
+    def enabled(self) -> bool:
+        return self.live and self.capacity > 0 and self.max_bytes >= self.capacity * POINT_BYTES
+
+    @property
+    def max_products(self) -> int:
+        return self.max_bytes // (self.capacity * POINT_BYTES) if self.capacity else 0
+
+    def on_commit(self, ids: np.ndarray, prices: np.ndarray, timestamp: datetime) -> None:
+        """
+        Listener de commit da `PriceAutomation`: acrescenta o lote aos anéis carregados.
+        """
+        ts = _to_us(timestamp)
+        with self._lock:
+            if self._rings:
+                loaded = np.fromiter(self._rings.keys(), dtype=np.int64, count=len(self._rings))
+                mask = np.isin(ids, loaded)
+                for product_id, price in zip(ids[mask].tolist(), prices[mask].tolist()):
+                    self._rings[product_id].append(ts, price)
+            if self._loading:
+                loading = np.fromiter(self._loading.keys(), dtype=np.int64, count=len(self._loading))
+                mask = np.isin(ids, loading)
+                for product_id, price in zip(ids[mask].tolist(), prices[mask].tolist()):
+                    for missed in self._loading[product_id]:
+                        missed.append((ts, price))
+
+    def last(self, session: Session, product_id: int, limit: int) -> Optional[List[HistoryPoint]]:
+        """
+        Últimos `min(limit, capacity)` pontos de um produto, do mais recente ao mais antigo.
+        Retorna `None` quando o buffer está desligado.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            ring = self._rings.get(product_id)
+            if ring is not None:
+                self._rings.move_to_end(product_id)
+                self._stats['hits'] += 1
+                ts, prices = ring.last(limit)
+            else:
+                missed: list = []
+                self._loading.setdefault(product_id, []).append(missed)
+        if ring is None:
+            # A consulta roda fora do lock; os commits que chegam durante ela ficam em `missed`
+            try:
+                loaded = self._load(session, product_id)
+            finally:
+                with self._lock:
+                    waiting = self._loading[product_id]
+                    waiting.remove(missed)
+                    if not waiting:
+                        del self._loading[product_id]
+            with self._lock:
+                ring = self._rings.get(product_id)
+                if ring is None:
+                    ring = loaded
+                    # Commits posteriores à carga têm carimbos maiores; os já lidos do banco são ignorados
+                    for ts, price in missed:
+                        ring.append(ts, price)
+                    self._insert(product_id, ring)
+                ts, prices = ring.last(limit)
+        return [
+            HistoryPoint(price, (EPOCH + timedelta(microseconds=t)).replace(tzinfo=None))
+            for t, price in zip(ts.tolist(), prices.tolist())
+        ]
+
+    def _load(self, session: Session, product_id: int) -> _Ring:
+        # A fila do sink é lida antes do banco: um lote gravado entre as duas leituras aparece nas duas
+        # (o anel descarta o repetido), nunca em nenhuma
+        queued = self._queued_points(product_id)
+        rows = session.execute(
+            select(history_table.c.timestamp, history_table.c.price)
+            .where(history_table.c.product_id == product_id)
+            .order_by(history_table.c.timestamp.desc())
+            .limit(self.capacity)
+        ).all()
+        points = sorted([(_to_us(timestamp), price) for timestamp, price in rows] + queued)
+        ring = _Ring(self.capacity)
+        for ts, price in points:
+            ring.append(ts, price)
+        return ring
+
+    def _insert(self, product_id: int, ring: _Ring) -> None:
+        self._stats['loads'] += 1
+        if not ring.size or not self.live:
+            # Produto sem histórico (ou inexistente) não ocupa espaço
+            return
+        self._rings[product_id] = ring
+        while len(self._rings) > self.max_products:
+            self._rings.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def _queued_points(self, product_id: int) -> List[tuple]:
+        if self.history_sink is None:
+            return []
+        points = []
+        for timestamp, ids, prices in self.history_sink.pending_batches():
+            hit = np.flatnonzero(ids == product_id)
+            if len(hit):
+                points.append((_to_us(timestamp), float(prices[hit[0]])))
+        return points
+
+    def get_status(self) -> dict:
+        return {
+            **self._stats,
+            'live': self.live,
+            'capacity': self.capacity,
+            'products': len(self._rings),
+            'bytes': len(self._rings) * self.capacity * POINT_BYTES,
+            'max_bytes': self.max_bytes,
+        }
+
+
+def _to_us(timestamp: datetime) -> int:
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return (timestamp - EPOCH) // timedelta(microseconds=1)
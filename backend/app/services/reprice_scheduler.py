@@ -0,0 +1,152 @@
+from threading import Event, Lock
+from typing import Callable, Dict, List, Optional, Tuple
+import heapq
+import logging
+import math
+import time
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+# Grupo dos produtos cuja categoria não tem período próprio
+DEFAULT_GROUP = '*'
+
+
+def parse_schedule(value: Optional[str]) -> Dict[str, float]:
+    """
+    Converte `"Electronics=5,Books=3600"` em `{categoria: período em segundos}`.
+
+    Raises:
+        ValueError: Se uma entrada estiver malformada ou o período não for positivo.
+    """
+    periods = {}
+    for entry in (value or '').split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        category, sep, period = entry.rpartition('=')
+        if not sep or not category.strip():
+            raise ValueError(f"invalid schedule entry: {entry}")
+        seconds = float(period)
+        if seconds <= 0:
+            raise ValueError(f"schedule period must be positive: {entry}")
+        periods[category.strip()] = seconds
+    return periods
+
+
+class RepriceScheduler:
+    """
+    Agendador de taxa fixa dos grupos de reprecificação (categorias e `DEFAULT_GROUP`).
+    """
+
+    def __init__(self, periods: Dict[str, float], tick: float = 1.0, budget: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.periods = dict(periods)
+        self.tick = tick
+        self.budget = budget or tick
+        self._clock = clock
+        self._heap: List[Tuple[float, str]] = []
+        self._lock = Lock()
+        self._stats = {
+            'ticks': 0, 'groups_run': 0, 'overruns': 0, 'missed_ticks': 0, 'skipped_periods': 0,
+            'last_tick_seconds': 0.0, 'max_tick_seconds': 0.0, 'max_lag_seconds': 0.0,
+        }
+
+    def set_period(self, group: str, period: float) -> None:
+        with self._lock:
+            if group not in self.periods:
+                heapq.heappush(self._heap, (self._clock(), group))
+            self.periods[group] = period
+
+    def group_filter(self, group: str) -> Dict[str, List[str]]:
+        """
+        Filtro de categoria de um grupo (argumentos de `load_price_arrays`).
+        """
+        if group == DEFAULT_GROUP:
+            return {'exclude_categories': [c for c in self.periods if c != DEFAULT_GROUP]}
+        return {'categories': [group]}
+
+    def reset(self, now: Optional[float] = None) -> None:
+        """
+        Torna todos os grupos devidos em `now`.
+        """
+        now = self._clock() if now is None else now
+        with self._lock:
+            self._heap = [(now, group) for group in sorted(self.periods)]
+            heapq.heapify(self._heap)
+
+    def pop_due(self, now: float) -> List[str]:
+        """
+        Retira os grupos devidos em `now` e agenda a próxima execução de cada um.
+        """
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                due_at, group = heapq.heappop(self._heap)
+                period = self.periods.get(group)
+                if period is None:
+                    continue
+                self._stats['max_lag_seconds'] = max(self._stats['max_lag_seconds'], now - due_at)
+                next_due = due_at + period
+                if next_due <= now:
+                    # Atrasado mais de um período: pula as execuções perdidas em vez de acumulá-las
+                    skipped = math.floor((now - next_due) / period) + 1
+                    next_due += skipped * period
+                    self._stats['skipped_periods'] += skipped
+                heapq.heappush(self._heap, (next_due, group))
+                due.append(group)
+        return due
+
+    def next_due(self) -> Optional[float]:
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def run(self, stop_event: Event, process: Callable[[str], object]) -> None:
+        """
+        Roda `process(group)` para cada grupo devido até `stop_event` ser sinalizado.
+        """
+        self.reset()
+        next_tick = self._clock()
+        while not stop_event.is_set():
+            started = self._clock()
+            due = self.pop_due(started)
+            for group in due:
+                if stop_event.is_set():
+                    break
+                process(group)
+            self._record_tick(started, self._clock(), len(due))
+
+            next_tick += self.tick
+            now = self._clock()
+            if next_tick < now:
+                missed = math.ceil((now - next_tick) / self.tick)
+                next_tick += missed * self.tick
+                self._stats['missed_ticks'] += missed
+            # Dorme até o primeiro tick da grade em que algum grupo vence
+            upcoming = self.next_due()
+            if upcoming is not None and upcoming > next_tick:
+                next_tick += math.floor((upcoming - next_tick) / self.tick) * self.tick
+                if next_tick < upcoming:
+                    next_tick += self.tick
+            stop_event.wait(max(0.0, next_tick - self._clock()))
+
+    def _record_tick(self, started: float, finished: float, groups: int) -> None:
+        elapsed = finished - started
+        self._stats['ticks'] += 1
+        self._stats['groups_run'] += groups
+        self._stats['last_tick_seconds'] = elapsed
+        self._stats['max_tick_seconds'] = max(self._stats['max_tick_seconds'], elapsed)
+        if elapsed > self.budget:
+            self._stats['overruns'] += 1
+            metrics.TICK_OVERRUNS.inc()
+            logger.debug("Repricing tick overran its budget: %.3fs > %.3fs (%d groups)", elapsed, self.budget, groups)
+
+    def get_status(self) -> dict:
+        upcoming = self.next_due()
+        return {
+            **self._stats,
+            'periods': dict(self.periods),
+            'tick': self.tick,
+            'budget': self.budget,
+            'next_due_in': max(0.0, upcoming - self._clock()) if upcoming is not None else None,
+        }
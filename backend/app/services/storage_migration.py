@@ -0,0 +1,95 @@
+import logging
+import time
+from sqlalchemy.schema import CreateIndex, CreateTable
+from app.models.product import Product, PriceHistory
+from app.models.storage import COMPACT, FLOAT, STORAGE_FORMATS, detect_storage_format
+
+logger = logging.getLogger(__name__)
+
+# Colunas convertidas por tabela: 'price' (REAL <-> centavos) ou 'time' (texto ISO <-> epoch ms)
+MIGRATED_COLUMNS = {
+    Product.__table__: {'original_price': 'price', 'current_price': 'price', 'created_at': 'time', 'updated_at': 'time'},
+    PriceHistory.__table__: {'price': 'price', 'timestamp': 'time'},
+}
+
+_CONVERSIONS = {
+    COMPACT: {
+        'price': 'CAST(ROUND({c} * 100) AS INTEGER)',
+        # Os milissegundos vêm do próprio texto ('YYYY-MM-DD HH:MM:SS.ffffff'), truncados como em to_millis
+        'time': "CAST(strftime('%s', {c}) AS INTEGER) * 1000 + CAST(substr({c} || '.000', 21, 3) AS INTEGER)",
+    },
+    FLOAT: {
+        'price': '{c} / 100.0',
+        'time': "strftime('%Y-%m-%d %H:%M:%S', {c} / 1000, 'unixepoch') || printf('.%03d000', {c} % 1000)",
+    },
+}
+
+
+def database_size(conn) -> int:
+    """
+    Bytes em uso pelo arquivo do banco (sem as páginas livres).
+    """
+    page_size = conn.exec_driver_sql('PRAGMA page_size').scalar()
+    pages = conn.exec_driver_sql('PRAGMA page_count').scalar()
+    free = conn.exec_driver_sql('PRAGMA freelist_count').scalar()
+    return (pages - free) * page_size
+
+
+def _select_list(table, columns, target):
+    parts = []
+    for column in table.columns:
+        name = f'"{column.name}"'
+        kind = columns.get(column.name)
+        parts.append(_CONVERSIONS[target][kind].format(c=name) if kind else name)
+    return ', '.join(parts)
+
+
+def migrate_storage(engine, target: str, vacuum: bool = True) -> dict:
+    """
+    Reescreve `products` e `price_history` no formato `target` (só SQLite), numa transação.
+    Nenhum outro processo pode estar gravando no banco.
+    """
+    if target not in STORAGE_FORMATS:
+        raise ValueError(f"Unknown storage format '{target}' (expected one of {', '.join(STORAGE_FORMATS)})")
+    if engine.dialect.name != 'sqlite':
+        raise ValueError('Storage migration is only implemented for SQLite')
+    current = detect_storage_format(engine)
+    if current is None:
+        raise ValueError('Database has no products table')
+    result = {'from': current, 'to': target, 'rows': {}}
+    if current == target:
+        return result
+
+    # DDL compilada com as colunas no formato de destino
+    target_dialect = type(engine.dialect)()
+    target_dialect.price_storage = target
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        foreign_keys = conn.exec_driver_sql('PRAGMA foreign_keys').scalar()
+        conn.exec_driver_sql('PRAGMA foreign_keys=OFF')
+        result['size_before'] = database_size(conn)
+        conn.commit()
+        with conn.begin():
+            for table, columns in MIGRATED_COLUMNS.items():
+                staging = f'{table.name}__migrating'
+                ddl = str(CreateTable(table).compile(dialect=target_dialect)).strip()
+                conn.exec_driver_sql(ddl.replace(f'CREATE TABLE {table.name} ', f'CREATE TABLE {staging} ', 1))
+                names = ', '.join(f'"{c.name}"' for c in table.columns)
+                rows = conn.exec_driver_sql(
+                    f'INSERT INTO {staging} ({names}) SELECT {_select_list(table, columns, target)} FROM {table.name}'
+                ).rowcount
+                result['rows'][table.name] = rows
+            for table in reversed(list(MIGRATED_COLUMNS)):
+                conn.exec_driver_sql(f'DROP TABLE {table.name}')
+            for table in MIGRATED_COLUMNS:
+                conn.exec_driver_sql(f'ALTER TABLE {table.name}__migrating RENAME TO {table.name}')
+                for index in table.indexes:
+                    conn.exec_driver_sql(str(CreateIndex(index).compile(dialect=target_dialect)))
+        if vacuum:
+            conn.exec_driver_sql('VACUUM')
+        result['size_after'] = database_size(conn)
+        conn.exec_driver_sql(f'PRAGMA foreign_keys={int(foreign_keys)}')
+    result['seconds'] = time.perf_counter() - started
+    logger.info(f"Storage migrated from {current} to {target}: {result['rows']} "
+                f"({result['size_before']} -> {result['size_after']} bytes)")
+    return result
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.models.product import Product, PriceHistory
+
+products_table = Product.__table__
+history_table = PriceHistory.__table__
+
+CATEGORIES = ['Electronics', 'Books', 'Home', 'Fashion', 'Sports', 'Toys', 'Beauty', 'Grocery']
+# Linhas por executemany
+BATCH_SIZE = 20_000
+
+
+def product_attributes(start_id: int, count: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Preços originais (log-uniforme entre 5 e 5000) e índices de categoria de uma faixa de ids.
+    """
+    rng = np.random.default_rng([seed, start_id])
+    prices = np.round(np.exp(rng.uniform(np.log(5), np.log(5000), count)), 2)
+    return prices, rng.integers(0, len(CATEGORIES), count)
+
+
+def random_walk(rng: np.random.Generator, base: np.ndarray, points: int) -> np.ndarray:
+    """
+    Passeio aleatório multiplicativo de `points` preços por preço base, entre 80% e 120% dele.
+    """
+    base = np.asarray(base, dtype=np.float64)[:, None]
+    steps = rng.normal(0, 0.01, (len(base), points))
+    return np.round(np.clip(base * np.exp(np.cumsum(steps, axis=1)), base * 0.8, base * 1.2), 2)
+
+
+def product_rows(start_id: int, count: int, seed: int = 0, now: Optional[datetime] = None) -> List[dict]:
+    """
+    Produtos sintéticos determinísticos com ids `start_id .. start_id + count - 1`.
+    """
+    now = now or datetime.now(timezone.utc)
+    prices, categories = product_attributes(start_id, count, seed)
+    prices, categories = prices.tolist(), categories.tolist()
+    return [
+        {'id': start_id + i, 'name': f'Produto {start_id + i}', 'description': None,
+         'original_price': price, 'current_price': price, 'category': CATEGORIES[cat],
+         'image': 'https://picsum.photos/300/200', 'created_at': now, 'updated_at': now}
+        for i, (price, cat) in enumerate(zip(prices, categories))
+    ]
+
+
+def history_rows(product_ids: np.ndarray, base_prices: np.ndarray, points: int, interval: float,
+                 end: datetime, seed: int = 0) -> Iterator[List[dict]]:
+    """
+    Histórico em passeio aleatório: `points` pontos por produto, a cada `interval` segundos até `end`.
+    """
+    product_ids = np.asarray(product_ids, dtype=np.int64)
+    if len(product_ids) == 0 or points <= 0:
+        return
+    rng = np.random.default_rng([seed, int(product_ids[0])])
+    timestamps = [end - timedelta(seconds=interval * k) for k in range(points - 1, -1, -1)]
+    per_batch = max(1, BATCH_SIZE // points)
+    for first in range(0, len(product_ids), per_batch):
+        ids = product_ids[first:first + per_batch]
+        prices = random_walk(rng, base_prices[first:first + per_batch], points)
+        id_list = ids.tolist()
+        price_rows = prices.tolist()
+        yield [
+            {'product_id': pid, 'price': price, 'timestamp': ts}
+            for pid, row in zip(id_list, price_rows)
+            for price, ts in zip(row, timestamps)
+        ]
+
+
+def build_catalog(session: Session, products: int, history_points: int = 0, history_interval: float = 3600,
+                  seed: int = 0, start_id: int = 1) -> dict:
+    """
+    Insere um catálogo sintético com `executemany` em lotes de `BATCH_SIZE`.
+
+    Returns:
+        dict: Linhas inseridas por tabela.
+    """
+    now = datetime.now(timezone.utc)
+    inserted = {'products': 0, 'price_history': 0}
+    for first in range(start_id, start_id + products, BATCH_SIZE):
+        count = min(BATCH_SIZE, start_id + products - first)
+        rows = product_rows(first, count, seed, now)
+        session.execute(insert(products_table), rows)
+        inserted['products'] += count
+        if history_points:
+            ids = np.arange(first, first + count, dtype=np.int64)
+            base = np.array([row['original_price'] for row in rows])
+            for batch in history_rows(ids, base, history_points, history_interval, now, seed):
+                session.execute(insert(history_table), batch)
+                inserted['price_history'] += len(batch)
+        session.commit()
+    return inserted
@@ -0,0 +1,153 @@
+from datetime import date
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
+import json
+import zlib
+from flask import Response, stream_with_context
+
+# Codificadores opcionais: orjson acelera o JSON; msgpack e brotli só são oferecidos se instalados
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = None
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+JSON = 'application/json'
+NDJSON = 'application/x-ndjson'
+MSGPACK = 'application/x-msgpack'
+_SUFFIXES = {NDJSON: 'ndjson', MSGPACK: 'msgpack'}
+
+# Linhas serializadas por chamada ao codificador e tamanho mínimo de cada pedaço enviado
+BATCH_ROWS = 1000
+CHUNK_BYTES = 64 * 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not serializable')
+
+
+def dumps(value) -> bytes:
+    """
+    Serializa em bytes JSON compactos (orjson quando instalado), com datetimes em ISO 8601.
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, default=_default, separators=(',', ':')).encode()
+
+
+def formats() -> List[str]:
+    return [JSON, NDJSON] + ([MSGPACK] if msgpack is not None else [])
+
+
+def encodings() -> List[str]:
+    return (['br'] if brotli is not None else []) + ['gzip']
+
+
+def negotiate(request) -> Tuple[str, Optional[str]]:
+    """
+    Escolhe o formato pelo `Accept` (JSON por padrão) e a compressão pelo `Accept-Encoding`.
+    """
+    mimetype = request.accept_mimetypes.best_match(formats(), default=JSON)
+    return mimetype, request.accept_encodings.best_match(encodings())
+
+
+def variant(mimetype: str, encoding: Optional[str]) -> str:
+    """
+    Sufixo que distingue as representações nos ETags e nas chaves de cache ('' para JSON).
+    """
+    return '.'.join(part for part in (_SUFFIXES.get(mimetype), encoding) if part)
+
+
+def encode_rows(rows: Iterable[dict], mimetype: str = JSON, count: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Serializa `rows` aos poucos como array JSON, NDJSON ou MessagePack, em pedaços de cerca de `CHUNK_BYTES`.
+    """
+    rows = iter(rows)
+    if mimetype == MSGPACK:
+        if count is None:
+            raise ValueError('count is required for MessagePack')
+        packer = msgpack.Packer(default=_default)
+        head, tail, sep = packer.pack_array_header(count), b'', b''
+        encode_batch = lambda batch: b''.join(packer.pack(row) for row in batch)
+    elif mimetype == NDJSON:
+        head, tail, sep = b'', b'', b''
+        encode_batch = lambda batch: b''.join(dumps(row) + b'\n' for row in batch)
+    else:
+        # Um dumps por lote: o array do lote sem os colchetes vira um trecho do array completo
+        head, tail, sep = b'[', b']', b','
+        encode_batch = lambda batch: dumps(batch)[1:-1]
+
+    pending, size, first = [head], len(head), True
+    while True:
+        batch = list(islice(rows, BATCH_ROWS))
+        if not batch:
+            break
+        encoded = encode_batch(batch)
+        if not first:
+            pending.append(sep)
+        pending.append(encoded)
+        size += len(encoded)
+        first = False
+        if size >= CHUNK_BYTES:
+            yield b''.join(pending)
+            pending, size = [], 0
+    pending.append(tail)
+    yield b''.join(pending)
+
+
+def compress(chunks: Iterable[bytes], encoding: Optional[str]) -> Iterator[bytes]:
+    """
+    Comprime um fluxo de pedaços com gzip ou brotli (`None` não comprime).
+    """
+    if encoding is None:
+        yield from chunks
+        return
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        process, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 = cabeçalho gzip
+        process, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        data = process(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def compress_body(body: bytes, encoding: Optional[str]) -> bytes:
+    return b''.join(compress([body], encoding))
+
+
+def _headers(mimetype: str, encoding: Optional[str]) -> dict:
+    headers = {'Content-Type': mimetype, 'Vary': 'Accept, Accept-Encoding'}
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return headers
+
+
+def body_response(body: bytes, mimetype: str = JSON, encoding: Optional[str] = None, status: int = 200) -> Response:
+    """
+    Resposta para um corpo já codificado (e comprimido).
+    """
+    return Response(body, status=status, headers=_headers(mimetype, encoding))
+
+
+def stream_response(rows: Iterable[dict], mimetype: str = JSON, encoding: Optional[str] = None,
+                    count: Optional[int] = None, status: int = 200) -> Response:
+    """
+    Resposta em streaming que codifica e comprime `rows` durante o envio.
+    """
+    chunks = compress(encode_rows(rows, mimetype, count), encoding)
+    return Response(stream_with_context(chunks), status=status, headers=_headers(mimetype, encoding))
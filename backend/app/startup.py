@@ -0,0 +1,38 @@
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Dict
+
+STARTUP_MODES = ('eager', 'lazy')
+
+
+class StartupTimer:
+    """
+    Tempo de cada fase do `create_app`, guardado em `app.extensions['startup']`.
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self._started = perf_counter()
+        self._finished = None
+
+    def finish(self) -> None:
+        self._finished = perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + perf_counter() - started
+
+    def report(self) -> dict:
+        return {
+            'total_ms': ((self._finished or perf_counter()) - self._started) * 1000,
+            'phases_ms': {name: seconds * 1000 for name, seconds in self.phases.items()},
+        }
+
+    def summary(self) -> str:
+        report = self.report()
+        phases = ', '.join(f'{name} {ms:.1f}' for name, ms in report['phases_ms'].items())
+        return f"{report['total_ms']:.1f} ms ({phases})"
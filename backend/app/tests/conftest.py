@@ -0,0 +1,38 @@
+import pytest
+from flask import Flask
+from app.database.connection import db
+from app.models.product import Product
+
+@pytest.fixture
+def app_options():
+    """
+    Opções do fixture `app`; cada módulo de teste sobrescreve com as suas.
+    """
+    return {}
+
+@pytest.fixture
+def app(request, app_options):
+    """
+    App mínimo (sem create_app) com SQLite em memória e produtos semeados, dentro de um app context.
+
+    Opções, de `app_options` ou de `@pytest.mark.parametrize('app', [...], indirect=True)`:
+        config (dict): Configuração que substitui a padrão.
+        products (int | list): Quantidade de produtos (preços 100, 101, ...) ou a lista dos preços.
+        seed (callable): Recebe a sessão depois dos produtos, para semear o restante (ex.: histórico).
+    """
+    options = getattr(request, 'param', None) or app_options
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config.update(options.get('config', {}))
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        products = options.get('products', 0)
+        prices = [100.0 + i for i in range(products)] if isinstance(products, int) else products
+        for pid, price in enumerate(prices, start=1):
+            db.session.add(Product(id=pid, name=f'Produto {pid}', original_price=price, current_price=price))
+        if options.get('seed'):
+            options['seed'](db.session)
+        db.session.commit()
+        yield app
+        db.session.remove()
@@ -0,0 +1,45 @@
+import pytest
+from flask import Flask
+from sqlalchemy import inspect
+from app.database.connection import db
+from app.models.product import Product, PriceHistory
+from app.services import bulk_seed
+from app.services.bulk_seed import BulkSeeder
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmp_path / "seed.db"}'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+def _index_names():
+    return {index['name'] for index in inspect(db.engine).get_indexes(PriceHistory.__tablename__)}
+
+def test_bulk_seed_loads_history_and_rebuilds_indexes(app, monkeypatch):
+    # Lotes pequenos para exercitar várias tarefas e commits
+    monkeypatch.setattr(bulk_seed, 'PRODUCT_BATCH', 40)
+    monkeypatch.setattr(bulk_seed, 'HISTORY_TASK_ROWS', 50)
+    monkeypatch.setattr(bulk_seed, 'COMMIT_ROWS', 120)
+    indexes = _index_names()
+    progress = []
+    inserted = BulkSeeder(db.session, workers=0, seed=2, progress=progress.append).run(100, history_days=1, interval=6 * 3600)
+    assert inserted == {'products': 100, 'price_history': 400}
+    assert sum(progress) == 500
+    assert Product.query.count() == 100 and PriceHistory.query.count() == 400
+    assert _index_names() == indexes
+    product = db.session.get(Product, 77)
+    points = PriceHistory.query.filter_by(product_id=77).order_by(PriceHistory.timestamp).all()
+    assert len(points) == 4
+    assert all(0.8 * product.original_price <= p.price <= 1.2 * product.original_price for p in points)
+    assert (points[1].timestamp - points[0].timestamp).total_seconds() == 6 * 3600
+
+def test_process_pool_matches_in_process(app, monkeypatch):
+    monkeypatch.setattr(bulk_seed, 'HISTORY_TASK_ROWS', 30)
+    inline = dict(BulkSeeder(db.session, workers=0)._generate(20, 3))
+    pooled = dict(BulkSeeder(db.session, workers=2)._generate(20, 3))
+    assert inline.keys() == pooled.keys()
+    assert all((inline[k] == pooled[k]).all() for k in inline)
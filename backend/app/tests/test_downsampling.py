@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from app.services.downsampling import lttb, ohlc_buckets, parse_resolution
+
+def test_parse_resolution():
+    assert parse_resolution('30s') == 30
+    assert parse_resolution('5m') == 300
+    assert parse_resolution('1d') == 86400
+    with pytest.raises(ValueError):
+        parse_resolution('0h')
+
+def test_ohlc_buckets():
+    ts = np.array([0, 10_000, 59_000, 60_000, 61_000])
+    prices = np.array([5.0, 7.0, 6.0, 1.0, 2.0])
+    ones = np.ones(5, dtype=np.int64)
+    candles = ohlc_buckets(ts, prices, prices, prices, prices, ones, 60)
+    assert candles['timestamp'].tolist() == [0, 60_000]
+    assert candles['open'].tolist() == [5.0, 1.0]
+    assert candles['high'].tolist() == [7.0, 2.0]
+    assert candles['low'].tolist() == [5.0, 1.0]
+    assert candles['close'].tolist() == [6.0, 2.0]
+    assert candles['count'].tolist() == [3, 2]
+
+def test_lttb_keeps_endpoints_and_peaks():
+    x = np.arange(1000)
+    y = np.zeros(1000)
+    y[500] = 100.0
+    keep = lttb(x, y, 20)
+    assert len(keep) == 20
+    assert keep[0] == 0 and keep[-1] == 999
+    assert 500 in keep
+    assert (np.diff(keep) > 0).all()
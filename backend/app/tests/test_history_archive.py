@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pytest
+from app.database.connection import db
+from app.models import PriceHistory
+from app.services.history_archive import HistoryArchive
+from app.services.history_compaction import HistoryCompactor
+from app.services.price_history_reader import fetch_ohlc_series, fetch_page
+
+START = datetime(2025, 1, 31, 22, tzinfo=timezone.utc)
+
+def _seed_history(session):
+    # Um ponto por minuto durante 4 horas, atravessando a virada do mês
+    for i in range(240):
+        session.add(PriceHistory(product_id=1, price=100.0 + i / 100, timestamp=START + timedelta(minutes=i)))
+
+@pytest.fixture
+def app_options():
+    return {'products': [100.0], 'seed': _seed_history}
+
+def test_archive_moves_rows_and_reads_back(app, tmp_path):
+    archive = HistoryArchive(str(tmp_path), after_days=0)
+    compactor = HistoryCompactor(app, raw_retention_days=None, minute_retention_days=None,
+                                 hour_retention_days=None, archive=archive)
+    result = compactor.run_once(now=START + timedelta(hours=3, seconds=30))
+    # Só o que a camada de minutos fechou é arquivado
+    assert result['archived'] == 180
+    assert PriceHistory.query.count() == 60
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['2025-01', '2025-02', 'manifest.json']
+
+    ts_ms, cents = archive.read_range(1, START, START + timedelta(hours=3))
+    assert len(ts_ms) == 180
+    assert np.all(np.diff(ts_ms) == 60_000)
+    assert cents[0] == 10000 and cents[-1] == 10179
+
+    # A paginação continua do banco para o arquivo sem perder pontos
+    page = fetch_page(db.session, 1, limit=100, archive=archive)
+    page += fetch_page(db.session, 1, before=page[-1].timestamp, limit=200, archive=archive)
+    assert len(page) == 240
+    assert [p.price for p in page[58:62]] == [101.81, 101.8, 101.79, 101.78]
+
+    series = fetch_ohlc_series(db.session, 1, START, START + timedelta(hours=4), aligned_to=3600, archive=archive)
+    assert series['count'].sum() == 240
+
+    # Repetir não duplica pontos
+    assert archive.archive(db.session, START + timedelta(days=1)) == 60
+    assert len(archive.read_range(1)[0]) == 240
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pytest
+from app.database.connection import db
+from app.models import PriceHistory, PriceHistoryMinute, PriceHistoryHour
+from app.services.downsampling import ohlc_buckets
+from app.services.catalog_version import CatalogVersion
+from app.services.history_compaction import HistoryCompactor, floor_time, get_watermark
+from app.services.price_history_reader import fetch_ohlc_series
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+def _seed_history(session):
+    # Um ponto a cada 10 s durante 3 horas
+    for i in range(3 * 360):
+        session.add(PriceHistory(product_id=1, price=100.0 + (i % 37), timestamp=START + timedelta(seconds=10 * i)))
+
+@pytest.fixture
+def app_options():
+    return {'products': [100.0], 'seed': _seed_history}
+
+def test_rollup_tiers_and_retention(app):
+    compactor = HistoryCompactor(app, raw_retention_days=0, minute_retention_days=None, hour_retention_days=None)
+    result = compactor.run_once(now=START + timedelta(hours=3, minutes=5))
+    assert result['rolled']['price_history_minute'] == 180
+    assert result['rolled']['price_history_hour'] == 3
+    assert result['rolled']['price_history_day'] == 0  # o dia ainda não fechou
+    # Pontos brutos cobertos pela camada de minutos foram removidos
+    assert result['deleted']['price_history'] == 3 * 360
+    first_hour = PriceHistoryHour.query.order_by(PriceHistoryHour.bucket).first()
+    assert (first_hour.open, first_hour.count) == (100.0, 360)
+    assert first_hour.high == 136.0 and first_hour.low == 100.0
+    assert PriceHistoryMinute.query.count() == 180
+
+    # Uma segunda execução não agrega nada de novo
+    again = compactor.run_once(now=START + timedelta(hours=3, minutes=5))
+    assert again['rolled']['price_history_minute'] == 0
+
+def test_tiered_read_matches_raw(app):
+    end = START + timedelta(hours=3)
+    raw = fetch_ohlc_series(db.session, 1, START, end, aligned_to=3600)
+    expected = ohlc_buckets(*(raw[k] for k in ('timestamp', 'open', 'high', 'low', 'close', 'count')), 3600)
+
+    HistoryCompactor(app, raw_retention_days=0).run_once(now=START + timedelta(hours=3, minutes=5))
+    tiered = fetch_ohlc_series(db.session, 1, START, end, aligned_to=3600)
+    assert len(tiered['timestamp']) == 3  # lido direto da camada de horas
+    candles = ohlc_buckets(*(tiered[k] for k in ('timestamp', 'open', 'high', 'low', 'close', 'count')), 3600)
+    for key in expected:
+        assert np.array_equal(candles[key], expected[key])
+
+def test_raw_history_is_kept_by_default(app):
+    result = HistoryCompactor(app).run_once(now=START + timedelta(days=30))
+    assert result['deleted']['price_history'] == 0
+    assert PriceHistory.query.count() == 3 * 360
+
+def test_watermark_waits_for_commits_in_flight(app):
+    versions = CatalogVersion()
+    stamp = versions.next_timestamp(db.session)
+    compactor = HistoryCompactor(app, catalog_version=versions)
+    # Um commit que demora: o balde do carimbo não fecha, mesmo muito tempo depois
+    compactor.run_once(now=stamp + timedelta(hours=1))
+    assert get_watermark(db.session, PriceHistoryMinute) == floor_time(stamp, 60)
+
+    db.session.add(PriceHistory(product_id=1, price=1.0, timestamp=stamp))
+    db.session.commit()
+    versions.release(stamp)
+    compactor.run_once(now=stamp + timedelta(hours=1))
+    late = PriceHistoryMinute.query.filter_by(bucket=floor_time(stamp, 60).replace(tzinfo=None)).one()
+    assert late.low == 1.0
@@ -0,0 +1,124 @@
+import os
+from datetime import timedelta, timezone
+import numpy as np
+import pytest
+from sqlalchemy import func
+from app.database.connection import db
+from app.models.price_rollup import PriceHistoryMinute
+from app.models.product import Product, PriceHistory
+from app.services.history_compaction import get_watermark
+from app.services.history_sink import BATCH, HistorySink, read_spill, replay_spill, _HEADER
+from app.services.price_automation import PriceAutomation
+
+@pytest.fixture
+def app_options():
+    return {'products': 6}
+
+def _sink(app, tmp_path, **kwargs):
+    options = {'max_age': 60, 'batch_rows': 1000, 'spill_dir': str(tmp_path), 'fsync': False}
+    options.update(kwargs)
+    return HistorySink(app, **options)
+
+def test_history_is_written_behind_the_price_commit(app, tmp_path):
+    sink = _sink(app, tmp_path)
+    automation = PriceAutomation(app, seed=1, history_sink=sink)
+    assert automation.run_cycle() == 6
+    assert PriceHistory.query.count() == 0
+    assert sink.get_status()['queued_rows'] == 6
+    assert sink.oldest_pending() is not None
+
+    assert sink.drain() == 6
+    history = PriceHistory.query.all()
+    assert len(history) == 6
+    assert history[0].timestamp == db.session.get(Product, history[0].product_id).updated_at
+    assert sink.oldest_pending() is None
+    assert os.path.getsize(sink.spill_path) == 0
+    sink.close()
+    assert os.listdir(tmp_path) == []
+
+def test_failed_commit_is_marked_aborted(app, tmp_path):
+    sink = _sink(app, tmp_path)
+    sink.open()
+    with pytest.raises(RuntimeError):
+        with sink.batch(np.array([1, 2]), np.array([1.0, 2.0]), Product.query.first().updated_at):
+            raise RuntimeError('commit failed')
+    assert sink.get_status()['queued_rows'] == 0
+    with open(sink.spill_path, 'rb') as f:
+        assert read_spill(f.read())[0] == []
+    sink.close()
+
+def test_full_queue_waits_for_the_flusher(app, tmp_path):
+    sink = _sink(app, tmp_path, max_rows=4)
+    automation = PriceAutomation(app, seed=1, chunk_size=3, history_sink=sink)
+    assert automation.run_cycle() == 6
+    # O segundo bloco só entrou na fila depois que o primeiro foi gravado
+    assert sink.get_status()['flushed_rows'] >= 3
+    assert sink.get_status()['queued_rows'] <= 4
+    sink.close()
+    assert PriceHistory.query.count() == 6
+
+def test_spill_file_of_dead_process_is_replayed(app, tmp_path):
+    crashed = _sink(app, tmp_path)
+    automation = PriceAutomation(app, seed=1, history_sink=crashed)
+    automation.run_cycle()
+    automation.run_cycle()
+    with open(crashed.spill_path, 'rb') as f:
+        data = f.read()
+    # Último lote registrado cujo commit nunca chegou ao banco
+    data += _HEADER.pack(BATCH, 99, 1, 1) + np.array([1], '<i8').tobytes() + np.array([5.0], '<f8').tobytes()
+    with open(tmp_path / 'dead.spill', 'wb') as f:
+        f.write(data)
+    # Simula a queda: nada do que estava na fila chega ao banco
+    crashed._queue.clear()
+    crashed._journal.close()
+    os.remove(crashed.spill_path)
+
+    survivor = _sink(app, tmp_path)
+    survivor.open()
+    assert survivor.get_status()['recovered_rows'] == 12
+    assert PriceHistory.query.count() == 12
+    assert not (tmp_path / 'dead.spill').exists()
+    # Lotes já gravados não são duplicados
+    assert replay_spill(db.session, data) == 0
+    survivor.close()
+
+def _roll_after(app, sink, stamp):
+    from app.services.history_compaction import HistoryCompactor
+    return HistoryCompactor(app, history_sink=sink).run_once(now=stamp + timedelta(hours=1))
+
+def test_compaction_replays_dead_spill_files_first(app, tmp_path):
+    crashed = _sink(app, tmp_path)
+    PriceAutomation(app, seed=1, history_sink=crashed).run_cycle()
+    stamp = Product.query.first().updated_at
+    db.session.add(PriceHistory(product_id=1, price=100.0, timestamp=stamp - timedelta(minutes=10)))
+    db.session.commit()
+    # Queda com o lote só no diário
+    crashed._queue.clear()
+    crashed._journal.close()
+
+    survivor = _sink(app, tmp_path)
+    _roll_after(app, survivor, stamp)
+    assert PriceHistory.query.count() == 7
+    assert db.session.query(func.sum(PriceHistoryMinute.count)).scalar() == 7
+
+def test_batches_journaled_by_a_live_process_hold_the_watermark(app, tmp_path):
+    deposed = _sink(app, tmp_path)
+    PriceAutomation(app, seed=1, history_sink=deposed).run_cycle()
+    stamp = Product.query.first().updated_at
+    db.session.add(PriceHistory(product_id=1, price=100.0, timestamp=stamp - timedelta(minutes=10)))
+    db.session.commit()
+
+    leader = _sink(app, tmp_path)
+    leader.open()
+    _roll_after(app, leader, stamp)
+    assert get_watermark(db.session, PriceHistoryMinute) <= stamp.replace(tzinfo=timezone.utc)
+    deposed.drain()
+    _roll_after(app, leader, stamp)
+    assert db.session.query(func.sum(PriceHistoryMinute.count)).scalar() == 7
+    deposed.close()
+    leader.close()
+
+def test_write_behind_requires_the_lease():
+    from app import create_app
+    with pytest.raises(ValueError):
+        create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'CACHE_TYPE': 'SimpleCache', 'HISTORY_WRITE_BEHIND': 1})
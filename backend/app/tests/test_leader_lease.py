@@ -0,0 +1,100 @@
+from datetime import timedelta
+import json
+import pytest
+from app.database.connection import db
+from app.models.automation_lease import AutomationLease
+from app.models.product import Product
+from app.services.leader_lease import LeaderLease, _now
+from app.services.price_automation import PriceAutomation
+from app.services.recent_history import RecentHistory
+from app.services.reprice_scheduler import DEFAULT_GROUP
+
+@pytest.fixture
+def app_options():
+    return {'products': 5}
+
+def _expire(name='price_automation'):
+    db.session.query(AutomationLease).filter_by(name=name).update({'expires_at': _now() - timedelta(seconds=1)})
+    db.session.commit()
+
+def test_only_one_holder_until_expiry(app):
+    first, second = LeaderLease(ttl=30, holder='a'), LeaderLease(ttl=30, holder='b')
+    assert first.try_acquire()
+    assert not second.try_acquire()
+    assert first.try_acquire()  # renovação
+    _expire()
+    assert second.try_acquire()
+    assert not first.try_acquire()
+    second.release()
+    assert first.try_acquire()
+
+def test_set_enabled_reports_changes(app):
+    lease = LeaderLease(ttl=30, holder='a')
+    assert lease.set_enabled(True)
+    assert not lease.set_enabled(True)
+    assert lease.read()['enabled']
+    assert lease.set_enabled(False)
+
+def test_only_leader_runs_cycles_and_followers_share_status(app):
+    workers = [PriceAutomation(app, seed=1, lease=LeaderLease(ttl=30, holder=name)) for name in ('a', 'b')]
+    leader, follower = workers
+    leader.lease.set_enabled(True)
+    assert leader.heartbeat() and not follower.heartbeat()
+
+    follower._run_group(DEFAULT_GROUP)
+    assert follower.get_status()['update_count'] == 0
+    leader._run_group(DEFAULT_GROUP)
+    leader.heartbeat()  # publica os contadores
+
+    status = follower.get_status()
+    assert status['update_count'] == 1 and status['is_running']
+    assert status['leader']['holder'] == 'a' and not status['leader']['is_leader']
+
+def test_follower_takes_over_expired_lease_and_keeps_counters(app):
+    leader, follower = (PriceAutomation(app, seed=1, lease=LeaderLease(ttl=30, holder=name)) for name in ('a', 'b'))
+    leader.lease.set_enabled(True)
+    leader.heartbeat()
+    leader._run_group(DEFAULT_GROUP)
+    leader.heartbeat()
+
+    _expire()
+    assert follower.heartbeat()
+    assert follower.get_status()['update_count'] == 1
+    assert not leader.heartbeat()
+    assert not leader._leading
+
+def test_stop_on_any_worker_releases_the_lease(app):
+    leader, follower = (PriceAutomation(app, seed=1, lease=LeaderLease(ttl=30, holder=name)) for name in ('a', 'b'))
+    events = []
+    leader.add_leadership_listener(events.append)
+    leader.lease.set_enabled(True)
+    leader.heartbeat()
+    assert follower.stop()
+    assert not follower.is_running()
+    assert not leader.heartbeat()
+    assert events == [True, False]
+    assert leader.lease.read()['holder'] is None
+
+def test_follower_relays_leader_commits_and_reads_from_the_table(app):
+    leader, follower = (PriceAutomation(app, seed=1, lease=LeaderLease(ttl=30, holder=name)) for name in ('a', 'b'))
+    rings = RecentHistory(capacity=4)
+    follower.add_leadership_listener(rings.set_live)
+    leader.lease.set_enabled(True)
+    assert leader.heartbeat()
+    # O listener só é chamado numa mudança de papel: o worker entra de reserva como em create_app
+    rings.set_live(False)
+    follower.heartbeat()
+
+    subscription = follower.price_stream.subscribe()
+    assert follower.stream_relay.poll_once() == 0  # marca a versão atual
+    leader._run_group(DEFAULT_GROUP)
+    assert follower.stream_relay.poll_once() == 1
+    changes = json.loads(subscription.queue.get_nowait().decode().split('data: ')[1])
+    assert sorted(change['id'] for change in changes) == [p.id for p in Product.query.all()]
+    assert {change['currentPrice'] for change in changes} == {p.current_price for p in Product.query.all()}
+    assert not leader.stream_relay.poll_once()  # o líder publica direto no commit
+    assert rings.last(db.session, 1, 2) is None
+
+    _expire()
+    assert follower.heartbeat()
+    assert rings.live and not follower.stream_relay.active
@@ -0,0 +1,46 @@
+import logging
+import pytest
+from app import logging_setup
+from app.logging_setup import RateSampler, parse_levels
+
+def _record(msg, level=logging.DEBUG, *args):
+    return logging.LogRecord('app.test', level, __file__, 1, msg, args, None)
+
+def test_rate_sampler_limits_each_template(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(logging_setup, 'monotonic', lambda: clock[0])
+    sampler = RateSampler(rate=2)
+    assert [sampler.filter(_record('chunk %d', logging.DEBUG, i)) for i in range(5)] == [True, True, False, False, False]
+    assert sampler.filter(_record('other %d', logging.DEBUG, 1))
+    assert sampler.filter(_record('chunk %d', logging.WARNING, 9))
+    clock[0] += 1.5
+    record = _record('chunk %d', logging.DEBUG, 6)
+    assert sampler.filter(record) and '3 similar messages sampled out' in record.getMessage()
+
+def test_parse_levels():
+    assert parse_levels('app.services=debug, werkzeug=WARNING') == {'app.services': 'DEBUG', 'werkzeug': 'WARNING'}
+    assert parse_levels('') == {}
+    with pytest.raises(ValueError):
+        parse_levels('app=LOUD')
+    with pytest.raises(ValueError):
+        parse_levels('DEBUG')
+
+def test_log_levels_endpoint(tmp_path):
+    from app import create_app
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "log.db"}',
+        'CACHE_TYPE': 'SimpleCache',
+        'HISTORY_ARCHIVE_DIR': str(tmp_path / 'archive'),
+    })
+    assert any(isinstance(h, logging_setup.QueueHandler) for h in logging.getLogger().handlers)
+    client = app.test_client()
+    target = 'app.services.price_automation'
+    previous = logging.getLogger(target).level
+    try:
+        response = client.put('/automation/logging', json={target: 'debug'})
+        assert response.status_code == 200 and response.get_json()[target] == 'DEBUG'
+        assert logging.getLogger(target).isEnabledFor(logging.DEBUG)
+        assert client.put('/automation/logging', json={target: 'nope'}).status_code == 400
+        assert client.get('/automation/logging').get_json()[target] == 'DEBUG'
+    finally:
+        logging.getLogger(target).setLevel(previous)
@@ -0,0 +1,81 @@
+import pytest
+from app.services import metrics
+from app.services.metrics import MetricsRegistry
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram('op_seconds', 'Op latency.', ['op'], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.labels('read').observe(value)
+    text = registry.render()
+    assert '# TYPE op_seconds histogram' in text
+    assert 'op_seconds_bucket{op="read",le="0.1"} 2' in text
+    assert 'op_seconds_bucket{op="read",le="1.0"} 3' in text
+    assert 'op_seconds_bucket{op="read",le="+Inf"} 4' in text
+    assert 'op_seconds_count{op="read"} 4' in text
+    assert 'op_seconds_sum{op="read"} 3.65' in text
+
+def test_counter_and_gauge():
+    registry = MetricsRegistry()
+    rows = registry.counter('rows', 'Rows.')
+    rate = registry.gauge('rate', 'Rate.')
+    assert 'rows_total 0' in registry.render()
+    rows.inc(3)
+    rate.set(2.5)
+    text = registry.render()
+    assert 'rows_total 3' in text and 'rate 2.5' in text
+    with pytest.raises(ValueError):
+        registry.counter('rows', 'Again.')
+    with pytest.raises(ValueError):
+        registry.histogram('h', 'H.', ['a']).labels('x', 'y')
+
+def test_metrics_endpoint_reports_cycle_and_routes(tmp_path):
+    from app import create_app
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "metrics.db"}',
+        'CACHE_TYPE': 'SimpleCache',
+        'HISTORY_ARCHIVE_DIR': str(tmp_path / 'archive'),
+    })
+    from app.database.connection import db
+    from app.models.product import Product
+    with app.app_context():
+        db.session.add_all([Product(name=f'P{i}', original_price=10.0, current_price=10.0) for i in range(3)])
+        db.session.commit()
+        app.price_automation.run_cycle()
+    client = app.test_client()
+    assert client.get('/products').status_code == 200
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type == metrics.CONTENT_TYPE
+    text = response.get_data(as_text=True)
+    for phase in ('load', 'compute', 'flush', 'commit'):
+        assert f'price_automation_phase_seconds_count{{phase="{phase}"}}' in text
+    assert 'price_automation_lock_wait_seconds_count' in text
+    assert 'http_request_duration_seconds_count{blueprint="products",route="/products",method="GET",status="200"}' in text
+    # A própria rota /metrics não é medida
+    assert 'route="/metrics"' not in text
+
+@pytest.mark.parametrize('propagate', [False, True])
+def test_failed_requests_are_recorded_as_500(tmp_path, propagate):
+    from app import create_app
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "metrics.db"}',
+        'CACHE_TYPE': 'SimpleCache',
+        'HISTORY_ARCHIVE_DIR': str(tmp_path / 'archive'),
+        'PROPAGATE_EXCEPTIONS': propagate,
+    })
+
+    def broken():
+        raise RuntimeError('boom')
+
+    app.view_functions['products.get_products'] = broken
+    histogram = metrics.REQUEST_SECONDS.labels('products', '/products', 'GET', 500)
+    before = sum(histogram.counts)
+    client = app.test_client()
+    if propagate:
+        # Modo de teste/debug: a exceção sobe sem passar por after_request
+        with pytest.raises(RuntimeError):
+            client.get('/products')
+    else:
+        assert client.get('/products').status_code == 500
+    assert sum(histogram.counts) == before + 1
@@ -0,0 +1,111 @@
+import pytest
+from app.database.connection import db
+from app.models.product import Product, PriceHistory
+from app.services.price_automation import PriceAutomation
+
+@pytest.fixture
+def app_options():
+    # O último produto tem preço original zero e nunca é reprecificado
+    return {'products': [100.0 + i for i in range(7)] + [0.0]}
+
+def test_run_cycle_updates_every_product(app):
+    automation = PriceAutomation(app, seed=1)
+    assert automation.run_cycle() == 7
+    assert PriceHistory.query.count() == 7
+    assert automation.get_status()['update_count'] == 1
+    product = Product.query.filter(Product.original_price > 0).first()
+    history = PriceHistory.query.filter_by(product_id=product.id).one()
+    assert history.price == product.current_price
+    assert history.timestamp == product.updated_at
+
+def test_chunked_cycle_walks_whole_catalog(app):
+    automation = PriceAutomation(app, seed=1, chunk_size=3)
+    before = {p.id: p.current_price for p in Product.query.all()}
+    assert automation.run_cycle() == 7
+    after = {p.id: p.current_price for p in Product.query.all()}
+    changed = [pid for pid in before if before[pid] != after[pid]]
+    assert len(changed) == 7
+    assert PriceHistory.query.count() == 7
+
+def test_chunked_cycle_stops_between_chunks(app):
+    automation = PriceAutomation(app, seed=1, chunk_size=3)
+    automation._stop_event.set()
+    assert automation.run_cycle() == 0
+
+def test_sharded_computation_is_deterministic(app, monkeypatch):
+    import numpy as np
+    from app.services import price_automation as module
+    ids = np.arange(1, 501, dtype=np.int64)
+    original = np.linspace(10, 1000, 500)
+
+    inline = PriceAutomation(app, seed=7, workers=3)
+    inline._cycle_seq = 1
+    inline_mask, inline_prices = inline._compute_sharded(ids, original, original)
+
+    monkeypatch.setattr(module, 'PARALLEL_MIN_BATCH', 0)
+    pooled = PriceAutomation(app, seed=7, workers=3)
+    pooled._cycle_seq = 1
+    try:
+        pooled_mask, pooled_prices = pooled._compute_sharded(ids, original, original)
+    finally:
+        pooled._shutdown_executor()
+
+    assert inline_mask.all() and np.array_equal(inline_mask, pooled_mask)
+    assert np.array_equal(inline_prices, pooled_prices)
+
+def test_parallel_cycle_updates_every_product(app):
+    automation = PriceAutomation(app, seed=1, workers=2)
+    assert automation.run_cycle() == 7
+    assert PriceHistory.query.count() == 7
+
+def test_catalog_version_advances_on_each_commit(app):
+    from app.services.catalog_version import current_version, from_version
+    automation = PriceAutomation(app, seed=1, chunk_size=4)
+    automation.run_cycle()
+    first = current_version(db.session)
+    automation.run_cycle()
+    second = current_version(db.session)
+    assert second > first
+    changed = Product.query.filter(Product.updated_at > from_version(first)).count()
+    assert changed == 7
+
+def test_scheduled_group_reprices_only_its_category(app):
+    for product in Product.query.limit(2):
+        product.category = 'Electronics'
+    db.session.commit()
+    automation = PriceAutomation(app, seed=1, schedule={'Electronics': 5})
+    assert automation.run_cycle('Electronics') == 2
+    assert automation.run_cycle('*') == 5
+
+def test_rules_are_compiled_and_applied(app):
+    Product.query.filter(Product.original_price > 0).first().category = 'Books'
+    db.session.commit()
+    automation = PriceAutomation(app, seed=1)
+    automation.set_rules([{'category': 'Books', 'floor': 500.0}, {'ending': 0.99}])
+    assert automation.run_cycle() == 7
+    table = automation._rule_table
+    book = Product.query.filter_by(category='Books').one()
+    assert book.current_price >= 500.0
+    others = [p.current_price for p in Product.query.filter(Product.category.is_(None), Product.original_price > 0)]
+    assert all(round(price % 1, 2) == 0.99 for price in others)
+    # A tabela compilada é reutilizada no ciclo seguinte
+    automation.run_cycle()
+    assert automation._rule_table is table
+
+def test_rules_follow_category_changes(app):
+    automation = PriceAutomation(app, seed=1)
+    automation.set_rules([{'category': 'Books', 'floor': 500.0}])
+    automation.run_cycle()
+    product = Product.query.filter(Product.original_price > 0).first()
+    assert product.current_price < 500.0
+    # O produto muda de categoria depois que a tabela já foi compilada
+    product.category = 'Books'
+    db.session.commit()
+    automation.run_cycle()
+    assert db.session.get(Product, product.id).current_price >= 500.0
+
+def test_inverted_merged_bounds_are_rejected(app):
+    automation = PriceAutomation(app, seed=1)
+    with pytest.raises(ValueError):
+        automation.set_rules([{'max_factor': 0.9}, {'category': 'Books', 'min_factor': 1.0}])
+    assert automation.rules == [] and automation._rule_table is None
@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pytest
+from app.database.connection import db
+from app.models import Product, PriceHistory
+from app.services.history_sink import HistorySink
+from app.services.price_stats import PriceStats
+from app.services.price_writer import apply_price_updates
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+NOW = START + timedelta(days=9, minutes=30)
+
+def _seed_history(session):
+    rng = np.random.default_rng(0)
+    for pid in (1, 2, 3):
+        # Um ponto a cada 3 horas por 8 dias, com microssegundos como nos dados gerados
+        for i in range(64):
+            timestamp = START + timedelta(hours=3 * i, microseconds=250)
+            session.add(PriceHistory(product_id=pid, price=round(rng.uniform(50, 150), 2), timestamp=timestamp))
+
+@pytest.fixture
+def app_options():
+    return {'products': [100.0] * 3, 'seed': _seed_history}
+
+def _reprice(stats, count, first=START + timedelta(days=8, hours=12)):
+    rng = np.random.default_rng(1)
+    ids = np.array([1, 2])
+    for i in range(count):
+        now = first + timedelta(minutes=20 * i)
+        prices = np.round(rng.uniform(50, 150, 2), 2)
+        apply_price_updates(db.session, ids, prices, now)
+        db.session.commit()
+        for listener in stats:
+            listener.on_commit(ids, prices, now)
+
+def _expected(product_id, since=None):
+    query = PriceHistory.query.filter_by(product_id=product_id)
+    if since is not None:
+        query = query.filter(PriceHistory.timestamp >= since)
+    prices = np.array([h.price for h in query])
+    if not len(prices):
+        return 0, None, None, None, None
+    return len(prices), prices.min(), prices.max(), prices.mean(), prices.std()
+
+def _approx(value):
+    # Somas acumuladas em outra ordem diferem no último dígito
+    if isinstance(value, dict):
+        return {key: _approx(item) for key, item in value.items()}
+    return pytest.approx(value) if isinstance(value, float) else value
+
+def _assert_matches(block, expected):
+    count, low, high, avg, std = expected
+    assert block['count'] == count
+    if not count:
+        assert block['avg'] is None
+        return
+    assert (block['min'], block['max']) == (low, high)
+    assert block['avg'] == pytest.approx(avg)
+    assert block['stddev'] == pytest.approx(std)
+    assert block['volatility'] == pytest.approx(std / avg)
+
+def test_incremental_stats_match_history(app):
+    stats = PriceStats()
+    _reprice([stats], 9)
+    result = stats.get(db.session, [1, 2, 3], now=NOW)
+    for product_id in (1, 2, 3):
+        _assert_matches(result[product_id]['allTime'], _expected(product_id))
+        for window in result[product_id]['windows'].values():
+            _assert_matches(window, _expected(product_id, datetime.fromisoformat(window['since'])))
+    assert result[1]['allTime']['count'] == 64 + 9
+    assert result[1]['windows']['24h']['since'] == '2025-01-09T01:00:00'
+    assert result[1]['windows']['7d']['since'] == '2025-01-03T06:00:00'
+
+def test_windows_follow_commits_after_loading(app):
+    stats = PriceStats()
+    stats.get(db.session, [1], now=NOW)
+    _reprice([stats], 3, first=NOW + timedelta(minutes=1))
+    later = NOW + timedelta(hours=1)
+    window = stats.get(db.session, [1], now=later)[1]['windows']['24h']
+    _assert_matches(window, _expected(1, datetime.fromisoformat(window['since'])))
+
+def test_saved_sums_and_newer_history_are_reloaded(app):
+    first = PriceStats(flush_interval=0)
+    _reprice([first], 3)
+    assert first.get_status()['flushes'] == 3
+    # Commits depois da última gravação chegam ao novo processo pelo histórico
+    first.flush_interval = 3600
+    _reprice([first], 4, first=START + timedelta(days=8, hours=14))
+
+    second = PriceStats()
+    expected = first.get(db.session, [1, 2, 3], now=NOW)
+    assert second.get(db.session, [1, 2, 3], now=NOW) == _approx(expected)
+    assert expected[1]['allTime']['count'] == 64 + 7
+
+def test_rebuild_and_database_reads_match_memory(app):
+    live = PriceStats(flush_interval=0)
+    _reprice([live], 5)
+    expected = live.get(db.session, [1, 2, 3], now=NOW)
+
+    assert PriceStats().rebuild(db.session) == 3
+    follower = PriceStats()
+    follower.set_live(False)
+    assert follower.get(db.session, [1, 2, 3], now=NOW) == _approx(expected)
+    assert PriceStats().get(db.session, [1, 2, 3], now=NOW) == _approx(expected)
+
+def test_product_without_history(app):
+    db.session.add(Product(id=4, name='Produto 4', original_price=10.0, current_price=10.0))
+    db.session.commit()
+    result = PriceStats().get(db.session, [4], now=NOW)[4]
+    assert result['allTime']['count'] == 0 and result['allTime']['avg'] is None
+    assert result['windows']['7d']['count'] == 0
+
+def test_batches_queued_in_the_sink_reach_the_windows(app):
+    sink = HistorySink(app, max_age=60)
+    stats, follower = PriceStats(), PriceStats()
+    follower.set_live(False)
+    for listener in (stats, follower):
+        listener.history_sink = sink
+    ids, prices = np.array([1, 2]), np.array([77.0, 88.0])
+    now = NOW - timedelta(minutes=5)
+    apply_price_updates(db.session, ids, prices, now, history=False)
+    with sink.batch(ids, prices, now):
+        db.session.commit()
+    stats.on_commit(ids, prices, now)
+
+    queued = stats.get(db.session, [1, 2, 3], now=NOW)
+    assert queued[1]['windows']['24h']['count'] == 1 and queued[1]['windows']['24h']['min'] == 77.0
+    assert follower.get(db.session, [1, 2, 3], now=NOW) == _approx(queued)
+    sink.drain()
+    assert PriceStats().get(db.session, [1, 2, 3], now=NOW) == _approx(queued)
+    sink.close()
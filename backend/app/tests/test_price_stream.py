@@ -0,0 +1,25 @@
+import json
+from datetime import datetime, timezone
+import numpy as np
+from app.services.price_stream import PriceChangeHub
+
+def test_changes_are_serialized_once_for_all_subscribers():
+    hub = PriceChangeHub()
+    first, second = hub.subscribe(), hub.subscribe()
+    hub.publish_changes(np.array([3]), np.array([9.9]), datetime(2025, 1, 1, tzinfo=timezone.utc))
+    frame = first.queue.get_nowait()
+    assert frame is second.queue.get_nowait()
+    data = json.loads(frame.decode().split('data: ')[1])
+    assert data == [{'id': 3, 'currentPrice': 9.9, 'lastUpdate': '2025-01-01T00:00:00+00:00'}]
+
+def test_slow_subscriber_is_dropped():
+    hub = PriceChangeHub(queue_size=2)
+    slow, fast = hub.subscribe(), hub.subscribe()
+    events = fast.events(heartbeat=0.01)
+    next(events)  # retry
+    for _ in range(3):
+        hub.publish('prices', [])
+        next(events)
+    assert slow.dropped and not fast.dropped
+    assert hub.get_status()['subscribers'] == 1
+    assert list(slow.events(heartbeat=0.01))[-1].startswith(b'event: dropped')
@@ -0,0 +1,51 @@
+import numpy as np
+from app.services.pricing_kernel import compute_new_prices, make_rng
+
+def test_skips_invalid_and_fixed_prices():
+    original = np.array([100.0, 0.0, -5.0, 0.01])
+    current = np.array([100.0, 0.0, 0.0, 0.01])
+    mask, new_prices = compute_new_prices(original, current, 0.8, 1.2, make_rng(1))
+    # 0.01 * 0.8 e 0.01 * 1.2 arredondam para 0.01: sem variação possível
+    assert mask.tolist() == [True, False, False, False]
+    assert len(new_prices) == 1
+
+def test_new_price_within_bounds_and_different():
+    original = np.full(10_000, 10.0)
+    current = np.round(original * make_rng(2).uniform(0.8, 1.2, 10_000), 2)
+    mask, new_prices = compute_new_prices(original, current, 0.8, 1.2, make_rng(3))
+    assert mask.all()
+    assert (new_prices >= 8.0).all() and (new_prices <= 12.0).all()
+    assert (new_prices != current).all()
+
+def test_fallback_when_range_has_two_prices():
+    # Apenas 1.00 e 1.01 são possíveis: o novo preço deve ser sempre o outro limite
+    original = np.array([1.0, 1.0])
+    current = np.array([1.0, 1.01])
+    mask, new_prices = compute_new_prices(original, current, 1.0, 1.01, make_rng(4))
+    assert mask.all()
+    assert new_prices.tolist() == [1.01, 1.0]
+
+def test_seeded_rng_is_deterministic():
+    original = np.linspace(10, 1000, 100)
+    _, first = compute_new_prices(original, original, 0.8, 1.2, make_rng(42))
+    _, second = compute_new_prices(original, original, 0.8, 1.2, make_rng(42))
+    assert np.array_equal(first, second)
+
+def test_floor_step_and_ending():
+    original = np.full(1_000, 100.0)
+    current = np.full(1_000, 100.0)
+    mask, new_prices = compute_new_prices(
+        original, current, 0.5, 1.5, make_rng(4),
+        floor=np.full(1_000, 97.0), max_step=np.full(1_000, 0.05), ending=np.full(1_000, 99)
+    )
+    assert mask.any()
+    assert (new_prices >= 97.0).all() and (new_prices <= 105.0).all()
+    assert np.allclose(np.round(new_prices % 1, 2), 0.99)
+    assert (new_prices != 100.0).all()
+
+def test_max_step_walks_toward_range():
+    # Preço atual muito acima da faixa: desce no máximo 10% por ciclo
+    mask, new_prices = compute_new_prices(
+        np.array([100.0]), np.array([200.0]), 0.8, 1.2, make_rng(5), max_step=np.array([0.1])
+    )
+    assert mask.all() and new_prices.tolist() == [180.0]
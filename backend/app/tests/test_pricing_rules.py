@@ -0,0 +1,29 @@
+import pytest
+from app.services.pricing_rules import compile_rules, validate_rules
+
+def test_category_rules_override_defaults():
+    rules = validate_rules([
+        {'max_step': 0.1, 'ending': 0.9},
+        {'category': 'Books', 'min_factor': 0.95, 'max_factor': 1.05, 'ending': None},
+    ])
+    table = compile_rules(rules, 0.8, 1.2)
+    params = table.params_for([None, 'Toys', 'Books'])
+    assert params['min_factor'].tolist() == [0.8, 0.8, 0.95]
+    assert params['ending'].tolist() == [90, 90, 0]
+    assert params['max_step'].tolist() == [0.1, 0.1, 0.1]
+
+def test_invalid_rules_are_rejected():
+    with pytest.raises(ValueError):
+        validate_rules([{'min_factor': 1.2, 'max_factor': 0.8}])
+    with pytest.raises(ValueError):
+        validate_rules([{'discount': 0.1}])
+    with pytest.raises(ValueError):
+        validate_rules({'floor': 1})
+
+def test_inverted_merged_bounds_are_rejected():
+    rules = validate_rules([{'max_factor': 0.9}, {'category': 'Books', 'min_factor': 1.0}])
+    with pytest.raises(ValueError):
+        compile_rules(rules, 0.8, 1.2)
+    # A faixa global também entra na fusão
+    with pytest.raises(ValueError):
+        compile_rules(validate_rules([{'category': 'Books', 'min_factor': 1.3}]), 0.8, 1.2)
@@ -0,0 +1,57 @@
+import os
+import pytest
+from app.services.profiler import OnDemandProfiler
+
+@pytest.fixture
+def app(tmp_path):
+    from app import create_app
+    from app.database.connection import db
+    from app.models.product import Product
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "profile.db"}',
+        'CACHE_TYPE': 'SimpleCache',
+        'HISTORY_ARCHIVE_DIR': str(tmp_path / 'archive'),
+        'PROFILE_DIR': str(tmp_path / 'profiles'),
+    })
+    with app.app_context():
+        db.session.add_all([Product(name=f'P{i}', original_price=10.0, current_price=10.0) for i in range(5)])
+        db.session.commit()
+    yield app
+    from app.services.profiler import profiler
+    profiler.disarm()
+
+def test_disarmed_capture_is_a_noop():
+    profiler = OnDemandProfiler()
+    with profiler.capture('cycle'):
+        pass
+    assert profiler.captures() == []
+    with pytest.raises(ValueError):
+        profiler.arm('request', 1)
+    with pytest.raises(ValueError):
+        profiler.arm('cycle', 0)
+
+def test_armed_cycles_are_captured_and_stored(app):
+    client = app.test_client()
+    assert client.post('/automation/profile', json={'target': 'cycle', 'count': 2}).get_json()['armed']
+    with app.app_context():
+        for _ in range(3):
+            app.price_automation.run_cycle()
+    status = client.get('/automation/profile').get_json()
+    assert not status['armed'] and len(status['captures']) >= 2
+    capture = status['captures'][-1]
+    assert capture['kind'] == 'cycle' and capture['sql']['statements'] > 0
+    assert any('UPDATE products' in s['statement'] for s in capture['sql']['top'])
+    assert all(os.path.exists(path) for path in capture['files'].values())
+    response = client.get(f"/automation/profile/{capture['id']}", query_string={'format': 'pstats'})
+    assert response.status_code == 200 and response.data
+    assert client.get('/automation/profile/nope').status_code == 404
+
+def test_armed_route_profiles_only_matching_requests(app):
+    client = app.test_client()
+    before = len(client.get('/automation/profile').get_json()['captures'])
+    client.post('/automation/profile', json={'target': 'request', 'count': 1, 'route': '/products/<int:id>'})
+    client.get('/products')
+    client.get('/products/1')
+    client.get('/products/2')
+    captures = client.get('/automation/profile').get_json()['captures'][before:]
+    assert [c['label'] for c in captures] == ['/products/<int:id>']
@@ -0,0 +1,71 @@
+import pytest
+from flask import Flask
+from flask_caching import Cache
+from app.services import read_cache as read_cache_module
+from app.services.read_cache import TieredCache
+
+@pytest.fixture
+def cache():
+    app = Flask(__name__)
+    app.config.update(CACHE_TYPE='SimpleCache', CACHE_DEFAULT_TIMEOUT=300, READ_CACHE_LOCAL_TTL=10)
+    backend = Cache(app)
+    tiered = TieredCache(backend)
+    tiered.init_app(app)
+    with app.app_context():
+        yield tiered
+
+def test_local_entries_expire_even_if_generation_does_not_change(cache, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(read_cache_module, 'monotonic', lambda: clock[0])
+    assert cache.get_or_set('k', lambda: b'old') == b'old'
+    assert cache.get_or_set('k', lambda: b'new') == b'old'
+    assert cache.get_status()['local_hits'] == 1
+
+    clock[0] += 11
+    # O corpo compartilhado ainda vale; o local é relido dele
+    cache.backend.set(f'read_cache:g{cache.generation()}:k', b'shared')
+    assert cache.get_or_set('k', lambda: b'new') == b'shared'
+    status = cache.get_status()
+    assert status['local_expired'] == 1 and status['shared_hits'] == 1
+
+def test_local_ttl_is_capped_by_backend_timeout():
+    app = Flask(__name__)
+    app.config.update(CACHE_TYPE='SimpleCache', CACHE_DEFAULT_TIMEOUT=5, READ_CACHE_LOCAL_TTL=60)
+    tiered = TieredCache(Cache(app))
+    tiered.init_app(app)
+    assert tiered.local_ttl == 5
+
+def test_init_app_drops_entries_of_the_previous_app(cache):
+    cache.get_or_set('product:1', lambda: b'first app')
+    other = Flask(__name__)
+    other.config.update(CACHE_TYPE='SimpleCache')
+    cache.backend.init_app(other)
+    cache.init_app(other)
+    with other.app_context():
+        # Mesma geração (0) e mesma chave em outro banco: nada do app anterior é servido
+        assert cache.get_or_set('product:1', lambda: b'second app') == b'second app'
+
+def test_follower_bypasses_process_local_cache(cache):
+    cache.get_or_set('k', lambda: b'old')
+    cache.set_live(False)
+    # SimpleCache é só deste processo: os commits do líder não o invalidariam
+    assert cache.get_or_set('k', lambda: b'new') == b'new'
+    assert cache.get_status()['bypassed'] == 1 and cache.get_status()['local_entries'] == 0
+
+def test_local_hit_does_not_touch_the_backend(cache, monkeypatch):
+    cache.get_or_set('k', lambda: b'body')
+    calls = []
+    get = cache.backend.get
+    monkeypatch.setattr(cache.backend, 'get', lambda key: calls.append(key) or get(key))
+    assert cache.get_or_set('k', lambda: b'other') == b'body'
+    assert calls == [] and cache.get_status()['local_hits'] == 1
+
+def test_generation_bumped_elsewhere_is_seen_after_ttl(cache, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(read_cache_module, 'monotonic', lambda: clock[0])
+    cache.get_or_set('k', lambda: b'old')
+    # Commit de outro processo: só o contador compartilhado muda
+    cache.backend.cache.inc(read_cache_module.GENERATION_KEY)
+    assert cache.get_or_set('k', lambda: b'new') == b'old'
+    clock[0] += cache.generation_ttl
+    assert cache.get_or_set('k', lambda: b'new') == b'new'
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta, timezone
+import threading
+import numpy as np
+import pytest
+from app.database.connection import db
+from app.models import PriceHistory
+from app.services.price_history_reader import fetch_page
+from app.services.price_writer import apply_price_updates
+from app.services.history_sink import HistorySink
+from app.services.recent_history import RecentHistory
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+def _seed_history(session):
+    for pid in (1, 2, 3):
+        for i in range(5):
+            session.add(PriceHistory(product_id=pid, price=100.0 + i, timestamp=START + timedelta(seconds=i)))
+
+@pytest.fixture
+def app_options():
+    return {'products': [100.0] * 3, 'seed': _seed_history}
+
+def _as_pairs(points):
+    return [(p.price, p.timestamp) for p in points]
+
+def test_ring_matches_table_after_commits(app):
+    store = RecentHistory(capacity=8)
+    assert _as_pairs(store.last(db.session, 1, 3)) == _as_pairs(fetch_page(db.session, 1, limit=3))
+
+    ids = np.array([1, 2])
+    for i in range(6):
+        now = START + timedelta(minutes=1, microseconds=1500 * i)
+        prices = np.array([200.0 + i, 300.0 + i])
+        apply_price_updates(db.session, ids, prices, now)
+        db.session.commit()
+        store.on_commit(ids, prices, now)
+
+    # Anel cheio (capacidade 8): os pontos mais antigos foram sobrescritos
+    assert _as_pairs(store.last(db.session, 1, 8)) == _as_pairs(fetch_page(db.session, 1, limit=8))
+    # Pedidos maiores que o anel recebem os 8 mais recentes
+    assert _as_pairs(store.last(db.session, 1, 20)) == _as_pairs(fetch_page(db.session, 1, limit=8))
+    assert store.get_status()['loads'] == 1
+
+def test_memory_cap_evicts_least_recent(app):
+    store = RecentHistory(capacity=4, max_bytes=2 * 4 * 16)
+    for pid in (1, 2, 3):
+        store.last(db.session, pid, 2)
+    status = store.get_status()
+    assert (status['products'], status['evictions']) == (2, 1)
+    assert status['bytes'] <= status['max_bytes']
+
+def test_get_recent_points_reads_the_ring(app, monkeypatch):
+    import app as app_package
+    store = RecentHistory(capacity=4)
+    monkeypatch.setattr(app_package, 'recent_history', store)
+    expected = _as_pairs(fetch_page(db.session, 2, limit=3))
+    assert _as_pairs(PriceHistory.get_recent_points(2, limit=3)) == expected
+    assert _as_pairs(PriceHistory.get_recent_points(2, limit=3)) == expected
+    assert store.get_status()['hits'] == 1
+    # Acima da capacidade, o banco responde
+    assert len(PriceHistory.get_recent_points(2, limit=5)) == 5
+    # O método antigo continua devolvendo os objetos do modelo
+    rows = PriceHistory.get_recent_history(2, limit=3)
+    assert all(isinstance(row, PriceHistory) for row in rows)
+    assert [(row.price, row.timestamp) for row in rows] == expected
+
+def test_commit_during_a_load_is_not_lost(app):
+    store = RecentHistory(capacity=8)
+    load = store._load
+    now = START + timedelta(minutes=1)
+
+    def slow_load(session, product_id):
+        ring = load(session, product_id)
+        # Commit concorrente depois da leitura do banco; o lock não está preso durante a carga
+        committer = threading.Thread(target=store.on_commit, args=(np.array([1]), np.array([222.0]), now))
+        committer.start()
+        committer.join(timeout=5)
+        assert not committer.is_alive()
+        return ring
+
+    store._load = slow_load
+    assert store.last(db.session, 1, 1)[0].price == 222.0
+    assert len(store.last(db.session, 1, 8)) == 6
+
+def test_ring_loaded_while_history_is_queued_in_the_sink(app):
+    sink = HistorySink(app, max_age=60)
+    store = RecentHistory(capacity=4)
+    store.history_sink = sink
+    ids, prices = np.array([1, 2]), np.array([250.0, 350.0])
+    now = START + timedelta(minutes=5)
+    apply_price_updates(db.session, ids, prices, now, history=False)
+    with sink.batch(ids, prices, now):
+        db.session.commit()
+    store.on_commit(ids, prices, now)  # nenhum anel carregado ainda
+
+    assert PriceHistory.query.filter_by(product_id=1).count() == 5
+    assert store.last(db.session, 1, 2)[0].price == 250.0
+    sink.drain()
+    assert _as_pairs(store.last(db.session, 1, 4)) == _as_pairs(fetch_page(db.session, 1, limit=4))
+    sink.close()
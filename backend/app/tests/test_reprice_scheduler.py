@@ -0,0 +1,56 @@
+import logging
+import pytest
+from app.services import metrics
+from app.services.reprice_scheduler import DEFAULT_GROUP, RepriceScheduler, parse_schedule
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_parse_schedule():
+    assert parse_schedule('Electronics=5, Books=3600') == {'Electronics': 5.0, 'Books': 3600.0}
+    assert parse_schedule('') == {}
+    with pytest.raises(ValueError):
+        parse_schedule('Electronics')
+    with pytest.raises(ValueError):
+        parse_schedule('Electronics=0')
+
+def test_fixed_rate_without_drift():
+    clock = FakeClock()
+    scheduler = RepriceScheduler({'Electronics': 5, DEFAULT_GROUP: 60}, clock=clock)
+    scheduler.reset(0)
+    assert sorted(scheduler.pop_due(0)) == ['*', 'Electronics']
+    assert scheduler.pop_due(4.9) == []
+    # Rodar atrasado não empurra o próximo vencimento
+    assert scheduler.pop_due(5.3) == ['Electronics']
+    assert scheduler.next_due() == 10
+    # Períodos perdidos inteiros são pulados, não acumulados
+    assert scheduler.pop_due(27) == ['Electronics']
+    assert scheduler.next_due() == 30
+    status = scheduler.get_status()
+    assert status['skipped_periods'] == 3
+    assert status['max_lag_seconds'] == 17
+
+def test_group_filter_excludes_scheduled_categories():
+    scheduler = RepriceScheduler({'Electronics': 5, DEFAULT_GROUP: 60})
+    assert scheduler.group_filter('Electronics') == {'categories': ['Electronics']}
+    assert scheduler.group_filter(DEFAULT_GROUP) == {'exclude_categories': ['Electronics']}
+
+def test_overrun_is_counted_without_warning(caplog):
+    clock = FakeClock()
+    scheduler = RepriceScheduler({DEFAULT_GROUP: 1}, tick=1.0, clock=clock)
+    before = metrics.TICK_OVERRUNS._default().value
+    with caplog.at_level(logging.INFO, logger='app.services.reprice_scheduler'):
+        scheduler._record_tick(0.0, 1.5, 1)
+        scheduler._record_tick(2.0, 2.5, 1)
+    assert scheduler.get_status()['overruns'] == 1
+    assert metrics.TICK_OVERRUNS._default().value == before + 1
+    assert caplog.records == []
+
+def test_tick_budget_is_configurable():
+    scheduler = RepriceScheduler({DEFAULT_GROUP: 1}, tick=1.0, budget=30.0, clock=FakeClock())
+    scheduler._record_tick(0.0, 12.0, 1)
+    assert scheduler.get_status()['overruns'] == 0
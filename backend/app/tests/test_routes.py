@@ -1,7 +1,8 @@
 import pytest
 from flask import url_for
 
-@pytest.fixture
+# Um app por módulo: create_app não é refeito a cada teste
+@pytest.fixture(scope='module')
 def client():
     from app import create_app  
     app = create_app()
@@ -51,3 +52,51 @@ def test_get_product_history(client):
     assert response.status_code == 200
     data = response.get_json()
     assert isinstance(data, list)
+
+def test_get_products_conditional(client):
+    response = client.get('/products')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    version = response.headers['X-Catalog-Version']
+    response = client.get('/products', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    response = client.get(f'/products?since={version}')
+    assert response.status_code == 200
+    assert response.get_json() == []
+
+def test_get_products_since_invalid(client):
+    response = client.get('/products?since=ontem')
+    assert response.status_code == 400
+
+def test_products_served_from_read_cache(client):
+    client.get('/products')
+    before = client.get('/products/cache/stats').get_json()
+    first = client.get('/products')
+    second = client.get('/products')
+    assert first.data == second.data
+    after = client.get('/products/cache/stats').get_json()
+    assert after['local_hits'] >= before['local_hits'] + 2
+
+def test_get_product_history_invalid_params(client):
+    assert client.get('/products/1/history?resolution=2x').status_code == 400
+    assert client.get('/products/1/history?limit=0').status_code == 400
+    assert client.get('/products/1/history?from=ontem').status_code == 400
+    assert client.get('/products/1/history?limit=abc').status_code == 400
+    assert client.get('/products/1/history?resolution=raw&points=x').status_code == 400
+
+def test_get_product_stats(client):
+    assert client.get('/products/999999/stats').status_code == 404
+    response = client.get('/products/1/stats')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['productId'] == 1
+    assert set(data['windows']) == {'24h', '7d'}
+
+def test_get_products_stats(client):
+    response = client.get('/products/stats?ids=1,2,999999')
+    assert response.status_code == 200
+    assert [item['productId'] for item in response.get_json()] == [1, 2]
+    assert client.get('/products/stats?ids=um').status_code == 400
+    assert client.get('/products/stats?limit=0').status_code == 400
+    assert client.get('/products/stats?limit=abc').status_code == 400
+    assert client.get('/products/stats?after=x').status_code == 400
@@ -0,0 +1,39 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app.database.connection import db
+from app.database.sqlite_profile import read_session
+
+@pytest.fixture
+def app(tmp_path):
+    from app import create_app
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'profile.db'}",
+                      'SQLITE_PROFILE': 'concurrent', 'CACHE_TYPE': 'SimpleCache'})
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+def test_concurrent_profile_uses_wal_and_read_only_engine(app):
+    with app.app_context():
+        assert db.session.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+        session = read_session()
+        assert session is not db.session
+        assert session.execute(text('SELECT COUNT(*) FROM products')).scalar() == 0
+        with pytest.raises(OperationalError):
+            session.execute(text("DELETE FROM products"))
+
+def test_memory_database_has_no_read_engine():
+    from app import create_app
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'CACHE_TYPE': 'SimpleCache'})
+    with app.app_context():
+        assert read_session() is db.session
+
+def test_default_profile_keeps_rollback_journal(tmp_path, monkeypatch):
+    from app import create_app
+    monkeypatch.delenv('SQLITE_PROFILE', raising=False)
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'plain.db'}", 'CACHE_TYPE': 'SimpleCache'})
+    with app.app_context():
+        assert db.session.execute(text('PRAGMA journal_mode')).scalar() == 'delete'
+        assert read_session() is db.session
+        db.engine.dispose()
@@ -0,0 +1,71 @@
+import json
+from sqlalchemy import inspect
+from app import create_app
+from app.database.connection import db
+from app.models import Product
+
+def _config(tmp_path, **extra):
+    return {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "startup.db"}',
+        'CACHE_TYPE': 'SimpleCache',
+        'HISTORY_ARCHIVE_DIR': str(tmp_path / 'archive'),
+        **extra,
+    }
+
+def test_lazy_mode_defers_schema_to_cli(tmp_path):
+    app = create_app(_config(tmp_path, STARTUP_MODE='lazy'))
+    with app.app_context():
+        assert inspect(db.engine).get_table_names() == []
+    result = app.test_cli_runner().invoke(args=['create-schema'])
+    assert 'schema created' in result.output
+    with app.app_context():
+        assert 'products' in inspect(db.engine).get_table_names()
+    assert app.test_client().get('/products').status_code == 200
+
+def test_startup_report_has_phases(tmp_path):
+    app = create_app(_config(tmp_path))
+    report = app.extensions['startup'].report()
+    assert {'swagger', 'extensions', 'schema', 'blueprints'} <= set(report['phases_ms'])
+    assert report['total_ms'] >= sum(report['phases_ms'].values())
+    assert 'create_app [eager]' in app.test_cli_runner().invoke(args=['startup-report']).output
+
+def test_apispec_from_prebuilt_file(tmp_path):
+    spec_file = tmp_path / 'apispec.json'
+    app = create_app(_config(tmp_path))
+    result = app.test_cli_runner().invoke(args=['build-apispec', '--output', str(spec_file)])
+    assert spec_file.exists(), result.output
+    spec = json.loads(spec_file.read_text())
+    assert '/products' in spec['paths']
+
+    spec['info']['title'] = 'prebuilt'
+    spec_file.write_text(json.dumps(spec))
+    served = create_app(_config(tmp_path, APISPEC_FILE=str(spec_file))).test_client().get('/apispec.json')
+    assert served.get_json()['info']['title'] == 'prebuilt'
+
+def test_lazy_mode_detects_storage_on_first_connection(tmp_path):
+    eager = create_app(_config(tmp_path, PRICE_STORAGE='compact'))
+    with eager.app_context():
+        db.session.add(Product(name='Produto', original_price=10.05, current_price=10.05))
+        db.session.commit()
+        db.session.remove()
+        db.engine.dispose()
+
+    app = create_app(_config(tmp_path, STARTUP_MODE='lazy'))
+    # Nada foi lido do banco ao criar a aplicação
+    assert 'price_storage' not in app.extensions
+    response = app.test_client().get('/products/1')
+    assert response.get_json()['currentPrice'] == 10.05
+    assert app.extensions['price_storage'] == 'compact'
+
+def test_each_app_gets_its_own_automation(tmp_path):
+    first = create_app(_config(tmp_path))
+    second = create_app(_config(tmp_path, PRICE_AUTOMATION_LEASE_TTL=15))
+    automation = second.price_automation
+    assert automation is not first.price_automation
+    assert automation.app is second and automation.lease is not None
+    assert second.history_compactor.app is second
+    # Registrar de novo o mesmo listener não o duplica
+    listeners = list(automation._leadership_listeners)
+    automation.add_leadership_listener(second.history_compactor.set_leading)
+    assert automation._leadership_listeners == listeners
+    automation.close()
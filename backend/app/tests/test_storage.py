@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+import pytest
+from flask import Flask
+from app.database.connection import db
+from app.models.price_rollup import PriceHistoryMinute
+from app.models.product import Product, PriceHistory
+from app.models.storage import COMPACT, FLOAT, detect_storage_format, from_millis, set_storage_format, to_millis
+from app.services.history_compaction import HistoryCompactor
+from app.services.history_sink import HistorySink
+from app.services.price_automation import PriceAutomation
+from app.services.price_history_reader import fetch_page, fetch_series
+from app.services.storage_migration import migrate_storage
+
+START = datetime(2025, 6, 1, 12, 0, 0, 123456)
+
+def _make_app(tmp_path, fmt):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'storage.db'}"
+    db.init_app(app)
+    with app.app_context():
+        set_storage_format(db.engine, fmt)
+        db.create_all()
+        for i in range(4):
+            product = Product(name=f'Produto {i}', original_price=10.05 + i, current_price=10.05 + i,
+                              created_at=START, updated_at=START)
+            db.session.add(product)
+            db.session.flush()
+            for k in range(3):
+                db.session.add(PriceHistory(product_id=product.id, price=9.99 + k, timestamp=START + timedelta(seconds=k)))
+        db.session.commit()
+    return app
+
+@pytest.fixture
+def compact_app(tmp_path):
+    app = _make_app(tmp_path, COMPACT)
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+def test_millis_round_trip_truncates_to_milliseconds():
+    assert to_millis(START) == 1748779200123
+    assert from_millis(to_millis(START)) == START.replace(microsecond=123000)
+
+def test_compact_columns_store_integers(compact_app):
+    assert detect_storage_format(db.engine) == COMPACT
+    raw = db.session.execute(db.text('SELECT current_price, updated_at FROM products ORDER BY id')).first()
+    assert tuple(raw) == (1005, 1748779200123)
+    product = db.session.get(Product, 1)
+    assert product.current_price == 10.05
+    assert product.to_dict()['updated_at'] == '2025-06-01T12:00:00.123000'
+
+def test_automation_cycle_and_history_reads_in_compact_format(compact_app):
+    automation = PriceAutomation(compact_app, seed=1)
+    assert automation.run_cycle() == 4
+    for product in Product.query.all():
+        assert product.updated_at > START
+        latest = PriceHistory.query.filter_by(product_id=product.id).order_by(PriceHistory.timestamp.desc()).first()
+        assert latest.price == product.current_price
+        assert latest.timestamp == product.updated_at
+    timestamps, prices = fetch_series(db.session, 1, start=START, end=START + timedelta(seconds=2))
+    assert list(prices) == [9.99, 10.99, 11.99]
+    assert from_millis(int(timestamps[0])) == START.replace(microsecond=123000)
+    page = fetch_page(db.session, 1, start=START, end=START + timedelta(seconds=2), limit=2)
+    assert [(p.price, p.timestamp) for p in page] == [
+        (11.99, START.replace(microsecond=123000) + timedelta(seconds=2)),
+        (10.99, START.replace(microsecond=123000) + timedelta(seconds=1)),
+    ]
+
+def test_compaction_in_compact_format(compact_app):
+    HistoryCompactor(compact_app, raw_retention_days=None, minute_retention_days=None).run_once()
+    row = PriceHistoryMinute.query.filter_by(product_id=1).one()
+    assert row.bucket == datetime(2025, 6, 1, 12, 0)
+    assert (row.open, row.close, row.low, row.high, row.count) == (9.99, 11.99, 9.99, 11.99, 3)
+
+def test_migration_round_trip(tmp_path):
+    app = _make_app(tmp_path, FLOAT)
+    with app.app_context():
+        result = migrate_storage(db.engine, COMPACT)
+        assert result['rows'] == {'products': 4, 'price_history': 12}
+        assert detect_storage_format(db.engine) == COMPACT
+        raw = db.session.execute(db.text('SELECT price, timestamp FROM price_history ORDER BY id')).first()
+        assert tuple(raw) == (999, 1748779200123)
+        assert migrate_storage(db.engine, COMPACT)['rows'] == {}
+
+        migrate_storage(db.engine, FLOAT)
+        assert detect_storage_format(db.engine) == FLOAT
+        product = db.session.get(Product, 2)
+        assert product.current_price == 11.05
+        assert product.updated_at == START.replace(microsecond=123000)
+        assert {index['name'] for index in db.inspect(db.engine).get_indexes('price_history')} >= {
+            'ix_price_history_product_timestamp', 'ix_price_history_timestamp'}
+        db.session.remove()
+        db.engine.dispose()
+
+def test_write_behind_history_in_compact_format(compact_app, tmp_path):
+    sink = HistorySink(compact_app, max_age=60, spill_dir=str(tmp_path / 'spill'), fsync=False)
+    automation = PriceAutomation(compact_app, seed=1, history_sink=sink)
+    automation.run_cycle()
+    assert sink.drain() == 4
+    product = db.session.get(Product, 3)
+    latest = PriceHistory.query.filter_by(product_id=3).order_by(PriceHistory.timestamp.desc()).first()
+    assert (latest.price, latest.timestamp) == (product.current_price, product.updated_at)
+    sink.close()
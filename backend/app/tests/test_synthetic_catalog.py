@@ -0,0 +1,18 @@
+from datetime import datetime, timezone
+import numpy as np
+from app.database.connection import db
+from app.models.product import Product, PriceHistory
+from app.services.synthetic_catalog import build_catalog, history_rows, product_rows
+
+def test_rows_are_deterministic():
+    now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    assert product_rows(11, 5, seed=3, now=now) == product_rows(11, 5, seed=3, now=now)
+    assert product_rows(11, 5, seed=3, now=now) != product_rows(11, 5, seed=4, now=now)
+    batch = next(history_rows(np.array([1, 2]), np.array([100.0, 10.0]), 4, 60, now))
+    assert len(batch) == 8 and batch[3]['timestamp'] == now
+    assert all(80.0 <= row['price'] <= 120.0 for row in batch[:4])
+
+def test_build_catalog(app):
+    inserted = build_catalog(db.session, 250, history_points=3)
+    assert inserted == {'products': 250, 'price_history': 750}
+    assert Product.query.count() == 250 and PriceHistory.query.count() == 750
@@ -0,0 +1,96 @@
+import gzip
+import json
+import re
+from datetime import datetime
+import pytest
+from app.services import wire_format
+
+ROWS = [{'id': i, 'price': i * 1.5, 'at': datetime(2025, 1, 1, 0, i // 60, i % 60)} for i in range(2500)]
+
+def test_encode_rows_json_and_ndjson(monkeypatch):
+    monkeypatch.setattr(wire_format, 'CHUNK_BYTES', 1024)
+    chunks = list(wire_format.encode_rows(iter(ROWS)))
+    assert len(chunks) > 1
+    decoded = json.loads(b''.join(chunks))
+    assert len(decoded) == 2500 and decoded[3] == {'id': 3, 'price': 4.5, 'at': '2025-01-01T00:00:03'}
+    lines = b''.join(wire_format.encode_rows(ROWS[:3], wire_format.NDJSON)).splitlines()
+    assert [json.loads(line)['id'] for line in lines] == [0, 1, 2]
+    assert b''.join(wire_format.encode_rows([])) == b'[]'
+
+def test_dumps_without_orjson_matches(monkeypatch):
+    expected = json.loads(wire_format.dumps(ROWS[:5]))
+    monkeypatch.setattr(wire_format, 'orjson', None)
+    assert json.loads(wire_format.dumps(ROWS[:5])) == expected
+
+def test_gzip_stream_roundtrip():
+    body = b''.join(wire_format.compress(wire_format.encode_rows(ROWS), 'gzip'))
+    assert len(json.loads(gzip.decompress(body))) == 2500
+
+@pytest.fixture
+def client(tmp_path):
+    from app import create_app
+    from app.database.connection import db
+    from app.models.product import Product
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "wire.db"}',
+        'CACHE_TYPE': 'SimpleCache',
+        'HISTORY_ARCHIVE_DIR': str(tmp_path / 'archive'),
+        'PRODUCTS_STREAM_MIN_ROWS': 5,
+    })
+    with app.app_context():
+        db.session.add_all([Product(name=f'P{i}', original_price=10.0 + i, current_price=10.0 + i) for i in range(8)])
+        db.session.commit()
+    return app.test_client()
+
+def test_products_negotiation(client):
+    plain = client.get('/products')
+    assert plain.is_streamed and plain.headers['Vary'] == 'Accept, Accept-Encoding'
+    products = plain.get_json()
+    assert [p['id'] for p in products] == list(range(1, 9)) and 'lastUpdate' in products[0]
+
+    ndjson = client.get('/products', headers={'Accept': wire_format.NDJSON})
+    assert ndjson.content_type == wire_format.NDJSON
+    assert [json.loads(line) for line in ndjson.data.splitlines()] == products
+    assert ndjson.headers['ETag'] != plain.headers['ETag']
+
+    zipped = client.get('/products', headers={'Accept-Encoding': 'gzip'})
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(zipped.data)) == products
+    assert client.get('/products', headers={'Accept-Encoding': 'gzip', 'If-None-Match': zipped.headers['ETag']}).status_code == 304
+
+def test_history_negotiation(client):
+    with client.application.app_context():
+        client.application.price_automation.run_cycle()
+    response = client.get('/products/1/history', headers={'Accept': wire_format.NDJSON, 'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200 and response.headers['Content-Encoding'] == 'gzip'
+    points = [json.loads(line) for line in gzip.decompress(response.data).splitlines()]
+    assert len(points) == 1 and set(points[0]) == {'price', 'timestamp'}
+
+def test_history_timestamps_have_one_format(client):
+    from app.database.connection import db
+    from app.models.product import PriceHistory
+    with client.application.app_context():
+        start = datetime(2025, 1, 1, 12, 0, 0)
+        db.session.add_all([PriceHistory(product_id=1, price=10.0 + i, timestamp=start.replace(second=i, microsecond=696000 * (i % 2)))
+                            for i in range(10)])
+        db.session.commit()
+    iso = re.compile(r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d{6}$')
+    for resolution in ('raw', '1m', 'lttb'):
+        response = client.get(f'/products/1/history?resolution={resolution}&from=2025-01-01T00:00:00&limit=5')
+        timestamps = [point['timestamp'] for point in response.get_json()]
+        assert timestamps and all(iso.match(t) for t in timestamps), (resolution, timestamps)
+    raw = client.get('/products/1/history?limit=2')
+    assert [p['timestamp'] for p in raw.get_json()] == ['2025-01-01T12:00:09.696000', '2025-01-01T12:00:08.000000']
+    assert raw.headers['X-Next-Before'] == '2025-01-01T12:00:08.000000'
+
+def test_history_of_removed_product_is_not_served_from_memory(client):
+    from app.database.connection import db
+    from app.models.product import Product
+    with client.application.app_context():
+        client.application.price_automation.run_cycle()
+    assert client.get('/products/2/history?limit=1').status_code == 200  # carrega o buffer do produto
+    with client.application.app_context():
+        db.session.delete(db.session.get(Product, 2))
+        db.session.commit()
+    assert client.get('/products/2/history?limit=1').status_code == 404
+    assert client.get('/products/999/history').status_code == 404
@@ -0,0 +1,111 @@
+"""
+Read latency while the price automation is writing.
+
+Each profile gets a fresh SQLite file with ``--products`` products and some
+history. A background thread runs repricing cycles back to back (one write
+transaction per cycle), while the main thread reads ``/products/<id>/history``
+through the test client. That route bypasses the read cache and the
+recent-history buffer whenever a time range is given. Reports read latency
+percentiles and failed reads (e.g. "database is locked") per SQLite profile.
+
+Usage (from ``backend/``):
+    python -m benchmarks.bench_mixed_rw --products 50000 --seconds 10
+"""
+import argparse
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import insert
+
+from app import create_app
+from app.database.connection import db
+from app.models.product import Product, PriceHistory
+from app.services.price_automation import PriceAutomation
+
+
+def populate(size, history_points=20):
+    rng = np.random.default_rng(0)
+    prices = np.round(rng.uniform(10, 5000, size), 2).tolist()
+    now = datetime.now(timezone.utc)
+    db.session.execute(insert(Product.__table__), [
+        {'name': f'Produto {i}', 'original_price': p, 'current_price': p, 'created_at': now, 'updated_at': now}
+        for i, p in enumerate(prices)
+    ])
+    db.session.execute(insert(PriceHistory.__table__), [
+        {'product_id': pid, 'price': prices[pid - 1], 'timestamp': now - timedelta(minutes=k)}
+        for pid in range(1, min(size, 1000) + 1) for k in range(history_points)
+    ])
+    db.session.commit()
+
+
+def measure(profile, size, seconds):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(tmp, "bench.db")}',
+            'SQLITE_PROFILE': profile,
+            'CACHE_TYPE': 'SimpleCache',
+        })
+        with app.app_context():
+            populate(size)
+        automation = PriceAutomation(app, interval=0, min_price_factor=0.8, max_price_factor=1.2, seed=0)
+        stop = threading.Event()
+        cycles = []
+
+        def writer():
+            while not stop.is_set():
+                with app.app_context():
+                    started = time.perf_counter()
+                    try:
+                        automation.run_cycle()
+                    except Exception:
+                        db.session.rollback()
+                    cycles.append(time.perf_counter() - started)
+
+        thread = threading.Thread(target=writer, daemon=True)
+        thread.start()
+        client = app.test_client()
+        since = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+        rng = np.random.default_rng(1)
+        latencies, failures = [], 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            product_id = int(rng.integers(1, min(size, 1000) + 1))
+            started = time.perf_counter()
+            response = client.get(f'/products/{product_id}/history', query_string={'from': since, 'limit': 20})
+            latencies.append(time.perf_counter() - started)
+            failures += response.status_code != 200
+        stop.set()
+        thread.join()
+        with app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+    ms = np.array(latencies) * 1000
+    return {
+        'reads': len(ms), 'failed': failures, 'cycles': len(cycles),
+        'p50': np.percentile(ms, 50), 'p99': np.percentile(ms, 99), 'max': ms.max(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=50_000)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--profiles', nargs='+', default=['default', 'concurrent'])
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    print(f"{'profile':>11} {'reads':>7} {'failed':>7} {'cycles':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for profile in args.profiles:
+        r = measure(profile, args.products, args.seconds)
+        print(f"{profile:>11} {r['reads']:>7} {r['failed']:>7} {r['cycles']:>7} "
+              f"{r['p50']:>8.2f} {r['p99']:>8.2f} {r['max']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Rows/sec of the price write paths.
+
+Compares the ORM path (attribute tracking on loaded ``Product`` instances +
+``bulk_save_objects`` for history, one UPDATE per dirty row at flush) with
+the set-based path in ``app.services.price_writer`` (one executemany UPDATE
+and one core INSERT). Each run uses a fresh SQLite file.
+
+Usage (from ``backend/``):
+    python -m benchmarks.bench_price_writes --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from flask import Flask
+from sqlalchemy import insert
+
+from app.database.connection import db
+from app.models.product import Product, PriceHistory
+from app.services.price_writer import apply_price_updates, load_price_arrays
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    db.init_app(app)
+    return app
+
+
+def populate(size):
+    rng = np.random.default_rng(0)
+    prices = np.round(rng.uniform(10, 5000, size), 2).tolist()
+    now = datetime.now(timezone.utc)
+    db.session.execute(insert(Product.__table__), [
+        {'name': f'Produto {i}', 'original_price': p, 'current_price': p, 'created_at': now, 'updated_at': now}
+        for i, p in enumerate(prices)
+    ])
+    db.session.commit()
+
+
+def orm_path():
+    now = datetime.now(timezone.utc)
+    histories = []
+    for product in Product.query.all():
+        new_price = round(product.current_price * 1.01, 2)
+        product.current_price = new_price
+        product.updated_at = now
+        histories.append(PriceHistory(product_id=product.id, price=new_price, timestamp=now))
+    db.session.bulk_save_objects(histories)
+    db.session.commit()
+    return len(histories)
+
+
+def bulk_path():
+    ids, _, current = load_price_arrays(db.session)
+    written = apply_price_updates(db.session, ids, np.round(current * 1.01, 2), datetime.now(timezone.utc))
+    db.session.commit()
+    return written
+
+
+def measure(path_func, size):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            db.create_all()
+            populate(size)
+            started = time.perf_counter()
+            rows = path_func()
+            elapsed = time.perf_counter() - started
+            db.session.remove()
+            db.engine.dispose()
+    return rows / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+
+    print(f"{'products':>10} {'orm rows/s':>12} {'bulk rows/s':>12} {'speedup':>9}")
+    for size in args.sizes:
+        orm = measure(orm_path, size)
+        bulk = measure(bulk_path, size)
+        print(f"{size:>10} {orm:>12.0f} {bulk:>12.0f} {bulk / orm:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Per-cycle pricing time against catalog size.
+
+Compares the original per-product loop (SystemRandom + retries) with the
+vectorized kernel in ``app.services.pricing_kernel``. Only the pricing
+computation is timed; database I/O is left out.
+
+Usage (from ``backend/``):
+    python -m benchmarks.bench_pricing_kernel --sizes 1000 10000 100000 500000
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from app.services.pricing_kernel import compute_new_prices, make_rng
+
+
+def legacy_cycle(original, current, min_factor, max_factor):
+    updated = 0
+    for orig, cur in zip(original, current):
+        if orig <= 0:
+            continue
+        min_price = round(orig * min_factor, 2)
+        max_price = round(orig * max_factor, 2)
+        if min_price > max_price:
+            min_price, max_price = max_price, min_price
+        if min_price == max_price:
+            continue
+        secure_random = random.SystemRandom()
+        new_price = None
+        for _ in range(100):
+            candidate = round(secure_random.uniform(min_price, max_price), 2)
+            if candidate != cur:
+                new_price = candidate
+                break
+        if new_price is None:
+            new_price = max_price if cur == min_price else min_price
+        updated += 1
+    return updated
+
+
+def make_catalog(size, seed=0):
+    rng = np.random.default_rng(seed)
+    original = np.round(rng.uniform(10, 5000, size), 2)
+    current = np.round(original * rng.uniform(0.8, 1.2, size), 2)
+    return original, current
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000, 500_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--skip-legacy-above', type=int, default=100_000,
+                        help='Do not time the legacy loop for catalogs larger than this')
+    args = parser.parse_args()
+
+    rng = make_rng(0)
+    print(f"{'products':>10} {'legacy (s)':>12} {'kernel (s)':>12} {'speedup':>9}")
+    for size in args.sizes:
+        original, current = make_catalog(size)
+        kernel = best_of(lambda: compute_new_prices(original, current, 0.8, 1.2, rng), args.repeat)
+        if size <= args.skip_legacy_above:
+            orig_list, cur_list = original.tolist(), current.tolist()
+            legacy = best_of(lambda: legacy_cycle(orig_list, cur_list, 0.8, 1.2), args.repeat)
+            print(f"{size:>10} {legacy:>12.4f} {kernel:>12.4f} {legacy / kernel:>8.1f}x")
+        else:
+            print(f"{size:>10} {'-':>12} {kernel:>12.4f} {'-':>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Database size and history read throughput per price storage format.
+
+Each format gets a fresh SQLite file seeded with ``--products`` products and
+``--history-days`` of hourly history. Reports the database size (after
+VACUUM), raw range reads through ``fetch_series`` and ``/products/<id>/history``
+requests per second, and a full automation cycle.
+
+Usage (from ``backend/``):
+    python -m benchmarks.bench_storage --products 20000 --history-days 7
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app import create_app
+from app.database.connection import db
+from app.models.storage import STORAGE_FORMATS
+from app.services.bulk_seed import BulkSeeder
+from app.services.price_automation import PriceAutomation
+from app.services.price_history_reader import fetch_series
+from app.services.storage_migration import database_size
+
+
+def measure(fmt, products, history_days, queries):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(tmp, "bench.db")}',
+            'PRICE_STORAGE': fmt,
+            'CACHE_TYPE': 'SimpleCache',
+        })
+        result = {}
+        with app.app_context():
+            BulkSeeder(db.session, workers=0, seed=0).run(products, history_days, 3600)
+            with db.engine.connect() as conn:
+                conn.exec_driver_sql('VACUUM')
+                result['size'] = database_size(conn)
+
+            rng = np.random.default_rng(1)
+            ids = rng.integers(1, products + 1, queries).tolist()
+            end = datetime.now(timezone.utc)
+            start = end - timedelta(days=history_days)
+            rows = 0
+            started = time.perf_counter()
+            for product_id in ids:
+                rows += len(fetch_series(db.session, product_id, start, end)[0])
+            elapsed = time.perf_counter() - started
+            result['series_qps'], result['series_rows'] = queries / elapsed, rows / elapsed
+
+            automation = PriceAutomation(app, interval=0, min_price_factor=0.8, max_price_factor=1.2, seed=0)
+            started = time.perf_counter()
+            automation.run_cycle()
+            result['cycle'] = time.perf_counter() - started
+
+        client = app.test_client()
+        since = start.isoformat()
+        started = time.perf_counter()
+        for product_id in ids:
+            client.get(f'/products/{product_id}/history', query_string={'from': since, 'limit': 200})
+        result['http_qps'] = queries / (time.perf_counter() - started)
+        with app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=20_000)
+    parser.add_argument('--history-days', type=float, default=7)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--formats', nargs='+', default=list(STORAGE_FORMATS))
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    print(f"{'format':>8} {'size MB':>9} {'series/s':>9} {'rows/s':>10} {'http/s':>8} {'cycle s':>8}")
+    for fmt in args.formats:
+        r = measure(fmt, args.products, args.history_days, args.queries)
+        print(f"{fmt:>8} {r['size'] / 1e6:>9.1f} {r['series_qps']:>9.0f} {r['series_rows']:>10.0f} "
+              f"{r['http_qps']:>8.0f} {r['cycle']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+Benchmark suite on synthetic catalogs.
+
+Each catalog size runs in its own child process on a fresh SQLite file, so
+peak RSS is per size and no state leaks between runs. The child builds the
+catalog (``app.services.synthetic_catalog``) with ``--history-points`` points
+per product and then times:
+
+  build     loading the catalog and its history (rows/s)
+  cycle     one ``PriceAutomation.run_cycle`` over the whole catalog (rows/s)
+  products  ``GET /products``, cold (empty read cache) and warm
+  history   ``GET /products/<id>/history`` for random products (p50/p99)
+  seed_db   the ``flask seed-db`` command
+
+Results are written as JSON together with the git commit, Python, SQLite
+and platform versions. ``--baseline`` prints the ratio to an earlier
+results file, so runs can be compared across commits.
+
+Usage (from ``backend/``):
+    python -m benchmarks.suite --sizes 1000 100000 1000000 --history-points 10 --output results.json
+    python -m benchmarks.suite --sizes 1000 100000 --baseline results.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Métricas comparadas com --baseline: (seção, campo, maior é melhor)
+COMPARED = [
+    ('build', 'rows_per_sec', True), ('cycle', 'rows_per_sec', True),
+    ('products', 'cold_ms', False), ('products', 'warm_ms', False),
+    ('history', 'p99_ms', False), ('seed_db', 'seconds', False), ('process', 'peak_rss_mb', False),
+]
+
+
+def run_one(size, history_points, history_interval, history_requests, seed):
+    from app import create_app
+    from app.database.connection import db
+    from app.services.price_automation import PriceAutomation
+    from app.services.synthetic_catalog import build_catalog
+
+    logging.disable(logging.INFO)
+    result = {'catalog_size': size, 'history_points': history_points}
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(tmp, "bench.db")}',
+            'CACHE_TYPE': 'SimpleCache',
+            'HISTORY_ARCHIVE_DIR': os.path.join(tmp, 'archive'),
+        })
+        with app.app_context():
+            started = time.perf_counter()
+            inserted = build_catalog(db.session, size, history_points, history_interval, seed=seed)
+            elapsed = time.perf_counter() - started
+            rows = inserted['products'] + inserted['price_history']
+            result['build'] = {'rows': rows, 'seconds': elapsed, 'rows_per_sec': rows / elapsed}
+
+            automation = PriceAutomation(app, seed=seed)
+            started = time.perf_counter()
+            updated = automation.run_cycle()
+            elapsed = time.perf_counter() - started
+            result['cycle'] = {'rows': updated, 'seconds': elapsed, 'rows_per_sec': updated / elapsed}
+
+        client = app.test_client()
+        timings = []
+        for _ in range(3):
+            started = time.perf_counter()
+            response = client.get('/products')
+            timings.append((time.perf_counter() - started) * 1000)
+        result['products'] = {'bytes': len(response.data), 'cold_ms': timings[0], 'warm_ms': min(timings[1:])}
+
+        rng = np.random.default_rng(seed)
+        latencies = []
+        for product_id in rng.integers(1, size + 1, history_requests).tolist():
+            started = time.perf_counter()
+            client.get(f'/products/{product_id}/history', query_string={'before': datetime.now(timezone.utc).isoformat()})
+            latencies.append((time.perf_counter() - started) * 1000)
+        result['history'] = {
+            'requests': len(latencies),
+            'p50_ms': float(np.percentile(latencies, 50)),
+            'p99_ms': float(np.percentile(latencies, 99)),
+        }
+
+        started = time.perf_counter()
+        outcome = app.test_cli_runner().invoke(args=['seed-db'])
+        result['seed_db'] = {'seconds': time.perf_counter() - started, 'ok': outcome.exit_code == 0}
+
+        with app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+    # ru_maxrss é em KiB no Linux
+    result['process'] = {'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+    return result
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'started_at': datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {r['catalog_size']: r for r in json.load(f)['results']}
+    print(f"\nvs {baseline_path} (>1.00x = faster/smaller)")
+    for result in results:
+        old = baseline.get(result['catalog_size'])
+        if old is None:
+            continue
+        parts = []
+        for section, field, higher_is_better in COMPARED:
+            new_value, old_value = result[section][field], old.get(section, {}).get(field)
+            if old_value and new_value:
+                ratio = new_value / old_value if higher_is_better else old_value / new_value
+                parts.append(f"{section}.{field}={ratio:.2f}x")
+        print(f"{result['catalog_size']:>10}: " + ' '.join(parts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument('--history-points', type=int, default=10, help='History points per product.')
+    parser.add_argument('--history-interval', type=float, default=3600, help='Seconds between history points.')
+    parser.add_argument('--history-requests', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='Write results as JSON to this file.')
+    parser.add_argument('--baseline', default=None, help='Results file to compare against.')
+    parser.add_argument('--run-one', type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one is not None:
+        print(json.dumps(run_one(args.run_one, args.history_points, args.history_interval,
+                                 args.history_requests, args.seed)))
+        return
+
+    results = []
+    print(f"{'products':>10} {'build r/s':>11} {'cycle r/s':>11} {'list cold':>10} {'list warm':>10} "
+          f"{'hist p99':>9} {'seed-db s':>10} {'rss MB':>8}")
+    for size in args.sizes:
+        child = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.suite', '--run-one', str(size),
+             '--history-points', str(args.history_points), '--history-interval', str(args.history_interval),
+             '--history-requests', str(args.history_requests), '--seed', str(args.seed)],
+            capture_output=True, text=True, check=True,
+        )
+        r = json.loads(child.stdout.strip().splitlines()[-1])
+        results.append(r)
+        print(f"{size:>10} {r['build']['rows_per_sec']:>11.0f} {r['cycle']['rows_per_sec']:>11.0f} "
+              f"{r['products']['cold_ms']:>8.1f}ms {r['products']['warm_ms']:>8.1f}ms "
+              f"{r['history']['p99_ms']:>7.2f}ms {r['seed_db']['seconds']:>10.2f} {r['process']['peak_rss_mb']:>8.0f}")
+
+    report = {'environment': environment(), 'parameters': vars(args), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react';
-import { fetchProducts, getAutomationStatus } from '../services/api';
+import { fetchProducts, getAutomationStatus, subscribePriceChanges } from '../services/api';
+import type { PriceChange } from '../services/api';
 import type { Product } from '../types';
 
 const CACHE_KEY = 'cachedProducts';
@@ -61,11 +62,11 @@ export const usePriceUpdates = (initialProducts: Product[]) => {
     fetchInitialProducts();
   }, []);
 
-  // Atualiza os preços continuamente apenas se a automação estiver rodando
+  // Recebe apenas as mudanças de preço via SSE enquanto a automação estiver rodando
   useEffect(() => {
     if (!automationRunning) return;
 
-    const updatePrices = async () => {
+    const refetch = async () => {
       try {
         setLoading(true);
         const updated = await fetchProducts();
@@ -80,9 +81,23 @@ export const usePriceUpdates = (initialProducts: Product[]) => {
       }
     };
 
-    updatePrices();
-    const interval = setInterval(updatePrices, 10000);
-    return () => clearInterval(interval);
+    const applyChanges = (changes: PriceChange[]) => {
+      const byId = new Map(changes.map((change) => [String(change.id), change]));
+      setProducts((current) => {
+        const next = current.map((product) => {
+          const change = byId.get(String(product.id));
+          return change
+            ? { ...product, currentPrice: change.currentPrice, lastUpdate: change.lastUpdate }
+            : product;
+        });
+        localStorage.setItem(CACHE_KEY, JSON.stringify(next));
+        return next;
+      });
+      setIsConnected(true);
+    };
+
+    // A cada (re)conexão o catálogo é recarregado uma vez para não perder mudanças
+    return subscribePriceChanges(applyChanges, refetch, () => setIsConnected(false));
   }, [automationRunning]);
 
   return { products, isConnected, loading };
@@ -2,12 +2,10 @@ import type { Product } from '../types';
 
 export const fetchProducts = async (): Promise<Product[]> => {
   console.log('Fetching products from API at', new Date().toISOString());
+  // 'no-cache' revalida com o ETag do catálogo: se nada mudou o servidor responde 304
+  // e o navegador reaproveita o corpo já armazenado
   const response = await fetch('https://ecommerce-price-automation.onrender.com/products', {
-    headers: {
-      'Cache-Control': 'no-cache',
-      'Pragma': 'no-cache',
-      'If-Modified-Since': '0'
-    }
+    cache: 'no-cache'
   });
   if (!response.ok) {
     throw new Error('Failed to fetch products');
@@ -26,6 +24,29 @@ export const fetchProducts = async (): Promise<Product[]> => {
   }));
 };
 
+export interface PriceChange {
+  id: number;
+  currentPrice: number;
+  lastUpdate: string;
+}
+
+// Assina o fluxo SSE de mudanças de preço; `onResync` é chamado quando o
+// servidor descarta o cliente por lentidão e o catálogo precisa ser recarregado.
+export const subscribePriceChanges = (
+  onChanges: (changes: PriceChange[]) => void,
+  onResync: () => void,
+  onError?: () => void
+): (() => void) => {
+  const source = new EventSource('https://ecommerce-price-automation.onrender.com/products/stream');
+  source.addEventListener('prices', (event) => {
+    onChanges(JSON.parse((event as MessageEvent).data));
+  });
+  source.addEventListener('dropped', () => onResync());
+  source.onerror = () => onError?.();
+  source.onopen = () => onResync();
+  return () => source.close();
+};
+
 export const startAutomation = async (): Promise<void> => {
   const response = await fetch('https://ecommerce-price-automation.onrender.com/automation/start', {
     method: 'POST',